@@ -1,85 +1,180 @@
 import requests
 import json
+import os
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from excel_export import write_excel
+from rate_limiter import TokenBucket
+
+WEEKLY_API = "https://api.bilibili.com/x/web-interface/popular/series/one"
+
+# 请求头，模拟浏览器访问
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Referer": "https://www.bilibili.com/"
+}
+COOKIES = {
+    "SESSDATA": "",
+    "bili_jct": "",
+    "buvid3": ""
+}
+
+
+def make_session(pool_size=8):
+    """带连接池和自动重试（429 / 5xx）的 requests Session，可在多个线程之间共用"""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    session.cookies.update(COOKIES)
+    return session
+
+
+def fetch_weekly_json(series_number, session=None, cache_dir=None, rate_limiter=None):
+    """
+    获取指定期数的原始接口响应；设置 cache_dir 时先读 cache_dir/weekly_<期数>.json，
+    没有缓存才请求接口，成功（code 为 0）的响应写入缓存。往期数据不会再变化，重复运行时直接命中缓存
+    """
+    cache_file = os.path.join(cache_dir, f"weekly_{series_number}.json") if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    if rate_limiter:
+        rate_limiter.acquire()
+    if session is None:
+        response = requests.get(WEEKLY_API, params={"number": series_number}, headers=HEADERS, timeout=20,
+                                cookies=COOKIES)
+    else:
+        response = session.get(WEEKLY_API, params={"number": series_number}, timeout=20)
+    response.raise_for_status()  # 检查请求是否成功
+    data = response.json()
+
+    if cache_file and data.get("code") == 0:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    return data
+
+
+WEEKLY_TEXT_FIELDS = {"标题": "title", "BV号": "bvid", "UP主": "owner.name", "封面图": "pic", "分区": "tname"}
+WEEKLY_STAT_FIELDS = {
+    "播放量": "stat.view", "弹幕数": "stat.danmaku", "评论数": "stat.reply", "点赞数": "stat.like",
+    "收藏数": "stat.favorite", "投币数": "stat.coin", "分享数": "stat.share"
+}
+TWO_DIGITS = np.array([f"{i:02d}" for i in range(60)])
+WEEKLY_COLUMNS = ["期数", "标题", "BV号", "AV号", "视频链接", "时长", "UP主", "UP主UID", "UP主主页",
+                  "播放量", "弹幕数", "评论数", "点赞数", "收藏数", "投币数", "分享数", "封面图", "分区", "发布时间"]
+
+
+def format_duration_series(seconds):
+    """format_duration 的列式版本：分、秒查两位数字表拼接，只有超过一小时的行再补上小时"""
+    values = seconds.clip(lower=0).to_numpy(dtype="int64")
+    minutes_seconds = np.char.add(np.char.add(TWO_DIGITS[values % 3600 // 60], ":"), TWO_DIGITS[values % 60])
+    result = minutes_seconds.astype(object)
+    long = values >= 3600
+    if long.any():
+        hours = np.char.zfill((values[long] // 3600).astype(str), 2)
+        result[long] = np.char.add(np.char.add(hours, ":"), minutes_seconds[long])
+    return pd.Series(result, index=seconds.index, dtype=str)
+
+
+def format_timestamp_series(timestamps):
+    """
+    format_timestamp 的列式版本（本地时区，与 datetime.fromtimestamp 一致），非正数为空字符串
+    本地时区偏移只按出现过的整点各查一次（夏令时切换都在整点），再整列加偏移后格式化
+    """
+    values = timestamps.to_numpy(dtype="int64")
+    hours, inverse = np.unique(values // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours], dtype="int64")
+    local = (values + offsets[inverse]).astype("datetime64[s]")
+    text = pd.Series(np.datetime_as_string(local, unit="s"), index=timestamps.index).str.replace("T", " ", regex=False)
+    return text.where(timestamps > 0, "")
 
 
-def get_bilibili_weekly_videos(series_number):
+def normalize_weekly_payload(videos):
     """
-    获取指定期数的B站每周必看视频数据
+    等价于 pd.json_normalize(videos) 的展开（owner.* / stat.* 列），只展开这两个嵌套对象，
+    比通用的 json_normalize 快一个数量级
+    """
+    raw = pd.DataFrame.from_records(videos)
+    parts = [raw]
+    for key in ("owner", "stat"):
+        if key in raw.columns:
+            nested = [value if isinstance(value, dict) else {} for value in raw.pop(key)]
+            parts.append(pd.DataFrame(nested, index=raw.index).add_prefix(f"{key}."))
+    return pd.concat(parts, axis=1)
 
-    Args:
-        series_number (int): 期数（如346期）
 
-    Returns:
-        pd.DataFrame: 包含视频基础信息的DataFrame
+def flatten_weekly_lists(issues):
     """
-    # 1. 构建API URL
-    url = f"https://api.bilibili.com/x/web-interface/popular/series/one?number={series_number}"
-
-    # 2. 设置请求头，模拟浏览器访问
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Referer": "https://www.bilibili.com/"
-    }
-    cookies_dict = {
-        "SESSDATA": "",
-        "bili_jct": "",
-        "buvid3": ""
-    }
+    把多期接口响应中的 list 一次性展开为DataFrame（展开嵌套字段 + 列式格式化），列与逐行构造时完全一致，
+    统计列为 int64
 
+    Args:
+        issues: [(期数, data["data"]["list"]), ...]
+    """
+    videos = []
+    numbers = []
+    for series_number, video_list in issues:
+        videos.extend(video_list)
+        numbers.extend([series_number] * len(video_list))
+    if not videos:
+        return pd.DataFrame(columns=WEEKLY_COLUMNS)
+
+    raw = normalize_weekly_payload(videos)
+
+    def column(name, default):
+        if name not in raw.columns:
+            return pd.Series(default, index=raw.index)
+        return raw[name].fillna(default)
+
+    def id_text(name):
+        """aid / mid 缺失时拼接为空字符串（与逐行版本一致），避免出现 123.0"""
+        if name not in raw.columns:
+            return pd.Series("", index=raw.index)
+        return raw[name].astype("Int64").astype("string").fillna("")
+
+    df = pd.DataFrame({"期数": pd.Series(numbers, index=raw.index, dtype="int64")})
+    for target, source in WEEKLY_TEXT_FIELDS.items():
+        df[target] = column(source, "").astype(str)
+    df["AV号"] = "AV" + id_text("aid")
+    df["视频链接"] = "https://www.bilibili.com/video/" + df["BV号"]
+    df["时长"] = format_duration_series(column("duration", 0).astype("int64"))
+    df["UP主UID"] = column("owner.mid", 0).astype("int64")
+    df["UP主主页"] = "https://space.bilibili.com/" + id_text("owner.mid")
+    for target, source in WEEKLY_STAT_FIELDS.items():
+        df[target] = column(source, 0).astype("int64")
+    df["发布时间"] = format_timestamp_series(column("pubdate", 0).astype("int64"))
+    return df[WEEKLY_COLUMNS]
+
+
+def weekly_videos_to_df(data, series_number):
+    """把接口响应中的视频列表整理为DataFrame"""
+    return flatten_weekly_lists([(series_number, data["data"]["list"])])
+
+
+def fetch_weekly_list(series_number, session=None, cache_dir=None, rate_limiter=None):
+    """获取指定期数的原始视频列表（data.list），失败时打印原因并返回 None"""
     try:
-        # 3. 发送GET请求
-        response = requests.get(url, headers=headers, timeout=20, cookies=cookies_dict)
-        response.raise_for_status()  # 检查请求是否成功
+        data = fetch_weekly_json(series_number, session=session, cache_dir=cache_dir, rate_limiter=rate_limiter)
 
-        # 4. 解析JSON响应
-        data = response.json()
-
-        # 5. 检查API返回状态
+        # 检查API返回状态
         if data.get("code") != 0:
-            print(f"API返回错误: {data.get('message')}")
+            print(f"第{series_number}期API返回错误: {data.get('message')}")
             return None
 
-        # 6. 提取视频列表
-        videos = data["data"]["list"]
-
-        # 7. 提取所需信息
-        video_list = []
-        for video in videos:
-            video_info = {
-                # 视频基础信息
-                "期数": series_number,
-                "标题": video.get("title", ""),
-                "BV号": video.get("bvid", ""),
-                "AV号": f"AV{video.get('aid', '')}",
-                "视频链接": f"https://www.bilibili.com/video/{video.get('bvid', '')}",
-                "时长": format_duration(video.get("duration", 0)),
-
-                # UP主信息
-                "UP主": video.get("owner", {}).get("name", ""),
-                "UP主UID": video.get("owner", {}).get("mid", ""),
-                "UP主主页": f"https://space.bilibili.com/{video.get('owner', {}).get('mid', '')}",
-
-                # 统计信息
-                "播放量": video.get("stat", {}).get("view", 0),
-                "弹幕数": video.get("stat", {}).get("danmaku", 0),
-                "评论数": video.get("stat", {}).get("reply", 0),
-                "点赞数": video.get("stat", {}).get("like", 0),
-                "收藏数": video.get("stat", {}).get("favorite", 0),
-                "投币数": video.get("stat", {}).get("coin", 0),
-                "分享数": video.get("stat", {}).get("share", 0),
-
-                # 其他信息
-                "封面图": video.get("pic", ""),
-                "分区": video.get("tname", ""),
-                "发布时间": format_timestamp(video.get("pubdate", 0))
-            }
-            video_list.append(video_info)
-
-        # 8. 转换为DataFrame并保存
-        df = pd.DataFrame(video_list)
-        return df
+        return data["data"]["list"]
 
     except requests.exceptions.RequestException as e:
         print(f"网络请求错误: {e}")
@@ -92,6 +187,62 @@ def get_bilibili_weekly_videos(series_number):
         return None
 
 
+def get_bilibili_weekly_videos(series_number, session=None, cache_dir=None, rate_limiter=None):
+    """
+    获取指定期数的B站每周必看视频数据
+
+    Args:
+        series_number (int): 期数（如346期）
+        session: 可选的共用 requests Session（见 make_session）
+        cache_dir: 可选的响应缓存目录
+        rate_limiter: 可选的 TokenBucket 限速器
+
+    Returns:
+        pd.DataFrame: 包含视频基础信息的DataFrame
+    """
+    videos = fetch_weekly_list(series_number, session=session, cache_dir=cache_dir, rate_limiter=rate_limiter)
+    if videos is None:
+        return None
+    return flatten_weekly_lists([(series_number, videos)])
+
+
+def fetch_weekly_range(start, end, workers=8, rate=4.0, cache_dir="weekly_cache"):
+    """
+    并发获取第 start 期到第 end 期（含）的每周必看，合并为一个DataFrame（按期数排序）
+    线程池只负责取回原始列表，全部期数最后一次性展开
+
+    Args:
+        workers (int): 并发请求数，共用一个带连接池和重试的 Session
+        rate (float): 每秒最多请求数（命中缓存的期数不占用）
+        cache_dir (str): 原始响应缓存目录，传 None 不使用缓存
+    """
+    session = make_session(pool_size=workers)
+    rate_limiter = TokenBucket(rate, capacity=max(1.0, rate))
+    lists = {}
+    failed = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fetch_weekly_list, number, session, cache_dir, rate_limiter): number
+                for number in range(start, end + 1)
+            }
+            for future in as_completed(futures):
+                number = futures[future]
+                videos = future.result()
+                if not videos:
+                    failed.append(number)
+                else:
+                    lists[number] = videos
+                    print(f"第{number}期: {len(videos)}个视频（已完成 {len(lists)}/{len(futures)}）")
+    finally:
+        session.close()
+
+    if failed:
+        print(f"获取失败的期数: {sorted(failed)}")
+    return flatten_weekly_lists([(number, lists[number]) for number in sorted(lists)])
+
+
 def format_duration(seconds):
     """将秒数格式化为时:分:秒"""
     if seconds <= 0:
@@ -115,21 +266,9 @@ def format_timestamp(timestamp):
 
 
 def save_to_excel(df, series_number):
-    """将数据保存到Excel文件"""
+    """将数据保存到Excel文件（流式写入，列宽按抽样估计）"""
     filename = f"bilibili_weekly_{series_number}.xlsx"
-
-    # 设置Excel写入选项
-    writer = pd.ExcelWriter(filename, engine='openpyxl')
-    df.to_excel(writer, sheet_name=f'第{series_number}期', index=False)
-
-    # 调整列宽
-    worksheet = writer.sheets[f'第{series_number}期']
-    for column in df:
-        column_width = max(df[column].astype(str).map(len).max(), len(column))
-        col_idx = df.columns.get_loc(column)
-        worksheet.column_dimensions[chr(65 + col_idx)].width = min(column_width + 2, 50)
-
-    writer.close()
+    write_excel(df, filename, sheet_name=f'第{series_number}期')
     print(f"数据已保存到文件: {filename}")
     return filename
 
@@ -1,6 +1,11 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from functools import partial
+
 import pandas as pd
-import torch
-from transformers import BertTokenizer, BertForSequenceClassification
 
 # =========================
 # 0. 基本配置（按需修改）
@@ -10,106 +15,589 @@ OUTPUT_CSV = "merged_comments_with_model_sentiment.csv"   # 输出文件
 TEXT_COL   = "content"                                    # 评论文本列名
 
 MODEL_NAME = "IDEA-CCNL/Erlangshen-Roberta-110M-Sentiment"
-BATCH_SIZE = 1024           # 批大小
+BATCH_SIZE = 1024           # 批大小（按长度分桶时为每批最大条数）
 MAX_LEN    = 128          # 最大序列长度
+TOKEN_BUDGET = 16384      # 按长度分桶时每批的 token 上限（条数 × 本批最长序列长度），None 表示按文件顺序固定 BATCH_SIZE 分批
+CACHE_FILE = "sentiment_cache.jsonl"                      # 按文本哈希持久化的推理结果缓存，None 表示不使用
+CHUNK_SIZE = 20000        # 流式模式每块读取的行数，0 表示整表读入内存
+WORKERS    = 1            # 无 GPU 时的推理进程数，>1 时按连续分片多进程推理
+THREADS    = 0            # 每个推理进程的 torch 线程数，0 表示自动（CPU 核数 / 进程数）
+TOKENIZE_WINDOW = 8192    # 后台分词线程每次编码的条数，段内按长度分桶
+PREFETCH   = 4            # 预先准备好的批数（分词与前向计算重叠）
+BACKEND    = "torch"      # 推理后端：torch / onnx / onnx-int8
+ONNX_DIR   = "onnx_model"  # sentiment_onnx.py export 的导出目录
 
 POS_THRESH_HIGH = 0.65    # > 0.65 判定为正向
 POS_THRESH_LOW  = 0.35    # < 0.35 判定为负向
 
+
 # =========================
 # 1. 载入模型
 # =========================
-print(">>> 正在加载模型和分词器...")
-tokenizer = BertTokenizer.from_pretrained(MODEL_NAME)
-model = BertForSequenceClassification.from_pretrained(MODEL_NAME)
+def load_model(model_name=MODEL_NAME, backend=BACKEND, onnx_dir=ONNX_DIR, threads=None):
+    """backend: torch / onnx / onnx-int8，onnx 系列需要先用 sentiment_onnx.py export 导出"""
+    from sentiment_onnx import load_backend
 
-num_labels = model.config.num_labels
-print(f">>> 模型标签数 num_labels = {num_labels}")
+    print(f">>> 正在加载模型和分词器（后端 {backend}）...")
+    tokenizer, model, device = load_backend(model_name, backend, onnx_dir=onnx_dir, threads=threads)
+    print(f">>> 模型标签数 num_labels = {model.config.num_labels}")
+    print(f">>> 模型已加载，使用设备：{device}")
+    return tokenizer, model, device
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
-model.eval()
-print(f">>> 模型已加载，使用设备：{device}")
 
 # =========================
-# 2. 读取数据
+# 2. 分批
 # =========================
-df = pd.read_csv(INPUT_CSV, dtype=str, low_memory=False)
-if TEXT_COL not in df.columns:
-    raise ValueError(f"找不到文本列 '{TEXT_COL}'，当前列有：{list(df.columns)}")
+def build_batches(lengths, batch_size=BATCH_SIZE, token_budget=TOKEN_BUDGET):
+    """
+    返回若干批行号列表
+    token_budget 为 None 时按文件顺序每 batch_size 条一批；否则按 token 长度排序后贪心装批，
+    保证 条数 × 本批最长长度 <= token_budget（单条超出预算时单独成批），短评论可以一批放很多条
+    """
+    if token_budget is None:
+        return [list(range(start, min(start + batch_size, len(lengths))))
+                for start in range(0, len(lengths), batch_size)]
+
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, current = [], []
+    for idx in order:
+        # 升序遍历，当前这条就是加入后本批的最长序列
+        if current and ((len(current) + 1) * lengths[idx] > token_budget or len(current) >= batch_size):
+            batches.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
 
-df[TEXT_COL] = df[TEXT_COL].fillna("").astype(str)
 
-positive_probs = [None] * len(df)
-sentiments = [None] * len(df)
+def padded_tokens(lengths, batches):
+    """每批补齐到本批最长序列后的 token 总数"""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
 
 # =========================
 # 3. 批量推理
 # =========================
-print(f">>> 开始情感推理，共 {len(df)} 条评论...")
-
-for start in range(0, len(df), BATCH_SIZE):
-    end = min(start + BATCH_SIZE, len(df))
-    batch_texts = df[TEXT_COL].iloc[start:end].tolist()
-
-    # 分词编码
-    encoded = tokenizer(
-        batch_texts,
-        padding=True,
-        truncation=True,
-        max_length=MAX_LEN,
-        return_tensors="pt"
-    )
-
-    input_ids = encoded["input_ids"].to(device)
-    attention_mask = encoded["attention_mask"].to(device)
-
-    with torch.no_grad():
-        outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-        logits = outputs.logits              # [batch, num_labels]
-        probs = torch.softmax(logits, dim=-1)
-
-        if num_labels == 2:
-            # 二分类：假设 index 0 = negative, index 1 = positive
-            pos_tensor = probs[:, 1]        # 正向概率
-            pos_list = pos_tensor.cpu().tolist()
-
-            # 根据概率手动映射到 0/1/2
-            batch_positive_prob = []
-            batch_sentiment = []
-            for p in pos_list:
-                batch_positive_prob.append(float(p))
-                if p >= POS_THRESH_HIGH:
-                    s = 2   # 正面
-                elif p <= POS_THRESH_LOW:
-                    s = 0   # 负面
-                else:
-                    s = 1   # 中性
-                batch_sentiment.append(s)
-
-        elif num_labels == 3:
-            # 三分类：假设 0=负面,1=中性,2=正面
-            pos_tensor = probs[:, 2]
-            batch_positive_prob = pos_tensor.cpu().tolist()
-            batch_sentiment = torch.argmax(probs, dim=-1).cpu().tolist()
+def map_sentiment(probs, num_labels):
+    """softmax 概率 -> (正向概率张量, 0/1/2 情感张量)，全部用张量运算完成"""
+    import torch
+
+    if num_labels == 2:
+        # 二分类：假设 index 0 = negative, index 1 = positive
+        pos = probs[:, 1]
+        # <= POS_THRESH_LOW 为 0（负面），>= POS_THRESH_HIGH 为 2（正面），其余为 1（中性）
+        sentiment = (pos > POS_THRESH_LOW).long() + (pos >= POS_THRESH_HIGH).long()
+        return pos, sentiment
+
+    if num_labels == 3:
+        # 三分类：假设 0=负面,1=中性,2=正面
+        return probs[:, 2], torch.argmax(probs, dim=-1)
+
+    raise ValueError(f"不支持的 num_labels={num_labels}，目前只处理 2 类或 3 类情感模型。")
+
+
+def collate(ids_list, pad_id):
+    """把一批不等长的 token id 补齐成 (input_ids, attention_mask) 张量"""
+    import numpy as np
+    import torch
+
+    lengths = np.fromiter((len(ids) for ids in ids_list), dtype=np.int64, count=len(ids_list))
+    width = int(lengths.max())
+    input_ids = np.full((len(ids_list), width), pad_id, dtype=np.int64)
+    for row, ids in enumerate(ids_list):
+        input_ids[row, :len(ids)] = ids
+    attention_mask = (np.arange(width) < lengths[:, None]).astype(np.int64)
+    return torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+
+
+def put_until_stopped(out_queue, item, stop):
+    """往有界队列放入 item；消费者已退出（stop 被设置）时放弃并返回 False，生产者线程不会永久阻塞"""
+    import queue
+
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def produce_batches(texts, tokenizer, out_queue, lengths, batch_size, max_len, token_budget, window, stop):
+    """
+    生产者线程：按 window 条一段分词（快速分词器在 Rust 中批量编码，不占 GIL），段内按长度分桶并补齐成张量，
+    依次放入有界队列；模型在消费上一批时，下一段已经在这里分好词。消费者出错退出时通过 stop 通知停止
+    """
+    try:
+        busy = 0.0
+        for offset in range(0, len(texts), window):
+            start = time.time()
+            # 只截断不补齐，补齐放到组批之后
+            ids = tokenizer(texts[offset:offset + window], truncation=True, max_length=max_len,
+                            return_attention_mask=False, return_token_type_ids=False)["input_ids"]
+            window_lengths = [len(x) for x in ids]
+            lengths.extend(window_lengths)
+            batches = build_batches(window_lengths, batch_size=batch_size, token_budget=token_budget)
+            busy += time.time() - start
+            for batch in batches:
+                start = time.time()
+                input_ids, attention_mask = collate([ids[i] for i in batch], tokenizer.pad_token_id)
+                item = ([offset + i for i in batch], input_ids, attention_mask)
+                busy += time.time() - start
+                if not put_until_stopped(out_queue, item, stop):
+                    return
+        put_until_stopped(out_queue, ("done", busy), stop)
+    except Exception as e:
+        put_until_stopped(out_queue, ("error", e), stop)
+
+
+def predict_texts(texts, tokenizer, model, device, batch_size=BATCH_SIZE, max_len=MAX_LEN,
+                  token_budget=TOKEN_BUDGET, log_every=50, window=TOKENIZE_WINDOW, prefetch=PREFETCH):
+    """
+    对文本列表做情感推理，结果按输入顺序返回 (positive_probs, sentiments, stats)
+    分词和组批在后台线程流水线进行（produce_batches），主线程只做前向计算，结果按行号整体写回；
+    每批只补齐到本批最长序列
+    """
+    import queue
+    import threading
+
+    import numpy as np
+    import torch
+
+    start_time = time.time()
+    if token_budget is None:
+        # 按文件顺序固定分批时，让每段恰好是整数批
+        window = -(-window // batch_size) * batch_size
+    lengths = []
+    batches_queue = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    producer = threading.Thread(target=produce_batches, daemon=True,
+                                args=(texts, tokenizer, batches_queue, lengths, batch_size, max_len,
+                                      token_budget, window, stop))
+    producer.start()
+
+    num_labels = model.config.num_labels
+    positive_probs = np.empty(len(texts), dtype=np.float64)
+    sentiments = np.empty(len(texts), dtype=np.int64)
+    done = batch_no = 0
+    padded = 0
+    wait_seconds = 0.0
+
+    try:
+        while True:
+            wait_start = time.time()
+            item = batches_queue.get()
+            wait_seconds += time.time() - wait_start
+            if item[0] == "error":
+                raise item[1]
+            if item[0] == "done":
+                tokenize_seconds = item[1]
+                break
+            batch, input_ids, attention_mask = item
+
+            with torch.no_grad():
+                outputs = model(input_ids=input_ids.to(device), attention_mask=attention_mask.to(device))
+                probs = torch.softmax(outputs.logits, dim=-1)  # [batch, num_labels]
+                batch_positive_prob, batch_sentiment = map_sentiment(probs, num_labels)
+
+            # 按原始行号整体写回
+            positive_probs[batch] = batch_positive_prob.cpu().numpy()
+            sentiments[batch] = batch_sentiment.cpu().numpy()
+
+            padded += input_ids.numel()
+            done += len(batch)
+            if log_every and (batch_no % log_every == 0 or done == len(texts)):
+                print(f"    已处理 {done}/{len(texts)} 条")
+            batch_no += 1
+    finally:
+        # 正常结束时生产者已退出；前向计算出错时通知生产者停止并清空队列，避免线程阻塞在 put 上
+        stop.set()
+        while not batches_queue.empty():
+            batches_queue.get_nowait()
+        producer.join()
+
+    elapsed = time.time() - start_time
+    real_tokens = sum(lengths)
+    # 对照：按文件顺序固定 batch_size 分批时需要计算的 token 数
+    baseline = padded_tokens(lengths, build_batches(lengths, batch_size=batch_size, token_budget=None))
+    stats = {
+        "rows": len(texts),
+        "batches": batch_no,
+        "real_tokens": real_tokens,
+        "padded_tokens": padded,
+        "baseline_padded_tokens": baseline,
+        "padding_ratio": round(1 - real_tokens / padded, 4) if padded else 0.0,
+        "padding_avoided_tokens": baseline - padded,
+        "tokenize_s": round(tokenize_seconds, 3),
+        "wait_s": round(wait_seconds, 3),
+        "elapsed_s": round(elapsed, 3),
+        "tokens_per_sec": round(real_tokens / elapsed, 1) if elapsed else 0.0,
+        "rows_per_sec": round(len(texts) / elapsed, 1) if elapsed else 0.0,
+    }
+    return positive_probs.tolist(), sentiments.tolist(), stats
+
+
+def cache_model_name(model_name, backend=BACKEND, onnx_dir=ONNX_DIR):
+    """
+    情感缓存的模型标识：按后端和 ONNX 导出文件分开，并带上正负向阈值
+    缓存里存的 0/1/2 标签是按当时的阈值算的，改了阈值后旧标签不会再被命中
+    """
+    from sentiment_onnx import backend_cache_key
+
+    return f"{backend_cache_key(model_name, backend, onnx_dir)}#pos>{POS_THRESH_LOW},>={POS_THRESH_HIGH}"
+
+
+def score_texts(texts, predict, cache=None):
+    """
+    去重 + 缓存后的推理入口：规范化文本去重，先查缓存，只有未命中的文本交给 predict(texts) 推理，新结果写回缓存
+    predict 为单进程的 predict_texts（绑定好模型和分批参数）或 ShardedPredictor.predict
+    返回按输入顺序的 (positive_probs, sentiments, stats)
+    """
+    from sentiment_cache import normalize_text
+
+    normalized = [normalize_text(text) for text in texts]
+    unique = list(dict.fromkeys(normalized))
+    results = {}
+    misses = []
+    for text in unique:
+        hit = cache.get(text) if cache is not None else None
+        if hit is None:
+            misses.append(text)
         else:
-            raise ValueError(f"不支持的 num_labels={num_labels}，目前只处理 2 类或 3 类情感模型。")
+            results[text] = hit
+
+    print(f">>> 共 {len(texts)} 条，去重后 {len(unique)} 条，缓存命中 {len(unique) - len(misses)} 条，"
+          f"需要推理 {len(misses)} 条")
+    positive_probs, sentiments, stats = predict(misses)
+    if cache is not None and misses:
+        cache.put_many(misses, positive_probs, sentiments)
+    results.update(zip(misses, zip(positive_probs, sentiments)))
+
+    stats.update({"input_rows": len(texts), "unique_texts": len(unique),
+                  "cache_hits": len(unique) - len(misses)})
+    return [results[text][0] for text in normalized], [results[text][1] for text in normalized], stats
+
+
+def print_stats(stats):
+    for worker in stats.get("workers", []):
+        print(f"    worker {worker['worker']}（{worker['threads']} 线程）：{worker['rows']} 条，"
+              f"耗时 {worker['elapsed_s']:.1f}s，{worker['rows_per_sec']:.1f} 条/秒，{worker['tokens_per_sec']:.0f} tokens/秒")
+    print(f">>> 模型推理 {stats['rows']} 条，{stats['batches']} 批，耗时 {stats['elapsed_s']:.1f}s"
+          f"（后台分词 {stats['tokenize_s']:.1f}s，模型等待分词 {stats.get('wait_s', 0.0):.1f}s），{stats['rows_per_sec']:.1f} 条/秒，{stats['tokens_per_sec']:.0f} tokens/秒")
+    print(f">>> 有效 token {stats['real_tokens']}，补齐后 {stats['padded_tokens']}（padding 占比 {stats['padding_ratio']:.1%}），"
+          f"比按文件顺序固定分批少算 {stats['padding_avoided_tokens']} 个 token"
+          f"（原需 {stats['baseline_padded_tokens']}）")
+
+
+# =========================
+# 4. 多进程分片推理（CPU）
+# =========================
+_worker = {}
+
+
+def _init_worker(model_name, threads, backend, onnx_dir):
+    """子进程初始化：限制 intra-op 线程数并只加载一次模型"""
+    import torch
+    from sentiment_onnx import load_backend
 
-    # 写回结果
-    for i, idx in enumerate(range(start, end)):
-        positive_probs[idx] = float(batch_positive_prob[i])
-        sentiments[idx] = int(batch_sentiment[i])
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    tokenizer, model, device = load_backend(model_name, backend, onnx_dir=onnx_dir, threads=threads)
+    _worker.update(tokenizer=tokenizer, model=model, device=device, threads=threads)
 
-    if (start // BATCH_SIZE) % 50 == 0 or end == len(df):
-        print(f"    已处理 {end}/{len(df)} 条")
 
-print(">>> 推理完成，正在写入新列...")
+def _predict_shard(job):
+    shard_no, texts, options = job
+    positive_probs, sentiments, stats = predict_texts(texts, _worker["tokenizer"], _worker["model"],
+                                                      _worker["device"], log_every=0, **options)
+    stats.update(worker=shard_no, threads=_worker["threads"], pid=os.getpid())
+    return positive_probs, sentiments, stats
+
+
+class ShardedPredictor:
+    """
+    CPU 多进程推理：启动 workers 个子进程，每个进程加载一次模型并用 torch.set_num_threads(threads) 限制线程数，
+    待推理文本按顺序切成 workers 个连续分片并行处理，结果按分片顺序拼回
+    短序列小批次下单进程多线程扩展性差，多进程各用少量线程能更好地吃满多核
+    """
+
+    def __init__(self, model_name=MODEL_NAME, workers=None, threads=None, backend=BACKEND, onnx_dir=ONNX_DIR,
+                 batch_size=BATCH_SIZE, max_len=MAX_LEN, token_budget=TOKEN_BUDGET):
+        import multiprocessing
+
+        self.workers = workers or max(1, os.cpu_count() // 2)
+        self.threads = threads or max(1, os.cpu_count() // self.workers)
+        self.options = dict(batch_size=batch_size, max_len=max_len, token_budget=token_budget)
+        print(f">>> 启动 {self.workers} 个推理进程，每个 {self.threads} 线程...")
+        # spawn：子进程不继承父进程的 torch 线程池状态
+        self.pool = multiprocessing.get_context("spawn").Pool(
+            self.workers, initializer=_init_worker, initargs=(model_name, self.threads, backend, onnx_dir))
+        # 预热：等子进程加载完模型，避免把加载时间算进第一批的吞吐
+        self.pool.map(_predict_shard, [(i, ["预热"], self.options) for i in range(self.workers)], chunksize=1)
+
+    def predict(self, texts):
+        """与 predict_texts 相同的返回值；stats 中额外带每个 worker 的吞吐"""
+        start_time = time.time()
+        shard_size = -(-len(texts) // self.workers) if texts else 0
+        jobs = [(i, texts[start:start + shard_size], self.options)
+                for i, start in enumerate(range(0, len(texts), shard_size or 1))]
+        results = self.pool.map(_predict_shard, jobs, chunksize=1)
+
+        positive_probs, sentiments, worker_stats = [], [], []
+        for shard_probs, shard_sentiments, stats in results:
+            positive_probs.extend(shard_probs)
+            sentiments.extend(shard_sentiments)
+            worker_stats.append(stats)
+
+        elapsed = time.time() - start_time
+        stats = {key: sum(s[key] for s in worker_stats)
+                 for key in ("rows", "batches", "real_tokens", "padded_tokens", "baseline_padded_tokens")}
+        stats.update({
+            "padding_ratio": round(1 - stats["real_tokens"] / stats["padded_tokens"], 4) if stats["padded_tokens"] else 0.0,
+            "padding_avoided_tokens": stats["baseline_padded_tokens"] - stats["padded_tokens"],
+            "tokenize_s": max((s["tokenize_s"] for s in worker_stats), default=0.0),
+            "wait_s": max((s["wait_s"] for s in worker_stats), default=0.0),
+            "elapsed_s": round(elapsed, 3),
+            "tokens_per_sec": round(stats["real_tokens"] / elapsed, 1) if elapsed else 0.0,
+            "rows_per_sec": round(stats["rows"] / elapsed, 1) if elapsed else 0.0,
+            "workers": worker_stats,
+        })
+        return positive_probs, sentiments, stats
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
 
 # =========================
-# 4. 保存结果
+# 5. 读写 CSV
 # =========================
-df["positive_prob"] = positive_probs   # 0.0 ~ 1.0
-df["sentiment"] = sentiments          # 0=负面,1=中性,2=正面
+def read_texts(df, text_col):
+    if text_col not in df.columns:
+        raise ValueError(f"找不到文本列 '{text_col}'，当前列有：{list(df.columns)}")
+    return df[text_col].fillna("").astype(str).tolist()
+
+
+def predict_csv(input_csv, output_csv, text_col, predict, cache=None):
+    """整表读入内存推理，最后一次性写出"""
+    df = pd.read_csv(input_csv, dtype=str, low_memory=False)
+    texts = read_texts(df, text_col)
+    df[text_col] = texts
+
+    print(f">>> 开始情感推理，共 {len(df)} 条评论...")
+    positive_probs, sentiments, stats = score_texts(texts, predict, cache=cache)
+    print(">>> 推理完成，正在写入新列...")
+    print_stats(stats)
+
+    df["positive_prob"] = positive_probs   # 0.0 ~ 1.0
+    df["sentiment"] = sentiments          # 0=负面,1=中性,2=正面
+    df.to_csv(output_csv, index=False, encoding="utf-8-sig")
+    print(f">>> 已生成新文件：{output_csv}")
+    return len(df)
+
+
+def hash_prefix(path, size):
+    """文件前 size 字节的 sha1"""
+    digest = hashlib.sha1()
+    remaining = size
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def input_fingerprint(path):
+    """输入文件指纹：大小、修改时间和全文 sha1，用来判断重跑时输入是否变化"""
+    stat = os.stat(path)
+    return {"input_size": stat.st_size, "input_mtime": stat.st_mtime, "input_sha1": hash_prefix(path, stat.st_size)}
+
+
+def compare_input(state, input_csv):
+    """
+    对比检查点记录的输入指纹：
+    'same' 未变化；'appended' 旧内容原样保留、只在末尾追加了新行（例如新一轮爬取合并后的总表）；'changed' 其他情况
+    """
+    stat = os.stat(input_csv)
+    size = state.get("input_size")
+    if size is None or state.get("input_sha1") is None:
+        return "changed"  # 旧版本检查点没有指纹
+    if stat.st_size == size and stat.st_mtime == state.get("input_mtime"):
+        return "same"
+    if stat.st_size < size or hash_prefix(input_csv, size) != state["input_sha1"]:
+        return "changed"
+    return "same" if stat.st_size == size else "appended"
+
+
+def load_checkpoint(path, input_csv, verbose=True):
+    """
+    读取流式推理检查点；不存在、对应的不是同一个输入文件或输入内容被改写时返回 None（从头开始）
+    输入只在末尾追加了新行时保留已完成的行，并清除 finished 标记，从新增的行继续打分
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("input") != os.path.abspath(input_csv):
+        if verbose:
+            print(f">>> 检查点 {path} 对应的输入是 {state.get('input')}，忽略并从头开始")
+        return None
+    change = compare_input(state, input_csv)
+    if change == "changed":
+        if verbose:
+            print(f">>> 输入文件 {input_csv} 的内容与检查点记录的不一致，从头开始")
+        return None
+    if change == "appended":
+        if verbose:
+            print(f">>> 输入文件 {input_csv} 末尾有新增数据，从第 {state['rows_done'] + 1} 条继续")
+        state["finished"] = False
+    state.update(input_fingerprint(input_csv))
+    return state
+
+
+def streaming_up_to_date(input_csv, output_csv):
+    """输出已完整且输入未变化时返回 True，可以不加载模型直接结束"""
+    state = load_checkpoint(output_csv + ".checkpoint.json", input_csv, verbose=False)
+    return bool(state and state.get("finished") and os.path.exists(output_csv)
+                and os.path.getsize(output_csv) == state["output_bytes"])
+
+
+def save_checkpoint(path, state):
+    """先写临时文件再替换，避免中途崩溃留下损坏的检查点"""
+    state["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def predict_csv_streaming(input_csv, output_csv, text_col, predict, cache=None, chunk_size=CHUNK_SIZE, resume=True):
+    """
+    分块流式推理：每次读 chunk_size 行，打分后追加写入输出文件，再把已完成行数和输出文件字节数记入
+    <output_csv>.checkpoint.json。中断后重新运行会把输出截断到最后一个完整块，从下一行继续，
+    内存占用只和 chunk_size 有关
+    """
+    checkpoint_file = output_csv + ".checkpoint.json"
+    state = load_checkpoint(checkpoint_file, input_csv) if resume else None
+    if state and state.get("finished"):
+        print(f">>> {output_csv} 已全部完成（{state['rows_done']} 条），如需重跑请加 --no-resume")
+        return state["rows_done"]
+    if state and (not os.path.exists(output_csv) or os.path.getsize(output_csv) < state["output_bytes"]):
+        print(f">>> 输出文件 {output_csv} 与检查点不一致，从头开始")
+        state = None
+
+    if state:
+        rows_done = state["rows_done"]
+        # 丢掉上次崩溃时可能写了一半的块
+        with open(output_csv, "r+b") as f:
+            f.truncate(state["output_bytes"])
+        print(f">>> 从检查点继续：已完成 {rows_done} 条，输出 {state['output_bytes']} 字节")
+    else:
+        rows_done = 0
+        state = {"input": os.path.abspath(input_csv), "output": os.path.abspath(output_csv),
+                 "rows_done": 0, "output_bytes": 0, "finished": False, **input_fingerprint(input_csv)}
+        open(output_csv, "wb").close()
+
+    # 跳过已完成的数据行（保留表头）
+    reader = pd.read_csv(input_csv, dtype=str, chunksize=chunk_size,
+                         skiprows=range(1, rows_done + 1) if rows_done else None)
+    start_time = time.time()
+    rows_this_run = 0
+    for chunk in reader:
+        texts = read_texts(chunk, text_col)
+        chunk[text_col] = texts
+        print(f">>> 第 {rows_done + 1}-{rows_done + len(chunk)} 条...")
+        positive_probs, sentiments, stats = score_texts(texts, predict, cache=cache)
+        print_stats(stats)
+        chunk["positive_prob"] = positive_probs   # 0.0 ~ 1.0
+        chunk["sentiment"] = sentiments          # 0=负面,1=中性,2=正面
+
+        # 第一块带 BOM 和表头，之后的块只追加数据行
+        first = state["output_bytes"] == 0
+        with open(output_csv, "a", encoding="utf-8-sig" if first else "utf-8", newline="") as f:
+            chunk.to_csv(f, index=False, header=first)
+            f.flush()
+            os.fsync(f.fileno())
+
+        rows_done += len(chunk)
+        rows_this_run += len(chunk)
+        state["rows_done"] = rows_done
+        state["output_bytes"] = os.path.getsize(output_csv)
+        save_checkpoint(checkpoint_file, state)
+        elapsed = time.time() - start_time
+        print(f"    已写入 {rows_done} 条，本次运行 {rows_this_run / elapsed:.1f} 条/秒")
+
+    state["finished"] = True
+    save_checkpoint(checkpoint_file, state)
+    print(f">>> 已生成新文件：{output_csv}（共 {rows_done} 条）")
+    return rows_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用 Erlangshen 情感模型给评论打分，输出 positive_prob / sentiment 两列")
+    parser.add_argument("--input", default=INPUT_CSV, help="输入 CSV")
+    parser.add_argument("--output", default=OUTPUT_CSV, help="输出 CSV")
+    parser.add_argument("--text-col", default=TEXT_COL, help="评论文本列名")
+    parser.add_argument("--model", default=MODEL_NAME, help="模型名称或本地路径")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批最大条数")
+    parser.add_argument("--max-len", type=int, default=MAX_LEN, help="最大序列长度")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET,
+                        help="每批 token 上限，0 表示按文件顺序固定分批")
+    parser.add_argument("--cache", default=CACHE_FILE, help="推理结果缓存文件")
+    parser.add_argument("--no-cache", action="store_true", help="不读写缓存（仍会对重复文本去重）")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="流式模式每块行数，0 表示整表读入内存后一次性写出")
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有检查点，从头开始")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="CPU 多进程推理的进程数，1 表示单进程（有 GPU 时忽略）")
+    parser.add_argument("--threads", type=int, default=THREADS,
+                        help="每个推理进程的 torch 线程数，0 表示按 CPU 核数 / 进程数自动分配")
+    parser.add_argument("--backend", default=BACKEND, choices=["torch", "onnx", "onnx-int8"], help="推理后端")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR, help="ONNX 模型目录（python sentiment_onnx.py export 生成）")
+    args = parser.parse_args()
+
+    # 输入没有变化、输出已完整时不必加载模型
+    if args.chunk_size and not args.no_resume and streaming_up_to_date(args.input, args.output):
+        print(f">>> {args.output} 已全部完成且输入未变化，如需重跑请加 --no-resume")
+        return
+
+    cache = None
+    if not args.no_cache and args.cache:
+        from sentiment_cache import SentimentCache
+        cache = SentimentCache(args.cache, model_name=cache_model_name(args.model, args.backend, args.onnx_dir),
+                               max_len=args.max_len)
+
+    import torch
+
+    options = dict(batch_size=args.batch_size, max_len=args.max_len, token_budget=args.token_budget or None)
+    sharded = None
+    if args.workers > 1 and not torch.cuda.is_available():
+        sharded = ShardedPredictor(args.model, workers=args.workers, threads=args.threads or None,
+                                   backend=args.backend, onnx_dir=args.onnx_dir, **options)
+        predict = sharded.predict
+    else:
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        tokenizer, model, device = load_model(args.model, args.backend, args.onnx_dir, threads=args.threads or None)
+        predict = partial(predict_texts, tokenizer=tokenizer, model=model, device=device,
+                          log_every=0 if args.chunk_size else 50, **options)
+
+    try:
+        if args.chunk_size:
+            predict_csv_streaming(args.input, args.output, args.text_col, predict, cache=cache,
+                                  chunk_size=args.chunk_size, resume=not args.no_resume)
+        else:
+            predict_csv(args.input, args.output, args.text_col, predict, cache=cache)
+    finally:
+        if sharded:
+            sharded.close()
+
 
-df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
-print(f">>> 已生成新文件：{OUTPUT_CSV}")
+if __name__ == "__main__":
+    main()
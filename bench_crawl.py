@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from crawl_metrics import PHASES
+from mock_bili_server import MockBiliServer
+
+
+def run_benchmark(comments=300, reply_fanout=5, max_replies=100, latency_ms=50, reply_workers=0,
+                  prune_dom=False, max_comments=50000, output_dir=None, risk_rate=0.0):
+    """
+    启动本地模拟服务，无头运行一次 BilibiliCommentSpider.get_comments，返回吞吐和各阶段耗时分位数
+    """
+    from bilis37commentdevidedv2 import BilibiliCommentSpider
+
+    keep_output = output_dir is not None
+    output_dir = output_dir or tempfile.mkdtemp(prefix='bili_bench_')
+    with MockBiliServer(comments=comments, reply_fanout=reply_fanout, max_replies=max_replies,
+                        latency_ms=latency_ms, risk_rate=risk_rate) as server:
+        spider = BilibiliCommentSpider(headless=True, output_dir=output_dir, resume=False,
+                                       reply_workers=reply_workers, prune_dom=prune_dom, verbose=False,
+                                       home_url=server.url, cookie_file=None, api_base=server.url)
+        try:
+            start = time.perf_counter()
+            total = spider.get_comments(server.video_url, max_comments=max_comments)
+            elapsed = time.perf_counter() - start
+        finally:
+            if spider.driver:
+                spider.driver.quit()
+
+        snapshot = spider.metrics.snapshot()
+        counters = snapshot['counters']
+        result = {
+            'comments': comments,
+            'reply_fanout': reply_fanout,
+            'latency_ms': latency_ms,
+            'reply_workers': reply_workers,
+            'prune_dom': prune_dom,
+            'expected_comments': comments,
+            'expected_replies': server.total_replies,
+            'captured_comments': counters.get('comments_total', 0),
+            'captured_replies': counters.get('replies_total', 0),
+            'processed': total,
+            'elapsed_s': round(elapsed, 3),
+            'comments_per_sec': round(counters.get('comments_total', 0) / elapsed, 2) if elapsed else 0.0,
+            'replies_per_sec': round(counters.get('replies_total', 0) / elapsed, 2) if elapsed else 0.0,
+            'execute_script_calls': counters.get('execute_script_calls', 0),
+            'http_requests': server.request_count,
+            'risk_responses': server.risk_count,
+            'risk_signals': counters.get('risk_signals_total', 0),
+            'pacing_rate': snapshot['gauges'].get('pacing_rate'),
+            'phases': {},
+        }
+        for phase in PHASES:
+            percentiles = spider.metrics.phase_percentiles(phase)
+            result['phases'][phase] = {
+                'count': snapshot['phase_count'].get(phase, 0),
+                'total_s': snapshot['phase_seconds'].get(phase, 0.0),
+                **{k: round(v, 4) if v is not None else None for k, v in percentiles.items()},
+            }
+
+    if not keep_output:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return result
+
+
+def print_report(result):
+    print(f"\n{'=' * 60}")
+    print(f"主评论 {result['captured_comments']}/{result['expected_comments']}，"
+          f"回复 {result['captured_replies']}/{result['expected_replies']}，耗时 {result['elapsed_s']:.1f}s")
+    print(f"吞吐: 评论 {result['comments_per_sec']:.2f} 条/秒，回复 {result['replies_per_sec']:.2f} 条/秒")
+    print(f"execute_script 调用 {result['execute_script_calls']} 次，HTTP 请求 {result['http_requests']} 次")
+    print(f"模拟风控响应 {result['risk_responses']} 次，检测到风控信号 {result['risk_signals']} 次")
+    print(f"\n{'阶段':<14}{'次数':>8}{'总耗时(s)':>12}{'p50(s)':>10}{'p90(s)':>10}{'p99(s)':>10}")
+    for phase, stats in result['phases'].items():
+        cells = [f"{stats[k]:>10.3f}" if stats[k] is not None else f"{'-':>10}" for k in ('p50', 'p90', 'p99')]
+        print(f"{phase:<14}{stats['count']:>8}{stats['total_s']:>12.2f}{''.join(cells)}")
+    print(f"{'=' * 60}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线爬虫基准测试：对本地模拟的 B站评论页运行 get_comments")
+    parser.add_argument('--comments', type=int, default=300, help="主评论数")
+    parser.add_argument('--reply-fanout', type=float, default=5, help="每条主评论的平均回复数")
+    parser.add_argument('--max-replies', type=int, default=100, help="单条主评论的最大回复数")
+    parser.add_argument('--latency-ms', type=int, default=50, help="模拟接口延迟（毫秒）")
+    parser.add_argument('--reply-workers', type=int, default=0, help="回复工作池 worker 数，0 表示在浏览器中翻页")
+    parser.add_argument('--risk-rate', type=float, default=0.0, help="模拟风控：随机返回 412 的接口请求比例")
+    parser.add_argument('--prune-dom', action='store_true', help="提取后清空线程节点")
+    parser.add_argument('--runs', type=int, default=1, help="重复次数")
+    parser.add_argument('--output-dir', default=None, help="保留爬取输出的目录（默认用临时目录并在结束后删除）")
+    parser.add_argument('--json', dest='json_path', default=None, help="把每次结果追加写入该 JSON lines 文件")
+    args = parser.parse_args()
+
+    for i in range(args.runs):
+        print(f"\n第 {i + 1}/{args.runs} 次基准运行...")
+        output_dir = os.path.join(args.output_dir, f"run_{i + 1}") if args.output_dir else None
+        result = run_benchmark(comments=args.comments, reply_fanout=args.reply_fanout,
+                               max_replies=args.max_replies, latency_ms=args.latency_ms,
+                               reply_workers=args.reply_workers, prune_dom=args.prune_dom, output_dir=output_dir,
+                               risk_rate=args.risk_rate)
+        print_report(result)
+        if args.json_path:
+            with open(args.json_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == "__main__":
+    main()
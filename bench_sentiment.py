@@ -0,0 +1,184 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from Erlangshen_model_predict import BATCH_SIZE, MAX_LEN, MODEL_NAME, TOKEN_BUDGET
+from sentiment_onnx import ONNX_DIR
+
+SAMPLE_FILE = "bilibili_comments_batch_120.json"
+
+
+def load_sample_comments(sample_file=SAMPLE_FILE):
+    """样本文件中的全部评论文本（主评论和回复）"""
+    with open(sample_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    texts = []
+    for comment in data:
+        texts.append(comment.get("content") or "")
+        texts.extend(reply.get("content") or "" for reply in comment.get("replies", []))
+    return [text for text in texts if text]
+
+
+def synthetic_corpus(rows, sample_file=SAMPLE_FILE, seed=42):
+    """
+    合成评论语料：长度按样本评论的经验分布抽取，内容取自样本文本拼接后的随机片段，
+    字符分布和长短比例都接近真实评论，又不会出现大量完全重复的文本
+    """
+    comments = load_sample_comments(sample_file)
+    lengths = [len(text) for text in comments]
+    corpus = "".join(comments)
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(rows):
+        length = min(rng.choice(lengths), len(corpus))
+        start = rng.randrange(0, len(corpus) - length + 1)
+        texts.append(corpus[start:start + length])
+    return texts
+
+
+def build_tiny_model(output_dir, texts, seed=42):
+    """
+    随机初始化的小型 BERT（2 层、hidden 128），词表由语料中出现的字符构成，完全离线，只用来比较吞吐
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    os.makedirs(output_dir, exist_ok=True)
+    chars = sorted(set("".join(texts)) | set("abcdefghijklmnopqrstuvwxyz0123456789"))
+    vocab_path = os.path.join(output_dir, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars))
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path)
+    tokenizer.save_pretrained(output_dir)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=128, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=512, max_position_embeddings=512, num_labels=2)
+    BertForSequenceClassification(config).save_pretrained(output_dir)
+    return output_dir
+
+
+def run_config(texts, model_name, backend, onnx_dir, batch_size, max_len, token_budget, threads):
+    """在独立子进程里跑一组配置：设置线程数、加载模型、预热后计时，返回吞吐、padding 和峰值内存"""
+    import resource
+
+    import torch
+    from Erlangshen_model_predict import predict_texts
+    from sentiment_onnx import load_backend
+
+    torch.set_num_threads(threads)
+    tokenizer, model, device = load_backend(model_name, backend, onnx_dir=onnx_dir, threads=threads)
+    options = dict(batch_size=batch_size, max_len=max_len, token_budget=token_budget or None, log_every=0)
+    predict_texts(texts[:64], tokenizer, model, device, **options)  # 预热
+
+    _, _, stats = predict_texts(texts, tokenizer, model, device, **options)
+    # Linux 下 ru_maxrss 单位为 KB
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "backend": backend,
+        "batch_size": batch_size,
+        "max_len": max_len,
+        "token_budget": token_budget,
+        "threads": threads,
+        "rows": stats["rows"],
+        "elapsed_s": stats["elapsed_s"],
+        "rows_per_sec": stats["rows_per_sec"],
+        "tokens_per_sec": stats["tokens_per_sec"],
+        "padding_ratio": stats["padding_ratio"],
+        "wait_s": stats["wait_s"],
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+def run_sweep(texts, model_name, backends=("torch",), batch_sizes=(BATCH_SIZE,), max_lens=(MAX_LEN,),
+              token_budgets=(TOKEN_BUDGET,), threads=(1,), onnx_dir=ONNX_DIR):
+    """遍历所有参数组合，每组配置一个新进程（线程设置和峰值内存互不影响）"""
+    results = []
+    configs = list(itertools.product(backends, batch_sizes, max_lens, token_budgets, threads))
+    for i, (backend, batch_size, max_len, token_budget, n_threads) in enumerate(configs, 1):
+        print(f"[{i}/{len(configs)}] backend={backend} batch_size={batch_size} max_len={max_len} "
+              f"token_budget={token_budget} threads={n_threads}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            result = executor.submit(run_config, texts, model_name, backend, onnx_dir, batch_size, max_len,
+                                     token_budget, n_threads).result()
+        print(f"    {result['rows_per_sec']:.1f} 条/秒，padding {result['padding_ratio']:.1%}，"
+              f"峰值内存 {result['peak_rss_mb']:.0f} MB")
+        results.append(result)
+    return results
+
+
+def print_table(results):
+    print(f"\n{'=' * 96}")
+    print(f"{'后端':<10}{'batch':>7}{'max_len':>8}{'budget':>8}{'线程':>6}{'条/秒':>10}{'tokens/秒':>12}"
+          f"{'padding':>9}{'等待分词(s)':>12}{'峰值内存(MB)':>14}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['batch_size']:>7}{r['max_len']:>8}{r['token_budget']:>8}{r['threads']:>6}"
+              f"{r['rows_per_sec']:>10.1f}{r['tokens_per_sec']:>12.0f}{r['padding_ratio']:>9.1%}"
+              f"{r['wait_s']:>12.2f}{r['peak_rss_mb']:>14.0f}")
+    print(f"{'=' * 96}")
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="情感推理基准测试：合成评论语料上扫描 batch 大小、MAX_LEN、线程数和后端")
+    parser.add_argument("--rows", type=int, default=5000, help="合成语料条数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--sample-file", default=SAMPLE_FILE, help="用来估计评论长度分布的样本文件")
+    parser.add_argument("--tiny", action="store_true", help="使用随机初始化的小型 BERT（完全离线）")
+    parser.add_argument("--model", default=MODEL_NAME, help="真实模型名称或本地路径（只从本地缓存加载）")
+    parser.add_argument("--backends", default="torch", help="逗号分隔：torch,onnx,onnx-int8")
+    parser.add_argument("--onnx-dir", default=ONNX_DIR, help="真实模型的 ONNX 导出目录（--tiny 时自动导出）")
+    parser.add_argument("--batch-sizes", type=int_list, default=[BATCH_SIZE], help="逗号分隔，如 256,1024")
+    parser.add_argument("--max-lens", type=int_list, default=[MAX_LEN], help="逗号分隔，如 64,128")
+    parser.add_argument("--token-budgets", type=int_list, default=[TOKEN_BUDGET],
+                        help="逗号分隔，0 表示按顺序固定分批")
+    parser.add_argument("--threads", type=int_list, default=sorted({1, os.cpu_count() or 1}), help="逗号分隔的线程数")
+    parser.add_argument("--json", dest="json_path", default=None, help="把结果写入该 JSON 文件")
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.rows, sample_file=args.sample_file, seed=args.seed)
+    print(f"合成语料 {len(texts)} 条，平均长度 {sum(map(len, texts)) / len(texts):.1f} 字")
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    tmp_dir = None
+    model_name, onnx_dir = args.model, args.onnx_dir
+    if args.tiny:
+        tmp_dir = tempfile.mkdtemp(prefix="sentiment_bench_")
+        model_name = build_tiny_model(os.path.join(tmp_dir, "tiny_bert"), texts, seed=args.seed)
+        if any(b != "torch" for b in backends):
+            from sentiment_onnx import export_onnx
+            onnx_dir = os.path.join(tmp_dir, "onnx")
+            export_onnx(model_name, onnx_dir, quantize="onnx-int8" in backends)
+    else:
+        # 只用本地已缓存的模型，不触发下载
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    start = time.time()
+    try:
+        results = run_sweep(texts, model_name, backends=backends, batch_sizes=args.batch_sizes,
+                            max_lens=args.max_lens, token_budgets=args.token_budgets, threads=args.threads,
+                            onnx_dir=onnx_dir)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print_table(results)
+    print(f"总耗时 {time.time() - start:.1f}s")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"rows": len(texts), "model": "tiny" if args.tiny else args.model, "results": results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
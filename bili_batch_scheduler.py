@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+from rate_limiter import PerHostRateLimiter
+
+# 爬虫的结束原因（spider.exit_reason）中表示"已经爬完"的几种，其余（风控重试耗尽、滚动上限、异常）视为未完成
+COMPLETE_REASONS = ("end", "max_comments", "caught_up")
+
+
+def load_bvids(path, column="BV号"):
+    """从 1basic.py 导出的每周必看 Excel/CSV 中读取 BV号 列（去重并保持顺序）"""
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+    else:
+        df = pd.read_excel(path, dtype=str)
+    if column not in df.columns:
+        raise ValueError(f"找不到列 '{column}'，当前列有：{list(df.columns)}")
+    bvids = [bv.strip() for bv in df[column].dropna() if re.match(r"^BV[a-zA-Z0-9]+$", bv.strip())]
+    return list(dict.fromkeys(bvids))
+
+
+class CrawlScheduler:
+    """
+    多视频并发爬取调度器：N 个视频同时爬取，所有爬虫共享按域名的令牌桶限速，失败或未爬完的视频自动重试
+    重试不在 worker 线程里等待：到期时间记在 retry_at，由调度循环到期后再提交，等待期间线程可以爬其他视频
+    重试次数用完仍未爬完的视频标记为 incomplete（已爬到的评论保留在存储里）
+    engine='api' 使用 BilibiliReplyApiSpider，engine='selenium' 使用无头 BilibiliCommentSpider
+    selenium 引擎下每个 worker 线程持有一个 BrowserSession，浏览器和登录状态在该线程爬取的视频之间复用
+    delta=True 时 api 引擎只增量抓取上次快照之后的新评论和新回复，合并进各视频已有的存储
+    """
+
+    def __init__(self, bvids, engine="api", workers=4, rate=2.0, burst=4, max_retries=2,
+                 retry_delay=30, output_dir="crawl_output", max_comments=50000, reuse_browser=True,
+                 profile_dir="chrome_profiles", delta=False, stop_after_known=50):
+        self.bvids = list(bvids)
+        self.engine = engine
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.output_dir = output_dir
+        self.max_comments = max_comments
+        self.rate_limiter = PerHostRateLimiter(rate, burst)
+        self.reuse_browser = reuse_browser
+        self.profile_dir = profile_dir
+        self.sessions = {}  # worker 线程名 -> BrowserSession
+        self.delta = delta
+        self.stop_after_known = stop_after_known
+
+        self.lock = threading.Lock()
+        self.progress_file = os.path.join(output_dir, "crawl_progress.json")
+        self.status = {
+            bvid: {"state": "pending", "attempts": 0, "comments": 0, "elapsed": 0.0, "error": "",
+                   "exit_reason": "", "retry_at": 0.0}
+            for bvid in self.bvids
+        }
+
+    def browser_session(self):
+        """当前 worker 线程的浏览器会话，每个线程一个独立的 user-data-dir"""
+        from browser_session import BrowserSession
+        name = threading.current_thread().name
+        with self.lock:
+            if name not in self.sessions:
+                user_data_dir = os.path.join(self.profile_dir, f"worker_{len(self.sessions)}")
+                self.sessions[name] = BrowserSession(user_data_dir=user_data_dir)
+            return self.sessions[name]
+
+    def crawl_one(self, bvid):
+        """爬取单个视频，返回 (主评论条数, 结束原因)；未获取到任何评论视为失败"""
+        video_url = f"https://www.bilibili.com/video/{bvid}"
+        video_dir = os.path.join(self.output_dir, bvid)
+        os.makedirs(video_dir, exist_ok=True)
+
+        if self.engine == "selenium":
+            from bilis37commentdevidedv2 import BilibiliCommentSpider
+            session = self.browser_session() if self.reuse_browser else None
+            spider = BilibiliCommentSpider(headless=True, output_dir=video_dir, rate_limiter=self.rate_limiter,
+                                           lean=True, session=session)
+            try:
+                count = spider.get_comments(video_url=video_url, max_comments=self.max_comments)
+                if (not count or spider.exit_reason not in COMPLETE_REASONS) and session:
+                    session.quit()  # 浏览器状态可能已异常，重试时换一个新的浏览器
+            finally:
+                spider.close_driver()
+        else:
+            from bili_reply_api import BilibiliReplyApiSpider
+            spider = BilibiliReplyApiSpider(rate_limiter=self.rate_limiter)
+            try:
+                if self.delta:
+                    # 增量模式下没有新评论是正常结果，不算失败
+                    count = spider.get_comments_delta(video_url=video_url, output_dir=video_dir,
+                                                      stop_after_known=self.stop_after_known,
+                                                      max_comments=self.max_comments)
+                    return count, spider.exit_reason
+                count = spider.get_comments(video_url=video_url, max_comments=self.max_comments,
+                                            output_dir=video_dir)
+            finally:
+                spider.close()
+
+        if not count:
+            raise RuntimeError(f"未获取到任何评论（{spider.exit_reason}）")
+        return count, spider.exit_reason
+
+    def run_task(self, bvid):
+        """线程池中执行的单次尝试；异常和未爬完在这里转成状态，不向外抛出"""
+        self.update(bvid, state="running", attempts=self.status[bvid]["attempts"] + 1)
+        start = time.time()
+        try:
+            count, reason = self.crawl_one(bvid)
+        except Exception as e:
+            self.retry_or_give_up(bvid, "failed", elapsed=time.time() - start, error=str(e), exit_reason="error")
+            return bvid
+        if reason in COMPLETE_REASONS:
+            self.update(bvid, state="done", comments=count, elapsed=time.time() - start, error="",
+                        exit_reason=reason)
+        else:
+            self.retry_or_give_up(bvid, "incomplete", comments=count, elapsed=time.time() - start,
+                                  error=f"未爬完（{reason}）", exit_reason=reason or "")
+        return bvid
+
+    def retry_or_give_up(self, bvid, final_state, **fields):
+        """还有重试次数时记下到期时间等待调度循环重新提交（间隔随次数递增），否则标记为 final_state"""
+        attempts = self.status[bvid]["attempts"]
+        if attempts <= self.max_retries:
+            self.update(bvid, state="retrying", retry_at=time.time() + self.retry_delay * attempts, **fields)
+        else:
+            self.update(bvid, state=final_state, **fields)
+
+    def update(self, bvid, **fields):
+        with self.lock:
+            self.status[bvid].update(fields)
+            info = self.status[bvid]
+            counts = {}
+            for item in self.status.values():
+                counts[item["state"]] = counts.get(item["state"], 0) + 1
+            print(f"[{bvid}] {info['state']} (第{info['attempts']}次) 评论 {info['comments']} "
+                  f"耗时 {info['elapsed']:.0f}s {info['error']}")
+            print(f"    总进度: 完成 {counts.get('done', 0)}/{len(self.status)}, "
+                  f"进行中 {counts.get('running', 0)}, 待重试 {counts.get('retrying', 0)}, "
+                  f"未爬完 {counts.get('incomplete', 0)}, 失败 {counts.get('failed', 0)}")
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(self.progress_file, "w", encoding="utf-8") as f:
+                json.dump(self.status, f, ensure_ascii=False, indent=2)
+
+    def run(self):
+        """并发执行全部视频，返回每个视频的最终状态"""
+        print(f"开始爬取 {len(self.bvids)} 个视频，并发数 {self.workers}，引擎 {self.engine}")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {executor.submit(self.run_task, bvid) for bvid in self.bvids}
+            delayed = []  # 等待重试到期的视频
+            while pending or delayed:
+                now = time.time()
+                for bvid in [b for b in delayed if self.status[b]["retry_at"] <= now]:
+                    delayed.remove(bvid)
+                    pending.add(executor.submit(self.run_task, bvid))
+                timeout = min(self.status[b]["retry_at"] for b in delayed) - now if delayed else None
+                if not pending:
+                    time.sleep(max(0.0, timeout))
+                    continue
+                finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    bvid = future.result()
+                    if self.status[bvid]["state"] == "retrying":
+                        delayed.append(bvid)
+
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
+
+        failed = [bvid for bvid, info in self.status.items() if info["state"] == "failed"]
+        incomplete = [bvid for bvid, info in self.status.items() if info["state"] == "incomplete"]
+        total = sum(info["comments"] for info in self.status.values())
+        done = len(self.bvids) - len(failed) - len(incomplete)
+        print(f"\n全部完成：成功 {done} 个视频，共 {total} 条主评论")
+        if incomplete:
+            print(f"未爬完视频（已保存部分评论）: {', '.join(incomplete)}")
+        if failed:
+            print(f"失败视频: {', '.join(failed)}")
+        return self.status
+
+
+def main():
+    # 每周必看的视频列表（由 1basic.py 导出），也可以直接写一个 BV号 列表
+    bvids = load_bvids("bilibili_weekly_346.xlsx")
+
+    scheduler = CrawlScheduler(
+        bvids,
+        engine="api",       # 'api' 或 'selenium'
+        workers=4,          # 同时爬取的视频数
+        rate=2.0,           # 每个域名每秒平均请求数
+        burst=4,
+        max_retries=2,
+        delta=False         # True：只增量抓取上次爬取之后的新评论（需要同一个 output_dir）
+    )
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# 请求中每次都会变化的参数（签名、时间戳等），不参与 fixture 匹配
+VOLATILE_PARAMS = {'wts', 'w_rid', '_', 'web_location'}
+
+
+def fixture_key(path, params):
+    """
+    根据请求路径和查询参数生成 fixture 的匹配键（忽略易变参数、参数顺序无关）
+    """
+    items = sorted((str(k), str(v)) for k, v in dict(params).items() if k not in VOLATILE_PARAMS)
+    raw = path + '?' + '&'.join(f"{k}={v}" for k, v in items)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def save_fixture(fixture_dir, path, params, body):
+    """把一次真实响应录制到 fixture 目录"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    key = fixture_key(path, params)
+    record = {
+        'path': path,
+        'params': {str(k): str(v) for k, v in dict(params).items() if k not in VOLATILE_PARAMS},
+        'body': body
+    }
+    with open(os.path.join(fixture_dir, f"{key}.json"), 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False)
+    return key
+
+
+def load_fixtures(fixture_dir):
+    """读取 fixture 目录下的全部录制响应，返回 {key: body}"""
+    fixtures = {}
+    if not os.path.isdir(fixture_dir):
+        return fixtures
+    for name in os.listdir(fixture_dir):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(fixture_dir, name), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        fixtures[fixture_key(record['path'], record['params'])] = record['body']
+    return fixtures
+
+
+class FixtureServer:
+    """
+    本地回放服务器：按路径 + 查询参数返回录制好的 B站接口响应，用于离线测试 HTTP 爬取引擎
+    """
+
+    def __init__(self, fixture_dir, host='127.0.0.1', port=0):
+        self.fixture_dir = fixture_dir
+        self.fixtures = load_fixtures(fixture_dir)
+        self.request_count = 0
+        self.missing = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = dict(parse_qsl(parts.query, keep_blank_values=True))
+                server.request_count += 1
+                body = server.fixtures.get(fixture_key(parts.path, params))
+                if body is None:
+                    server.missing.append(self.path)
+                    status, body = 404, {'code': -404, 'message': '没有对应的录制响应', 'data': None}
+                else:
+                    status = 200
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"回放服务器已启动: {self.url} (共 {len(self.fixtures)} 条录制响应)")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        print("回放服务器已关闭")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # 用法: python bili_fixture_server.py <fixture目录> [端口]
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else 'fixtures'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    server = FixtureServer(fixture_dir, port=port).start()
+    try:
+        input("按回车键停止回放服务器...\n")
+    finally:
+        server.stop()
@@ -0,0 +1,380 @@
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from comment_store import CommentStoreWriter, iter_latest_comments, list_segments
+from comment_normalize import BEIJING
+from crawl_checkpoint import make_comment_id
+from crawl_metrics import CrawlMetrics
+from pacing import PacingController, classify_response
+
+API_BASE = "https://api.bilibili.com"
+
+
+class BilibiliReplyApiSpider:
+    """
+    基于 B站评论 JSON 接口的爬取引擎（无需浏览器）
+    输出记录与 BilibiliCommentSpider 保持同一结构：user_name, user_link, content, like_count, publish_time, replies
+    """
+
+    def __init__(self, api_base=API_BASE, page_size=20, request_interval=0.3,
+                 cookie_file='bili_cookie.txt', record_dir=None, pool_size=8, rate_limiter=None, pacer=None,
+                 risk_retries=3, max_rate=None, metrics=None, pacing_log=None):
+        self.api_base = api_base.rstrip('/')
+        self.page_size = page_size
+        self.request_interval = request_interval  # 初始请求间隔（秒），之后由节奏控制自适应调整
+        self.record_dir = record_dir  # 设置后把每个响应录制为 fixture，供回放服务器使用
+        self.rate_limiter = rate_limiter  # 可选：多个爬虫共享的按域名限速器
+        self.metrics = metrics or CrawlMetrics()
+        # AIMD 节奏控制：未传入且 request_interval 为 0 时不做节奏控制
+        # 速率上限默认就是原来固定间隔对应的速率，只在风控时降速，除非调用方显式放宽 max_rate
+        self.own_pacer = pacer is None and bool(request_interval)
+        if self.own_pacer:
+            rate = 1.0 / request_interval
+            pacer = PacingController(rate=rate, min_rate=min(0.2, rate), max_rate=max_rate or rate,
+                                     metrics=self.metrics, log_path=pacing_log)
+        self.pacer = pacer
+        self.risk_retries = risk_retries  # 遇到风控信号时冷却后重试的次数
+        self.processed_comments = set()
+        self.request_count = 0
+        self.exit_reason = None  # 最近一次爬取的结束原因：end / max_comments / caught_up / error
+
+        # 连接池 + 自动重试
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Referer": "https://www.bilibili.com/"
+        })
+        self.load_cookies(cookie_file)
+
+    def load_cookies(self, cookie_file):
+        """从 bili_cookie.txt 加载 cookie（与浏览器版本同一格式）"""
+        if not cookie_file or not os.path.exists(cookie_file):
+            print("No cookie file found. Running in guest mode.")
+            return False
+        with open(cookie_file, 'r', encoding='utf-8') as f:
+            cookie_str = f.read().strip()
+        for item in cookie_str.split(';'):
+            item = item.strip()
+            if '=' in item:
+                k, v = item.split('=', 1)
+                self.session.cookies.set(k, v, domain='.bilibili.com', path='/')
+        print("Cookies loaded successfully")
+        return True
+
+    def request_json(self, path, params):
+        """
+        发送 GET 请求并返回 data 字段；接口返回非 0 code 时抛出 RuntimeError
+        HTTP 412 / 风控 code 时通知节奏控制冷却后重试，重试 risk_retries 次仍被拦截则抛出
+        """
+        for attempt in range(self.risk_retries + 1):
+            if self.pacer:
+                self.pacer.pace()
+            if self.rate_limiter:
+                self.rate_limiter.acquire(self.api_base)
+            response = self.session.get(self.api_base + path, params=params, timeout=20)
+            self.request_count += 1
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            risk = classify_response(response.status_code, body.get("code"))
+            if not risk:
+                break
+            if not self.pacer or attempt == self.risk_retries:
+                raise RuntimeError(f"请求被风控拦截 {path}: {risk}")
+            self.pacer.risk(risk)
+
+        response.raise_for_status()
+        if self.pacer:
+            self.pacer.success()
+
+        if self.record_dir:
+            from bili_fixture_server import save_fixture
+            save_fixture(self.record_dir, path, params, body)
+
+        if body.get("code") != 0:
+            raise RuntimeError(f"接口返回错误 {path}: code={body.get('code')}, message={body.get('message')}")
+        return body.get("data") or {}
+
+    def get_aid(self, video):
+        """由视频链接 / BV号 / AV号解析出评论接口需要的 oid（即 aid）"""
+        video = str(video)
+        av_match = re.search(r'av(\d+)', video, re.IGNORECASE)
+        if av_match and not re.search(r'BV[a-zA-Z0-9]+', video):
+            return int(av_match.group(1))
+        bv_match = re.search(r'BV[a-zA-Z0-9]+', video)
+        if not bv_match:
+            raise ValueError(f"无法从 {video} 中解析出 BV号")
+        data = self.request_json("/x/web-interface/view", {"bvid": bv_match.group(0)})
+        return int(data["aid"])
+
+    def to_record(self, reply, record_type):
+        """把接口返回的单条评论转换为与浏览器版本一致的记录"""
+        member = reply.get("member") or {}
+        mid = member.get("mid") or reply.get("mid", "")
+        record = {
+            'user_name': member.get("uname", ""),
+            'user_link': f"https://space.bilibili.com/{mid}",
+            'content': (reply.get("content") or {}).get("message", ""),
+            'like_count': int(reply.get("like", 0) or 0),
+            'publish_time': datetime.fromtimestamp(reply.get("ctime", 0), BEIJING).strftime("%Y-%m-%d %H:%M"),
+            'publish_time_utc': datetime.fromtimestamp(reply.get("ctime", 0), timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"),
+            'rpid': reply.get("rpid"),
+            'type': record_type
+        }
+        level = (member.get("level_info") or {}).get("current_level")
+        if level is not None and record_type == 'main_comment':
+            record['user_level'] = str(level)
+        return record
+
+    def make_comment_id(self, comment_data):
+        """根据用户名、内容和发布时间生成评论的唯一标识（与浏览器版本一致）"""
+        return make_comment_id(comment_data)
+
+    def iter_main_replies(self, oid, mode=3):
+        """
+        按游标翻页遍历主评论（mode=3 热度排序，mode=2 时间排序）
+        """
+        next_cursor = 0
+        offset = ""
+        first_page = True
+        while True:
+            params = {"type": 1, "oid": oid, "mode": mode, "next": next_cursor, "ps": self.page_size}
+            if offset:
+                params["pagination_str"] = json.dumps({"offset": offset}, separators=(',', ':'))
+            data = self.request_json("/x/v2/reply/main", params)
+
+            if first_page:
+                for top in data.get("top_replies") or []:
+                    yield top
+                first_page = False
+
+            replies = data.get("replies") or []
+            for reply in replies:
+                yield reply
+
+            cursor = data.get("cursor") or {}
+            offset = ((cursor.get("pagination_reply") or {}).get("next_offset")) or ""
+            if cursor.get("is_end") or not replies:
+                break
+            next_cursor = cursor.get("next", next_cursor + 1)
+
+    def fetch_replies(self, oid, root, max_pages=500, start_page=1):
+        """分页获取某条主评论下的全部楼中楼回复"""
+        all_replies = []
+        page = start_page
+        while page < start_page + max_pages:
+            data = self.request_json("/x/v2/reply/reply",
+                                     {"type": 1, "oid": oid, "root": root, "pn": page, "ps": self.page_size})
+            replies = data.get("replies") or []
+            all_replies.extend(self.to_record(r, 'reply') for r in replies)
+
+            total = (data.get("page") or {}).get("count", 0)
+            if not replies or page * self.page_size >= total:
+                break
+            page += 1
+        return all_replies
+
+    def build_main_comment(self, oid, reply):
+        """
+        构造主评论记录；预览回复不完整时通过楼中楼接口补全
+        rcount 记录接口报告的回复数（含已删除、折叠的回复，可能大于实际能取到的条数），增量模式据此判断回复是否增长
+        """
+        comment_data = self.to_record(reply, 'main_comment')
+        comment_data['comment_id'] = self.make_comment_id(comment_data)
+        comment_data['rcount'] = reply.get("rcount", 0)
+
+        preview = reply.get("replies") or []
+        if reply.get("rcount", 0) > len(preview):
+            try:
+                comment_data['replies'] = self.fetch_replies(oid, reply["rpid"])
+            except Exception as e:
+                print(f"获取楼中楼回复失败 rpid={reply.get('rpid')}: {e}")
+                comment_data['replies'] = [self.to_record(r, 'reply') for r in preview]
+        else:
+            comment_data['replies'] = [self.to_record(r, 'reply') for r in preview]
+        return comment_data
+
+    def iter_comments(self, video, max_comments=50000, mode=3):
+        """逐条产出主评论记录（含回复）"""
+        oid = self.get_aid(video)
+        count = 0
+        for reply in self.iter_main_replies(oid, mode=mode):
+            if count >= max_comments:
+                break
+            comment_data = self.build_main_comment(oid, reply)
+            if comment_data['comment_id'] in self.processed_comments:
+                continue
+            self.processed_comments.add(comment_data['comment_id'])
+            count += 1
+            yield comment_data
+
+    def set_pacing_log(self, output_dir):
+        """自建的节奏控制没有指定日志文件时，状态写入 output_dir/crawl_pacing.jsonl"""
+        if self.own_pacer and not self.pacer.log_path:
+            self.pacer.log_path = os.path.join(output_dir, 'crawl_pacing.jsonl')
+
+    def get_comments(self, video_url, max_comments=50000, output_dir='.', batch_size=100, compress=False):
+        """
+        获取视频评论并按批追加到 output_dir/bilibili_comments_store，返回主评论条数
+        """
+        self.set_pacing_log(output_dir)
+        store_dir = os.path.join(output_dir, 'bilibili_comments_store')
+        count = 0
+        reply_total = 0
+        batch = []
+        start = time.time()
+        self.exit_reason = None
+        with CommentStoreWriter(store_dir, compress=compress) as store:
+            try:
+                for comment_data in self.iter_comments(video_url, max_comments=max_comments):
+                    batch.append(comment_data)
+                    count += 1
+                    reply_total += len(comment_data['replies'])
+                    if len(batch) >= batch_size:
+                        store.append_batch(batch)
+                        batch = []
+                        print(f"已获取 {count} 条主评论，请求数 {self.request_count}")
+                self.exit_reason = 'max_comments' if count >= max_comments else 'end'
+            except Exception as e:
+                print(f"获取评论时发生错误: {e}")
+                self.exit_reason = 'error'
+            store.append_batch(batch)
+
+        if self.pacer:
+            self.pacer.log_state('done')
+        elapsed = time.time() - start
+        print(f"✓ 共 {count} 条主评论、{reply_total} 条回复，耗时 {elapsed:.1f}s，已保存到 {store_dir}")
+        return count
+
+    def reply_key(self, record):
+        """回复去重用的键：有 rpid 用 rpid，浏览器版本的记录没有 rpid 时用内容生成的 ID"""
+        return str(record['rpid']) if record.get('rpid') else self.make_comment_id(record)
+
+    def fetch_new_replies(self, oid, root, known_replies):
+        """
+        楼中楼回复按时间正序分页：只从已知回复所在的最后一页开始抓取（往前多取一页以防有回复被删导致错位），
+        与已知回复合并去重
+        """
+        start_page = max(1, len(known_replies) // self.page_size)
+        fetched = self.fetch_replies(oid, root, start_page=start_page)
+        seen = {self.reply_key(r) for r in known_replies}
+        return list(known_replies) + [r for r in fetched if self.reply_key(r) not in seen]
+
+    def load_snapshot(self, store_dir):
+        """上次爬取的结果：rpid（没有时为 comment_id）-> 最新版本的主评论记录"""
+        snapshot = {}
+        if list_segments(store_dir):
+            for record in iter_latest_comments(store_dir):
+                snapshot[str(record.get('rpid') or record.get('comment_id'))] = record
+        return snapshot
+
+    def get_comments_delta(self, video_url, output_dir='.', stop_after_known=50, max_comments=50000,
+                           batch_size=100, compress=False):
+        """
+        增量重爬：读取该视频上次的存储快照，按时间倒序（mode=2）获取主评论，连续遇到 stop_after_known 条已知评论后停止
+        已知评论只在回复数增长时补抓新增的回复页，点赞数变化时更新记录；新增和变化的记录追加到同一个存储，
+        读取时同一 comment_id 以最后写入的版本为准。返回新增 + 变化的主评论条数
+        """
+        self.set_pacing_log(output_dir)
+        store_dir = os.path.join(output_dir, 'bilibili_comments_store')
+        snapshot = self.load_snapshot(store_dir)
+        if not snapshot:
+            print("没有找到上次的存储快照，执行全量爬取")
+            return self.get_comments(video_url, max_comments=max_comments, output_dir=output_dir,
+                                     batch_size=batch_size, compress=compress)
+
+        print(f"已加载快照：{len(snapshot)} 条主评论，连续 {stop_after_known} 条已知评论后停止")
+        oid = self.get_aid(video_url)
+        new_count = changed_count = known_streak = 0
+        batch = []
+        start = time.time()
+        self.exit_reason = 'end'
+        with CommentStoreWriter(store_dir, compress=compress) as store:
+            try:
+                for reply in self.iter_main_replies(oid, mode=2):
+                    if new_count + changed_count >= max_comments:
+                        self.exit_reason = 'max_comments'
+                        break
+                    record = self.to_record(reply, 'main_comment')
+                    record['comment_id'] = self.make_comment_id(record)
+                    previous = snapshot.get(str(reply.get('rpid'))) or snapshot.get(record['comment_id'])
+
+                    if previous is None:
+                        known_streak = 0
+                        batch.append(self.build_main_comment(oid, reply))
+                        new_count += 1
+                    else:
+                        known_streak += 1
+                        known_replies = previous.get('replies') or []
+                        # 和上次看到的 rcount 比较；rcount 含已删除 / 折叠的回复，和已保存的回复条数比会一直判为增长
+                        # 旧快照没有 rcount 时退回按回复条数比较
+                        rcount = reply.get('rcount', 0)
+                        last_rcount = previous.get('rcount', len(known_replies))
+                        grew = rcount > last_rcount
+                        if (grew or rcount != previous.get('rcount')
+                                or str(previous.get('like_count')) != str(record['like_count'])):
+                            comment_data = dict(previous)
+                            comment_data['like_count'] = record['like_count']
+                            comment_data['rpid'] = record['rpid']
+                            if grew:
+                                try:
+                                    comment_data['replies'] = self.fetch_new_replies(oid, reply['rpid'],
+                                                                                     known_replies)
+                                    comment_data['rcount'] = rcount
+                                except Exception as e:
+                                    # 不更新 rcount，下次增量爬取时重新补抓
+                                    print(f"补抓楼中楼回复失败 rpid={reply.get('rpid')}: {e}")
+                            else:
+                                comment_data['rcount'] = rcount
+                            batch.append(comment_data)
+                            changed_count += 1
+                        if known_streak >= stop_after_known:
+                            print(f"连续 {known_streak} 条已知评论，增量爬取结束")
+                            self.exit_reason = 'caught_up'
+                            break
+
+                    if len(batch) >= batch_size:
+                        store.append_batch(batch)
+                        batch = []
+                        print(f"新增 {new_count} 条、更新 {changed_count} 条主评论，请求数 {self.request_count}")
+            except Exception as e:
+                print(f"增量爬取时发生错误: {e}")
+                self.exit_reason = 'error'
+            store.append_batch(batch)
+
+        if self.pacer:
+            self.pacer.log_state('done')
+        elapsed = time.time() - start
+        print(f"✓ 增量爬取完成：新增 {new_count} 条、更新 {changed_count} 条主评论，"
+              f"请求数 {self.request_count}，耗时 {elapsed:.1f}s，已合并到 {store_dir}")
+        return new_count + changed_count
+
+    def close(self):
+        self.session.close()
+
+
+def main():
+    spider = BilibiliReplyApiSpider()
+    try:
+        video_url = "https://www.bilibili.com/video/BV1bFCWBXEgM"  # 请替换为实际视频URL
+        spider.get_comments(video_url=video_url, max_comments=50000)
+    finally:
+        spider.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,157 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 import time
-import json
 import re
 import os
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
+from browser_session import chromedriver_path
+from content_wait import ContentWaiter
+from comment_store import CommentStoreWriter
+from crawl_checkpoint import CrawlCheckpoint, checkpoint_path, make_comment_id
+from reply_workers import ReplyWorkerPool
+from bili_reply_api import API_BASE
+from crawl_profile import apply_lean_options, enable_lean_profile
+from crawl_metrics import CrawlMetrics
+from comment_normalize import normalize_records
+from pacing import DETECT_RISK_SCRIPT, PacingController
+
+
+# 批量提取脚本：一次 execute_script 遍历整段 Shadow DOM，返回主评论与可见回复的全部字段
+# arguments[0]: 元素列表（评论线程 bili-comment-thread-renderer 或回复容器 bili-comment-replies-renderer）
+# arguments[1]: 'threads' 或 'replies'
+BATCH_EXTRACT_SCRIPT = """
+    var hosts = arguments[0] || [];
+    var mode = arguments[1];
+
+    function sr(host, selector) {
+        return (host && host.shadowRoot) ? host.shadowRoot.querySelector(selector) : null;
+    }
+    function srAll(host, selector) {
+        return (host && host.shadowRoot) ? Array.prototype.slice.call(host.shadowRoot.querySelectorAll(selector)) : [];
+    }
+    function text(el) {
+        return el ? (el.innerText || el.textContent || '').trim() : '';
+    }
+    function buttonLabel(button) {
+        return text(sr(button, '.button__label'));
+    }
+
+    function readUser(item, data, allowSpan) {
+        var userInfo = sr(item, 'bili-comment-user-info');
+        if (!userInfo) return;
+        var nameLink = sr(userInfo, '#user-name a');
+        if (nameLink) {
+            data.user_name = text(nameLink);
+            data.user_link = nameLink.href || nameLink.getAttribute('href') || '';
+        } else if (allowSpan) {
+            var nameSpan = sr(userInfo, '#user-name span');
+            if (nameSpan) {
+                data.user_name = text(nameSpan);
+                data.user_link = '';
+            }
+        }
+        var levelImg = sr(userInfo, '#user-level img');
+        if (levelImg) {
+            var match = /level_(\\d+)/.exec(levelImg.getAttribute('src') || '');
+            if (match) data.user_level = match[1];
+        }
+    }
+
+    function readComment(renderer) {
+        var data = {};
+        readUser(renderer, data, false);
+        var contents = sr(sr(renderer, 'bili-rich-text'), '#contents');
+        if (contents) data.content = text(contents);
+        var actions = sr(renderer, 'bili-comment-action-buttons-renderer');
+        if (actions) {
+            var likeCount = sr(actions, '#like #count');
+            if (likeCount) data.like_count = text(likeCount);
+            var pubdate = sr(actions, '#pubdate');
+            if (pubdate) data.publish_time = text(pubdate);
+        }
+        return data;
+    }
+
+    function readReply(reply) {
+        var data = {};
+        readUser(reply, data, true);
+        delete data.user_level;
+
+        var richText = sr(reply, 'bili-rich-text');
+        if (richText) {
+            var contents = sr(richText, '#contents') || sr(richText, 'span');
+            if (contents) data.content = text(contents);
+        }
+
+        var actions = sr(reply, 'bili-comment-action-buttons-renderer');
+        if (actions) {
+            var pubdate = sr(actions, '#pubdate');
+            if (pubdate) {
+                data.publish_time = text(pubdate);
+            } else {
+                var pubSpan = sr(actions, 'span');
+                if (pubSpan && text(pubSpan).indexOf('前') >= 0) data.publish_time = text(pubSpan);
+            }
+            var likeCount = sr(actions, '#like #count') || sr(actions, 'span.bili-comment__action--count');
+            if (likeCount) data.like_count = text(likeCount);
+        }
+
+        if (Object.keys(data).length === 0) {
+            var fallback = text(reply);
+            if (fallback) {
+                data = {user_name: '未知用户', content: fallback, publish_time: '未知时间', like_count: '0'};
+            }
+        }
+        return data;
+    }
+
+    function readReplies(container) {
+        var result = {replies: [], has_view_more: false, has_next_page: false};
+        if (!container) return result;
+        srAll(container, 'bili-comment-reply-renderer').forEach(function (reply) {
+            var data = readReply(reply);
+            if (Object.keys(data).length) result.replies.push(data);
+        });
+        srAll(container, 'bili-text-button').forEach(function (button) {
+            var label = buttonLabel(button);
+            if (button.hasAttribute('data-idx')) {
+                if (label.indexOf('下一页') >= 0) result.has_next_page = true;
+            } else if (label.indexOf('查看') >= 0) {
+                result.has_view_more = true;
+            }
+        });
+        return result;
+    }
+
+    if (mode === 'replies') {
+        return hosts.map(readReplies);
+    }
+
+    return hosts.map(function (thread) {
+        var renderer = sr(thread, 'bili-comment-renderer');
+        var payload = readReplies(sr(thread, 'bili-comment-replies-renderer'));
+        payload.comment = renderer ? readComment(renderer) : null;
+        // 组件上挂着的原始评论数据，回复工作池需要 rpid / oid 独立翻页
+        var raw = thread.data || thread.__data || null;
+        if (raw) {
+            payload.rpid = raw.rpid_str || (raw.rpid != null ? String(raw.rpid) : null);
+            payload.oid = raw.oid_str || (raw.oid != null ? String(raw.oid) : null);
+            payload.rcount = raw.rcount;
+        }
+        return payload;
+    });
+"""
+
+
+class ThreadNotRendered(Exception):
+    """评论线程的主评论还没渲染出来，这一轮读不到内容，需要下一轮重新处理"""
 
 
 class BilibiliCommentSpider:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, output_dir='.', rate_limiter=None, wait_timeout=8, max_wait_timeout=30,
+                 compress=False, resume=True, reply_workers=0, prune_dom=False, lean=False, verbose=True,
+                 home_url="https://www.bilibili.com", cookie_file='bili_cookie.txt', api_base=API_BASE,
+                 session=None, pacer=None):
         # 设置Chrome选项
         self.chrome_options = Options()
         self.chrome_options.add_argument(
@@ -31,39 +173,120 @@ class BilibiliCommentSpider:
         if headless:
             self.chrome_options.add_argument('--headless=new')
 
+        # 可选：精简爬取模式，不加载视频、图片、字体和统计脚本
+        if lean:
+            apply_lean_options(self.chrome_options)
+        self.lean = lean
+
         self.driver = None
         self.wait = None
+        self.waiter = None  # 事件驱动的内容等待，init_driver 后创建
+        self.render_retry_wait = 1.5  # 新线程大多没有文字时，重新提取前等待渲染的秒数
+        self.wait_timeout = wait_timeout  # 等待新内容的初始超时（秒）
+        self.max_wait_timeout = max_wait_timeout  # 连续无新内容时超时退避的上限（秒）
         self.processed_comments = set()  # 用于记录已处理的评论ID
         self.headless = headless  # 保存headless状态
+        self.output_dir = output_dir  # 输出目录，多视频并发时每个视频单独一个目录
+        self.store_dir = os.path.join(output_dir, 'bilibili_comments_store')  # 只追加的分段 JSONL 存储
+        self.compress = compress  # 分段是否使用 zstd 压缩（需要 zstandard）
+        self.store = None
+        self.resume = resume  # 是否从上次中断的检查点继续
+        self.checkpoint = None
+        self.exit_reason = None  # 最近一次 get_comments 的结束原因：end / max_comments / retries / scroll_limit / error
+        self.reply_workers = reply_workers  # >0 时楼中楼回复交给后台工作池翻页，主评论滚动不再等待
+        self.reply_pool = None
+        self.pending_replies = {}  # comment_id -> (线程序号, 主评论记录, Future)
+        self.prune_dom = prune_dom  # 提取完成后清空线程节点内容，保持浏览器内存和每轮查询开销稳定
+        self.rate_limiter = rate_limiter  # 可选：多个爬虫共享的按域名限速器
+        self.verbose = verbose  # 是否逐条打印评论
+        self.home_url = home_url  # 登录时先访问的主页，基准测试时指向本地模拟服务
+        self.cookie_file = cookie_file  # 为 None 或文件不存在时以游客模式爬取
+        self.api_base = api_base  # 回复工作池使用的接口地址
+        self.session = session  # 可选：BrowserSession，多个视频复用同一个已登录的浏览器
+        self.metrics = CrawlMetrics()  # 分阶段计时和吞吐指标，get_comments 时配置输出文件
+        # 滚动、回复翻页和页面加载共用的 AIMD 节奏控制，状态写入 output_dir/crawl_pacing.jsonl
+        self.pacer = pacer or PacingController(metrics=self.metrics,
+                                               log_path=os.path.join(output_dir, 'crawl_pacing.jsonl'))
+
+    def execute_script(self, script, *args):
+        """统一的 execute_script 入口，顺便统计 WebDriver 往返次数"""
+        self.metrics.inc('execute_script_calls')
+        return self.driver.execute_script(script, *args)
+
+    def throttle(self, url="https://www.bilibili.com"):
+        """向站点发起请求前先按节奏控制等待，再从共享限速器取令牌"""
+        self.pacer.pace()
+        if self.rate_limiter:
+            self.rate_limiter.acquire(url)
+
+    def detect_risk(self):
+        """
+        检查页面上的风控信号（验证码浮层 / 412 拦截页），返回原因字符串，没有风控时返回 None
+        只有文字内容为空的线程不算风控：未渲染完、纯表情 / 图片评论、折叠评论都会这样
+        """
+        try:
+            return self.execute_script(DETECT_RISK_SCRIPT)
+        except Exception as e:
+            print(f"风控检测失败: {e}")
+            return None
+
+    @staticmethod
+    def mostly_empty(payloads):
+        """本轮新线程中超过一半没有文字内容"""
+        empty = sum(1 for p in payloads if not p or not (p.get('comment') or {}).get('content'))
+        return empty * 2 > len(payloads)
+
+    def check_risk(self):
+        """检测到风控信号时通知节奏控制进入冷却，返回是否有风控"""
+        reason = self.detect_risk()
+        if reason:
+            self.pacer.risk(reason)
+        return bool(reason)
 
     def init_driver(self):
-        """初始化浏览器驱动"""
+        """初始化浏览器驱动；有会话时直接复用会话中的 driver"""
+        if self.session:
+            self.driver, created = self.session.get_driver(self.chrome_options)
+            self.wait = WebDriverWait(self.driver, 15)
+            if created:
+                self.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => false})")
+                if self.lean:
+                    enable_lean_profile(self.driver)
+            self.waiter = ContentWaiter(self.driver, timeout=self.wait_timeout, max_timeout=self.max_wait_timeout,
+                                        metrics=self.metrics, pacer=self.pacer)
+            return
+
         try:
-            service = Service(ChromeDriverManager().install())
+            service = Service(chromedriver_path())
             self.driver = webdriver.Chrome(service=service, options=self.chrome_options)
             self.wait = WebDriverWait(self.driver, 15)
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => false})")
+            self.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => false})")
             print("Chrome driver initialized successfully")
         except Exception as e:
             print(f"Driver init failed: {e}")
             # 降级方案：使用普通webdriver
             self.driver = webdriver.Chrome(options=self.chrome_options)
             self.wait = WebDriverWait(self.driver, 15)
+        if self.lean:
+            enable_lean_profile(self.driver)
+        self.waiter = ContentWaiter(self.driver, timeout=self.wait_timeout, max_timeout=self.max_wait_timeout,
+                                    metrics=self.metrics, pacer=self.pacer)
 
     def login_with_cookies(self):
-        """从bili_cookie.txt加载cookie登录"""
+        """从cookie文件（默认bili_cookie.txt）加载cookie登录"""
         try:
-            # 先访问B站主页
-            self.driver.get("https://www.bilibili.com")
-            time.sleep(3)
-
             # 检查cookie文件是否存在
-            if not os.path.exists('bili_cookie.txt'):
+            if not self.cookie_file or not os.path.exists(self.cookie_file):
                 print("No cookie file found. Running in guest mode.")
                 return False
 
+            # 先访问B站主页
+            self.throttle(self.home_url)
+            self.driver.get(self.home_url)
+            time.sleep(3)
+
             # 读取cookie文件
-            with open('bili_cookie.txt', 'r', encoding='utf-8') as f:
+            with open(self.cookie_file, 'r', encoding='utf-8') as f:
                 cookie_str = f.read().strip()
 
             # 解析cookie字符串
@@ -88,6 +311,7 @@ class BilibiliCommentSpider:
                     continue
 
             # 刷新页面使cookie生效
+            self.throttle(self.home_url)
             self.driver.refresh()
             time.sleep(3)
             print("Cookies loaded successfully")
@@ -97,8 +321,17 @@ class BilibiliCommentSpider:
             print(f"Cookie登录失败: {e}")
             return False
 
+    def ensure_login(self):
+        """有会话时只在登录失效后才重新登录，否则每次都执行 cookie 登录"""
+        if self.session:
+            return self.session.ensure_login(self.login_with_cookies)
+        return self.login_with_cookies()
+
     def close_driver(self):
-        """关闭浏览器"""
+        """关闭浏览器；会话中的浏览器留给下一个视频复用，由 BrowserSession.close 关闭"""
+        if self.session:
+            self.driver = None
+            return
         if self.driver:
             # 如果不是无头模式，等待用户确认后再关闭
             if not self.headless:
@@ -123,7 +356,7 @@ class BilibiliCommentSpider:
                 var selector = arguments[1];
                 return host.shadowRoot.querySelector(selector);
             """
-            return self.driver.execute_script(script, host_element, selector)
+            return self.execute_script(script, host_element, selector)
         except Exception as e:
             print(f"获取Shadow DOM元素失败: {e}")
             return None
@@ -138,11 +371,85 @@ class BilibiliCommentSpider:
                 var selector = arguments[1];
                 return host.shadowRoot.querySelectorAll(selector);
             """
-            return self.driver.execute_script(script, host_element, selector)
+            return self.execute_script(script, host_element, selector)
         except Exception as e:
             print(f"获取Shadow DOM元素列表失败: {e}")
             return []
 
+    def get_threads_after(self, comments_container, start):
+        """
+        线程游标：只取回序号 >= start 的评论线程，返回 (线程总数, 新线程列表)
+        优先直接遍历 #feed 的子节点，避免每轮把整个列表序列化回 Python
+        """
+        try:
+            script = """
+                var root = arguments[0].shadowRoot;
+                var start = arguments[1];
+                if (!root) return [0, []];
+                var feed = root.querySelector('#feed');
+                if (feed) {
+                    var children = feed.children;
+                    var result = [];
+                    var total = 0;
+                    for (var i = 0; i < children.length; i++) {
+                        if (children[i].tagName !== 'BILI-COMMENT-THREAD-RENDERER') continue;
+                        if (total >= start) result.push(children[i]);
+                        total++;
+                    }
+                    return [total, result];
+                }
+                var threads = root.querySelectorAll('bili-comment-thread-renderer');
+                return [threads.length, Array.prototype.slice.call(threads, start)];
+            """
+            total, threads = self.execute_script(script, comments_container, start)
+            return total, threads
+        except Exception as e:
+            print(f"获取新评论线程失败: {e}")
+            return start, []
+
+    def prune_threads(self, threads):
+        """
+        清空已提取线程的 Shadow DOM（头像、图片、回复列表等），只保留占位节点，保证线程序号不变
+        """
+        if not threads:
+            return
+        try:
+            self.execute_script("""
+                arguments[0].forEach(function (thread) {
+                    if (thread.shadowRoot) thread.shadowRoot.replaceChildren();
+                    thread.setAttribute('data-crawled', '1');
+                });
+            """, list(threads))
+        except Exception as e:
+            print(f"清理已处理评论节点失败: {e}")
+
+    def extract_threads_batch(self, threads):
+        """
+        一次往返批量提取多个评论线程：主评论字段 + 当前可见回复 + 回复区按钮状态
+        返回与 threads 一一对应的列表；脚本执行失败时返回 None，由调用方降级为逐元素提取
+        """
+        if not threads:
+            return []
+        try:
+            payloads = self.execute_script(BATCH_EXTRACT_SCRIPT, list(threads), 'threads')
+            if payloads is None or len(payloads) != len(threads):
+                return None
+            return payloads
+        except Exception as e:
+            print(f"批量提取评论线程失败，降级为逐元素提取: {e}")
+            return None
+
+    def extract_replies_batch(self, replies_container):
+        """
+        一次往返提取回复容器当前页的全部回复及“下一页”状态，失败时返回 None
+        """
+        try:
+            payloads = self.execute_script(BATCH_EXTRACT_SCRIPT, [replies_container], 'replies')
+            return payloads[0] if payloads else None
+        except Exception as e:
+            print(f"批量提取回复失败，降级为逐元素提取: {e}")
+            return None
+
     def click_view_more_replies(self, replies_container):
         """
         点击"点击查看"按钮来展开更多回复
@@ -160,11 +467,11 @@ class BilibiliCommentSpider:
                         break
 
             if view_more_button:
-                # 使用JavaScript点击，避免元素不可点击的问题
-                self.driver.execute_script("arguments[0].click();", view_more_button)
-                print("点击了'点击查看'按钮")
-                time.sleep(3)  # 等待回复加载
-                return True
+                # 使用JavaScript点击，避免元素不可点击的问题；回复节点一变化就返回
+                self.throttle("https://api.bilibili.com")
+                loaded = self.waiter.click_and_wait(view_more_button, replies_container, 'bili-comment-reply-renderer')
+                print(f"点击了'点击查看'按钮{'' if loaded else '（未检测到回复变化）'}")
+                return loaded
         except Exception as e:
             print(f"点击'点击查看'按钮失败: {e}")
         return False
@@ -194,10 +501,11 @@ class BilibiliCommentSpider:
             for button in pagination_buttons:
                 button_text = self.get_shadow_element(button, '.button__label')
                 if button_text and '下一页' in button_text.text:
-                    self.driver.execute_script("arguments[0].click();", button)
-                    print("点击了回复'下一页'按钮")
-                    time.sleep(3)
-                    return True
+                    self.throttle("https://api.bilibili.com")
+                    loaded = self.waiter.click_and_wait(button, replies_container, 'bili-comment-reply-renderer')
+                    print(f"点击了回复'下一页'按钮{'' if loaded else '（未检测到回复变化）'}")
+                    # 没有变化时当前页仍是上一页，继续翻页只会重复提取同一页
+                    return loaded
         except Exception as e:
             print(f"点击回复下一页失败: {e}")
         return False
@@ -211,37 +519,45 @@ class BilibiliCommentSpider:
             if not replies_container:
                 return []
 
-            # 尝试点击"点击查看"来展开回复
-            if self.click_view_more_replies(replies_container):
-                time.sleep(2)
+            # 尝试点击"点击查看"来展开回复（点击后已等待回复加载）
+            self.click_view_more_replies(replies_container)
 
             # 收集所有回复
             all_replies = []
             page_count = 0
 
             while page_count < max_pages:
-                # 获取当前页的回复
-                reply_elements = self.get_shadow_elements(replies_container, 'bili-comment-reply-renderer')
+                # 获取当前页的回复：优先一次往返批量提取
+                page = self.extract_replies_batch(replies_container)
                 current_page_replies = []
 
-                for reply_elem in reply_elements:
-                    if len(all_replies) + len(current_page_replies) >= 5000:  # 限制每个评论的回复数量
-                        break
-                    reply_data = self.extract_reply_data(reply_elem)
-                    if reply_data:
+                if page is not None:
+                    for reply_data in page['replies']:
+                        if len(all_replies) + len(current_page_replies) >= 5000:  # 限制每个评论的回复数量
+                            break
                         reply_data['type'] = 'reply'
                         current_page_replies.append(reply_data)
+                    has_next_page = page['has_next_page']
+                else:
+                    reply_elements = self.get_shadow_elements(replies_container, 'bili-comment-reply-renderer')
+                    for reply_elem in reply_elements:
+                        if len(all_replies) + len(current_page_replies) >= 5000:
+                            break
+                        reply_data = self.extract_reply_data(reply_elem)
+                        if reply_data:
+                            reply_data['type'] = 'reply'
+                            current_page_replies.append(reply_data)
+                    has_next_page = self.has_next_page_replies(replies_container)
 
                 # 添加到总回复列表
                 all_replies.extend(current_page_replies)
 
                 # 检查是否有下一页
-                if self.has_next_page_replies(replies_container):
+                if has_next_page:
                     print(f"  发现回复第{page_count + 2}页，正在点击...")
                     if self.click_next_page_replies(replies_container):
                         page_count += 1
-                        # 等待新页面加载
-                        time.sleep(2)
+                        self.metrics.inc('reply_pages_total')
                     else:
                         break
                 else:
@@ -259,15 +575,14 @@ class BilibiliCommentSpider:
         确保元素完全可见在视口中
         """
         try:
-            # 使用JavaScript将元素滚动到视口中央
-            self.driver.execute_script(
-                "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center', inline: 'center'});",
+            # 使用JavaScript将元素滚动到视口中央（instant 滚动同步完成，无需等待动画）
+            self.execute_script(
+                "arguments[0].scrollIntoView({behavior: 'instant', block: 'center', inline: 'center'});",
                 element
             )
-            time.sleep(1)
 
             # 检查元素是否在视口中
-            in_viewport = self.driver.execute_script("""
+            in_viewport = self.execute_script("""
                 var elem = arguments[0];
                 var rect = elem.getBoundingClientRect();
                 return (
@@ -280,13 +595,11 @@ class BilibiliCommentSpider:
 
             if not in_viewport:
                 # 如果不在视口中，再次滚动
-                self.driver.execute_script("window.scrollBy(0, -100);")
-                time.sleep(0.5)
-                self.driver.execute_script(
+                self.execute_script("window.scrollBy(0, -100);")
+                self.execute_script(
                     "arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});",
                     element
                 )
-                time.sleep(1)
 
         except Exception as e:
             print(f"确保元素可见时出错: {e}")
@@ -338,8 +651,7 @@ class BilibiliCommentSpider:
                     comment_data['publish_time'] = pubdate_elem.text
 
             # 生成评论的唯一标识
-            comment_id = f"{comment_data.get('user_name', '')}_{comment_data.get('content', '')}_{comment_data.get('publish_time', '')}"
-            comment_data['comment_id'] = hash(comment_id)
+            comment_data['comment_id'] = self.make_comment_id(comment_data)
 
             return comment_data if comment_data else None
 
@@ -347,6 +659,101 @@ class BilibiliCommentSpider:
             print(f"提取评论数据失败: {e}")
             return None
 
+    def thread_rpid(self, thread):
+        """评论线程组件上挂着的原始数据中的 rpid，取不到时返回 None"""
+        try:
+            return self.execute_script(
+                "var raw = arguments[0].data || arguments[0].__data;"
+                "return raw ? (raw.rpid_str || (raw.rpid != null ? String(raw.rpid) : null)) : null;", thread)
+        except Exception:
+            return None
+
+    def make_comment_id(self, comment_data):
+        """评论的唯一标识：优先用 rpid，没有时用用户名、内容和发布时间的 blake2b（见 crawl_checkpoint）"""
+        return make_comment_id(comment_data)
+
+    def build_thread_comment(self, thread, payload=None, thread_index=0):
+        """
+        由评论线程构造完整的主评论记录（含回复），已处理过的评论返回 None
+        主评论还没渲染出来时抛出 ThreadNotRendered，调用方不推进处理位置，下一轮重新处理该线程
+        payload 为批量提取结果；回复区仍有“点击查看”/“下一页”时才逐页展开，否则直接使用可见回复
+        启用回复工作池且拿得到 rpid 时，展开任务提交给工作池，记录进入 pending_replies 等待合并
+        """
+        if payload is not None and not payload.get('comment'):
+            # 批量提取时主评论还没渲染：先滚到可见处再逐元素读取一次
+            payload = None
+        if payload is None:
+            # 降级：逐元素提取
+            self.ensure_element_fully_visible(thread)
+            comment_renderer = self.get_shadow_element(thread, 'bili-comment-renderer')
+            if not comment_renderer:
+                raise ThreadNotRendered("评论线程尚未渲染")
+            comment_data = self.extract_comment_data(comment_renderer)
+            if not comment_data or not (comment_data.get('user_name') or comment_data.get('content')):
+                raise ThreadNotRendered("评论线程尚未渲染")
+            rpid = self.thread_rpid(thread)
+            if rpid:
+                comment_data['rpid'] = rpid
+                comment_data['comment_id'] = self.make_comment_id(comment_data)
+            if comment_data['comment_id'] in self.processed_comments:
+                return None
+            comment_data['type'] = 'main_comment'
+            with self.metrics.phase('reply_expand'):
+                comment_data['replies'] = self.expand_replies_with_pagination(thread)
+            return comment_data
+
+        comment_data = payload['comment']
+        if payload.get('rpid'):
+            comment_data['rpid'] = payload['rpid']
+        comment_data['comment_id'] = self.make_comment_id(comment_data)
+        if comment_data['comment_id'] in self.processed_comments:
+            return None
+        comment_data['type'] = 'main_comment'
+
+        replies = payload.get('replies', [])[:5000]
+        for reply_data in replies:
+            reply_data['type'] = 'reply'
+        comment_data['replies'] = replies
+
+        if payload.get('has_view_more') or payload.get('has_next_page'):
+            if self.reply_pool and payload.get('rpid') and payload.get('oid'):
+                # 先保留可见回复，完整回复由工作池获取后替换
+                future = self.reply_pool.submit(payload['oid'], payload['rpid'])
+                self.pending_replies[comment_data['comment_id']] = (thread_index, comment_data, future)
+            else:
+                with self.metrics.phase('reply_expand'):
+                    self.ensure_element_fully_visible(thread)
+                    comment_data['replies'] = self.expand_replies_with_pagination(thread)
+        return comment_data
+
+    def collect_reply_results(self, wait=False):
+        """取回工作池中已完成的回复任务，合并到对应主评论下；wait=True 时等待全部完成"""
+        finished = []
+        for comment_id, (thread_index, comment_data, future) in list(self.pending_replies.items()):
+            if not wait and not future.done():
+                continue
+            try:
+                comment_data['replies'] = future.result()
+            except Exception as e:
+                print(f"工作池获取回复失败 rpid={comment_data.get('rpid')}，保留可见回复: {e}")
+            del self.pending_replies[comment_id]
+            finished.append(comment_data)
+            self.output_single_comment(comment_data, len(self.processed_comments) - len(self.pending_replies))
+        return finished
+
+    def flush_batch(self, batch_comments, thread_index, processed_count, wait=False):
+        """
+        合并已完成的回复任务后保存本批评论并更新检查点
+        检查点的线程序号不越过仍在等待回复的线程，保证中断后这些线程会被重新处理
+        """
+        batch_comments = batch_comments + self.collect_reply_results(wait=wait)
+        with self.metrics.phase('save'):
+            if batch_comments:
+                self.save_comments_batch(batch_comments, processed_count)
+            pending_indexes = [index for index, _, _ in self.pending_replies.values()]
+            self.save_checkpoint(batch_comments, min(pending_indexes + [thread_index]))
+        self.metrics.set_gauge('pending_reply_jobs', len(self.pending_replies))
+
     def extract_reply_data(self, reply_element):
         """
         从回复元素中提取数据 - 保留devided版本的健壮性
@@ -434,36 +841,44 @@ class BilibiliCommentSpider:
         改进的智能滚动策略，确保加载更多评论
         """
         try:
-            # 记录当前滚动位置
-            current_scroll = self.driver.execute_script("return window.pageYOffset;")
+            # 记录当前滚动位置和评论数量
+            current_scroll = self.execute_script("return window.pageYOffset;")
+            baseline = self.waiter.count_nodes(comments_container, 'bili-comment-thread-renderer') if comments_container else 0
 
             # 方法1：先向上滚动一点，再向下滚动（模拟人类行为）
-            self.driver.execute_script(f"window.scrollTo(0, {current_scroll - 300});")
-            time.sleep(1)
+            self.execute_script(f"window.scrollTo(0, {current_scroll - 300});")
+            self.waiter.settle()
 
-            # 方法2：滚动到页面底部
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            # 方法2：滚动到页面底部（会触发评论接口请求）
+            self.throttle("https://api.bilibili.com")
+            self.execute_script("window.scrollTo(0, document.body.scrollHeight);")
             print(f"  滚动 #{scroll_count}: 滚动到页面底部")
-            time.sleep(3)
 
             # 方法3：滚动到评论容器
             if comments_container:
-                self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'end'});",
+                self.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'end'});",
                                            comments_container)
                 print(f"  滚动 #{scroll_count}: 滚动到评论容器底部")
-                time.sleep(2)
+            self.waiter.settle()
 
             # 方法4：模拟用户滚动行为 - 滚动到页面特定位置
-            current_height = self.driver.execute_script(
+            current_height = self.execute_script(
                 "return document.documentElement.scrollTop || document.body.scrollTop;")
-            viewport_height = self.driver.execute_script("return window.innerHeight;")
+            viewport_height = self.execute_script("return window.innerHeight;")
             scroll_to = current_height + viewport_height * 0.7
-            self.driver.execute_script(f"window.scrollTo(0, {scroll_to});")
+            self.execute_script(f"window.scrollTo(0, {scroll_to});")
             print(f"  滚动 #{scroll_count}: 模拟用户滚动")
-            time.sleep(2)
+
+            # 等待新评论出现（出现即返回，超时则下次等待更久）
+            if comments_container:
+                loaded, count = self.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', baseline)
+                if loaded:
+                    print(f"  新评论已加载: {baseline} -> {count}")
+                else:
+                    print(f"  等待超时未见新评论，下次等待 {self.waiter.timeout:.1f}s")
 
             # 检查是否有新内容加载
-            new_scroll = self.driver.execute_script("return window.pageYOffset;")
+            new_scroll = self.execute_script("return window.pageYOffset;")
             if new_scroll > current_scroll:
                 print(f"  滚动成功，位置变化: {current_scroll} -> {new_scroll}")
             else:
@@ -474,20 +889,22 @@ class BilibiliCommentSpider:
             print(f"滚动失败: {e}")
             return False
 
-    def incremental_scroll_and_process(self, comments_container, max_comments=50000, batch_size=20):
+    def incremental_scroll_and_process(self, comments_container, max_comments=50000, batch_size=20, start_index=0):
         """
         改进的增量滚动并处理评论 - 解决中间评论遗漏问题
+        start_index: 断点续爬时跳过的线程数（这些线程上次已经处理过）
         """
-        processed_count = 0
+        processed_count = len(self.processed_comments)
         scroll_count = 0
         max_scroll_attempts = 300  # 增加最大滚动尝试次数
-        last_comment_count = 0
+        last_comment_count = start_index
         no_new_count = 0
         max_no_new = 20  # 增加连续无新评论的最大次数
+        thread_failures = {}  # 线程序号 -> 处理出错次数
+        max_thread_failures = 3  # 同一线程连续出错这么多次后跳过，避免卡在一个坏线程上
 
         # 初始获取评论
-        comment_threads = self.get_shadow_elements(comments_container, 'bili-comment-thread-renderer')
-        current_count = len(comment_threads)
+        current_count, _ = self.get_threads_after(comments_container, start_index)
         print(f"初始评论数量: {current_count}")
 
         # 添加重试机制
@@ -499,9 +916,8 @@ class BilibiliCommentSpider:
                no_new_count < max_no_new and
                retry_count < max_retries):
 
-            # 处理当前可见的评论
-            comment_threads = self.get_shadow_elements(comments_container, 'bili-comment-thread-renderer')
-            current_count = len(comment_threads)
+            # 处理当前可见的评论：游标只取回上次处理位置之后的线程
+            current_count, new_threads = self.get_threads_after(comments_container, last_comment_count)
 
             print(f"当前可见评论: {current_count}, 已处理: {processed_count}, 滚动次数: {scroll_count}, 无新评论计数: {no_new_count}")
 
@@ -509,54 +925,94 @@ class BilibiliCommentSpider:
                 # 处理新加载的评论
                 batch_comments = []
 
-                # 从上次处理的位置开始处理新评论
-                for i in range(last_comment_count, current_count):
+                # 从上次处理的位置开始处理新评论：新线程的字段一次往返批量取回
+                with self.metrics.phase('extract'):
+                    payloads = self.extract_threads_batch(new_threads)
+                if payloads is None:
+                    payloads = [None] * len(new_threads)
+                else:
+                    # 页面出现验证码 / 拦截页：冷却后重新提取这些线程，不推进处理位置
+                    risk = self.detect_risk()
+                    if risk:
+                        self.pacer.risk(risk)
+                        retry_count += 1
+                        print(f"风控重试计数: {retry_count}/{max_retries}")
+                        self.pacer.pace()  # 等待冷却结束
+                        continue
+                    if self.mostly_empty(payloads):
+                        # 新线程大多没有文字：多半只是还没渲染完，稍等后重新提取一次
+                        self.waiter.settle(self.render_retry_wait)
+                        with self.metrics.phase('extract'):
+                            payloads = self.extract_threads_batch(new_threads) or payloads
+                        if self.mostly_empty(payloads):
+                            # 仍然为空（纯表情 / 图片 / 折叠评论等）：照常处理，只轻度降速
+                            self.metrics.inc('empty_renderers_total')
+                            self.pacer.empty()
+
+                # 游标和检查点只推进到第一个没有处理完的线程之前，中断、出错或尚未渲染的线程下一轮重新处理
+                # （已处理的评论 ID 在 processed_comments 里，重新经过时会被跳过）
+                next_index = current_count
+                for offset, (thread, payload) in enumerate(zip(new_threads, payloads)):
                     if processed_count >= max_comments:
+                        next_index = min(next_index, last_comment_count + offset)
                         break
 
-                    thread = comment_threads[i]
                     try:
-                        # 确保评论元素可见
-                        self.ensure_element_fully_visible(thread)
-
-                        comment_renderer = self.get_shadow_element(thread, 'bili-comment-renderer')
-                        if comment_renderer:
-                            comment_data = self.extract_comment_data(comment_renderer)
-                            if comment_data and comment_data['comment_id'] not in self.processed_comments:
-                                comment_data['type'] = 'main_comment'
+                        comment_data = self.build_thread_comment(thread, payload, last_comment_count + offset)
+                        if comment_data:
+                            self.processed_comments.add(comment_data['comment_id'])
+                            processed_count += 1
+                            if comment_data['comment_id'] in self.pending_replies:
+                                continue  # 回复由工作池获取，完成后随后续批次保存
 
-                                # 展开回复 - 使用修复后的逻辑
-                                comment_data['replies'] = self.expand_replies_with_pagination(thread)
+                            # 添加到批次
+                            batch_comments.append(comment_data)
 
-                                # 添加到批次
-                                batch_comments.append(comment_data)
-                                self.processed_comments.add(comment_data['comment_id'])
-                                processed_count += 1
-
-                                # 立即输出单条评论
-                                self.output_single_comment(comment_data, processed_count)
+                            # 立即输出单条评论
+                            self.output_single_comment(comment_data, processed_count)
 
                     except Exception as e:
-                        print(f"处理评论线程时出错: {e}")
+                        index = last_comment_count + offset
+                        thread_failures[index] = thread_failures.get(index, 0) + 1
+                        if thread_failures[index] < max_thread_failures:
+                            print(f"处理评论线程 #{index} 时出错（第 {thread_failures[index]} 次），下一轮重试: {e}")
+                            next_index = min(next_index, index)
+                        else:
+                            print(f"处理评论线程 #{index} 连续 {thread_failures[index]} 次出错，跳过: {e}")
                         continue
 
-                # 批量保存到文件
-                if batch_comments:
-                    self.save_comments_batch(batch_comments, processed_count)
+                # 批量保存到文件（连同工作池中已完成的评论）
+                self.flush_batch(batch_comments, next_index, processed_count)
+
+                # 可选：清空已提取线程的节点内容，页面 DOM 不再随评论数增长（待重试的线程保留）
+                if self.prune_dom:
+                    self.prune_threads(new_threads[:next_index - last_comment_count])
 
-                last_comment_count = current_count
+                last_comment_count = next_index
                 no_new_count = 0  # 重置无新评论计数
+                self.metrics.set_gauge('no_new_streak', 0)
                 retry_count = 0  # 重置重试计数
 
+            elif self.check_risk():
+                # 验证码 / 拦截页：冷却后继续，不计入无新评论次数
+                retry_count += 1
+                print(f"风控重试计数: {retry_count}/{max_retries}")
+
             else:
                 # 没有新评论
                 no_new_count += 1
+                self.metrics.inc('no_new_total')
+                self.metrics.set_gauge('no_new_streak', no_new_count)
+                self.metrics.max_gauge('no_new_streak_max', no_new_count)
                 print(f"无新评论加载，计数: {no_new_count}/{max_no_new}")
+                if self.pending_replies:
+                    self.flush_batch([], last_comment_count, processed_count)
 
                 # 如果连续多次没有新评论，尝试更激进的滚动
                 if no_new_count % 3 == 0:
                     print("尝试更激进的滚动策略...")
-                    self.aggressive_scroll(comments_container, scroll_count)
+                    with self.metrics.phase('scroll'):
+                        self.aggressive_scroll(comments_container, scroll_count)
 
                 # 如果连续5次没有新评论，尝试重新查找评论容器
                 if no_new_count % 5 == 0:
@@ -572,25 +1028,72 @@ class BilibiliCommentSpider:
             # 执行智能滚动
             if processed_count < max_comments and no_new_count < max_no_new:
                 scroll_count += 1
-                success = self.smart_scroll(comments_container, scroll_count)
+                with self.metrics.phase('scroll'):
+                    success = self.smart_scroll(comments_container, scroll_count)
+                self.metrics.inc('scrolls_total')
 
                 if not success:
                     retry_count += 1
                     print(f"滚动失败，重试计数: {retry_count}/{max_retries}")
 
-                # 偶尔等待更长时间，确保内容加载
-                if scroll_count % 5 == 0:
+                # 偶尔多等一轮，确保内容加载（内容一到即返回）
+                if scroll_count % 5 == 0 and comments_container:
                     print("等待额外时间确保内容加载...")
-                    time.sleep(5)
+                    with self.metrics.phase('scroll'):
+                        self.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', current_count)
 
                 # 每10次滚动后，尝试滚动到页面顶部再回来，刷新内容
                 if scroll_count % 10 == 0:
-                    self.refresh_scroll_position(comments_container)
-
-        print(f"增量处理完成，总共处理了 {processed_count} 条评论")
+                    with self.metrics.phase('scroll'):
+                        self.refresh_scroll_position(comments_container)
+
+            self.metrics.maybe_flush()
+
+        # 等待工作池中剩余的回复任务并保存
+        if self.pending_replies:
+            print(f"等待 {len(self.pending_replies)} 个回复任务完成...")
+            self.flush_batch([], last_comment_count, processed_count, wait=True)
+
+        # 记录结束原因，调用方据此判断是否已经爬完（重试耗尽和滚动上限都说明还有评论没加载出来）
+        if processed_count >= max_comments:
+            self.exit_reason = 'max_comments'
+        elif no_new_count >= max_no_new:
+            self.exit_reason = 'end'
+        elif retry_count >= max_retries:
+            self.exit_reason = 'retries'
+        else:
+            self.exit_reason = 'scroll_limit'
+
+        print(f"增量处理完成，总共处理了 {processed_count} 条评论，结束原因: {self.exit_reason}")
         print(f"最终统计 - 滚动次数: {scroll_count}, 无新评论连续次数: {no_new_count}, 重试次数: {retry_count}")
         return processed_count
 
+    def save_checkpoint(self, batch_comments, thread_index):
+        """批次写入存储后更新检查点：已处理 ID、最后处理的线程序号和滚动位置"""
+        if not self.checkpoint:
+            return
+        try:
+            scroll_y = self.execute_script("return window.pageYOffset;")
+            self.checkpoint.record_batch([c['comment_id'] for c in batch_comments], thread_index, scroll_y)
+        except Exception as e:
+            print(f"保存检查点失败: {e}")
+
+    def resume_scroll(self, comments_container, target_count, scroll_y, max_stalls=5):
+        """
+        断点续爬：反复滚动到底部直到加载出上次处理到的线程数，返回实际加载到的线程数
+        """
+        print(f"从检查点恢复：目标线程数 {target_count}，上次滚动位置 {scroll_y}")
+        self.execute_script(f"window.scrollTo(0, {scroll_y});")
+        count = self.waiter.count_nodes(comments_container, 'bili-comment-thread-renderer')
+        stalls = 0
+        while count < target_count and stalls < max_stalls:
+            self.throttle("https://api.bilibili.com")
+            self.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            loaded, count = self.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', count)
+            stalls = 0 if loaded else stalls + 1
+            print(f"  恢复中: 已加载 {count}/{target_count} 个线程")
+        return min(count, target_count)
+
     def refresh_scroll_position(self, comments_container):
         """
         刷新滚动位置，解决内容卡住不加载的问题
@@ -598,21 +1101,23 @@ class BilibiliCommentSpider:
         try:
             print("执行刷新滚动位置操作...")
 
+            baseline = self.waiter.count_nodes(comments_container, 'bili-comment-thread-renderer') if comments_container else 0
+
             # 先滚动到顶部
-            self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(2)
+            self.execute_script("window.scrollTo(0, 0);")
+            self.waiter.settle()
 
             # 再滚动到底部
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(3)
+            self.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            self.waiter.settle()
 
-            # 最后滚动到评论区域
+            # 最后滚动到评论区域，并等待可能触发的新评论
             if comments_container:
-                self.driver.execute_script(
-                    "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});",
+                self.execute_script(
+                    "arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});",
                     comments_container
                 )
-                time.sleep(2)
+                self.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', baseline)
 
             print("刷新滚动位置完成")
             return True
@@ -626,8 +1131,9 @@ class BilibiliCommentSpider:
         """
         try:
             # 方法1：滚动到特定位置
-            current_scroll = self.driver.execute_script("return window.pageYOffset;")
-            viewport_height = self.driver.execute_script("return window.innerHeight;")
+            current_scroll = self.execute_script("return window.pageYOffset;")
+            viewport_height = self.execute_script("return window.innerHeight;")
+            baseline = self.waiter.count_nodes(comments_container, 'bili-comment-thread-renderer') if comments_container else 0
 
             # 滚动到不同位置
             scroll_positions = [
@@ -637,20 +1143,20 @@ class BilibiliCommentSpider:
             ]
 
             for pos in scroll_positions:
-                self.driver.execute_script(f"window.scrollTo(0, {pos});")
-                time.sleep(1)
+                self.execute_script(f"window.scrollTo(0, {pos});")
+                self.waiter.settle()
                 print(f"  激进滚动到位置: {pos}")
 
             # 方法2：快速滚动到底部再回到中间
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
-            time.sleep(2)
+            self.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            self.waiter.settle()
+            self.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
+            self.waiter.settle()
 
-            # 方法3：如果评论容器存在，在其内部滚动
+            # 方法3：如果评论容器存在，在其内部滚动，并等待新评论
             if comments_container:
-                self.driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight;", comments_container)
-                time.sleep(1)
+                self.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight;", comments_container)
+                self.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', baseline)
 
             return True
 
@@ -660,6 +1166,8 @@ class BilibiliCommentSpider:
 
     def output_single_comment(self, comment_data, count):
         """立即输出单条评论信息"""
+        if not self.verbose:
+            return
         print(f"\n[{count}] 新评论:")
         print(f"   用户: {comment_data.get('user_name', '未知')}")
         print(f"   内容: {comment_data.get('content', '')[:100]}...")
@@ -669,41 +1177,15 @@ class BilibiliCommentSpider:
         print(f"   等级: {comment_data.get('user_level', '未知')}")
 
     def save_comments_batch(self, batch_comments, current_count):
-        """批量保存评论到文件"""
-        try:
-            filename = f'bilibili_comments_batch_{current_count}.json'
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(batch_comments, f, ensure_ascii=False, indent=2)
-            print(f"✓ 已保存批次到 {filename} (包含 {len(batch_comments)} 条评论)")
-
-            # 同时更新主文件
-            self.update_main_file(batch_comments)
-
-        except Exception as e:
-            print(f"保存批次文件时出错: {e}")
-
-    def update_main_file(self, new_comments):
-        """更新主评论文件"""
+        """批量追加评论到分段存储（写入后 fsync），写入前把点赞数和发布时间规范化"""
         try:
-            main_filename = 'bilibili_comments_all.json'
-            existing_comments = []
-
-            # 读取现有评论
-            if os.path.exists(main_filename):
-                with open(main_filename, 'r', encoding='utf-8') as f:
-                    existing_comments = json.load(f)
-
-            # 添加新评论
-            existing_comments.extend(new_comments)
-
-            # 写回文件
-            with open(main_filename, 'w', encoding='utf-8') as f:
-                json.dump(existing_comments, f, ensure_ascii=False, indent=2)
-
-            print(f"✓ 主文件已更新，总计 {len(existing_comments)} 条评论")
-
+            normalize_records(batch_comments, crawl_time=time.time())
+            self.store.append_batch(batch_comments)
+            self.metrics.inc('comments_total', len(batch_comments))
+            self.metrics.inc('replies_total', sum(len(c.get('replies') or []) for c in batch_comments))
+            print(f"✓ 已追加 {len(batch_comments)} 条评论到 {self.store.segment_path}，总计 {current_count} 条")
         except Exception as e:
-            print(f"更新主文件时出错: {e}")
+            print(f"保存批次时出错: {e}")
 
     def get_comments(self, video_url, max_comments=50000):
         """
@@ -712,67 +1194,111 @@ class BilibiliCommentSpider:
         if not self.driver:
             self.init_driver()
 
+        self.exit_reason = None
         try:
             # 先登录
             print("正在尝试登录...")
-            login_success = self.login_with_cookies()
+            login_success = self.ensure_login()
             if login_success:
                 print("登录成功！")
             else:
                 print("以游客模式继续...")
 
-            print(f"正在访问视频页面: {video_url}")
-            self.driver.get(video_url)
-
-            # 等待页面加载
-            time.sleep(5)
+            self.initialize_metrics(video_url)
 
-            # 等待评论容器加载
-            print("等待评论区域加载...")
-            comments_container = self.wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "bili-comments"))
-            )
+            print(f"正在访问视频页面: {video_url}")
+            self.throttle(video_url)
+            with self.metrics.phase('page_load'):
+                self.driver.get(video_url)
+
+                # 等待评论容器加载
+                print("等待评论区域加载...")
+                comments_container = self.wait.until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "bili-comments"))
+                )
+            self.check_risk()
 
-            # 初始化主文件
-            self.initialize_main_file()
+            # 打开评论存储和检查点
+            self.initialize_store()
+            self.initialize_checkpoint(video_url)
+            if self.reply_workers and not self.reply_pool:
+                self.reply_pool = ReplyWorkerPool(self.reply_workers, cookie_file=self.cookie_file,
+                                                  rate_limiter=self.rate_limiter, api_base=self.api_base,
+                                                  pacer=self.pacer)
 
             # 先滚动几次确保初始评论加载
             print("执行初始滚动加载评论...")
             for i in range(3):
-                self.smart_scroll(comments_container, i)
-                time.sleep(2)
+                with self.metrics.phase('scroll'):
+                    self.smart_scroll(comments_container, i)
+
+            # 断点续爬：先把上次已处理的线程加载出来并跳过
+            start_index = 0
+            if self.checkpoint and self.checkpoint.last_thread_index > 0:
+                start_index = self.resume_scroll(comments_container, self.checkpoint.last_thread_index,
+                                                 self.checkpoint.scroll_y)
 
             # 增量滚动和处理评论
             print("开始增量加载评论...")
             total_processed = self.incremental_scroll_and_process(
                 comments_container,
                 max_comments=max_comments,
-                batch_size=20
+                batch_size=20,
+                start_index=start_index
             )
 
             return total_processed
 
         except Exception as e:
             print(f"获取评论时发生错误: {e}")
+            self.exit_reason = 'error'
             return 0
 
-    def initialize_main_file(self):
-        """初始化主评论文件"""
-        try:
-            main_filename = 'bilibili_comments_all.json'
-            if not os.path.exists(main_filename):
-                with open(main_filename, 'w', encoding='utf-8') as f:
-                    json.dump([], f, ensure_ascii=False, indent=2)
-                print("主评论文件已初始化")
-        except Exception as e:
-            print(f"初始化主文件时出错: {e}")
+        finally:
+            self.metrics.flush()
+            if self.reply_pool:
+                self.reply_pool.shutdown()
+                self.reply_pool = None
+            self.pending_replies = {}
+            if self.store:
+                self.store.close()
+                self.store = None
+
+    def initialize_store(self):
+        """打开分段评论存储，本次运行从新分段开始追加"""
+        self.store = CommentStoreWriter(self.store_dir, compress=self.compress)
+        print(f"评论存储已打开: {self.store.segment_path}")
+
+    def initialize_metrics(self, video_url):
+        """指标输出到 output_dir：crawl_metrics.jsonl（快照流水）和 crawl_metrics.prom（Prometheus textfile）"""
+        match = re.search(r'BV[a-zA-Z0-9]+', str(video_url))
+        self.metrics.configure(
+            jsonl_path=os.path.join(self.output_dir, 'crawl_metrics.jsonl'),
+            prom_path=os.path.join(self.output_dir, 'crawl_metrics.prom'),
+            labels={'video': match.group(0) if match else 'unknown'}
+        )
+
+    def initialize_checkpoint(self, video_url):
+        """加载（或新建）该视频的检查点，已处理的评论 ID 直接并入 processed_comments"""
+        path = checkpoint_path(self.output_dir, video_url)
+        if self.resume:
+            self.checkpoint = CrawlCheckpoint.load(path, video_url)
+        else:
+            # 不续爬时连同只追加的 .ids 一起清掉，否则旧 ID 会在下次续爬时被当成已处理
+            self.checkpoint = CrawlCheckpoint(path, video_url)
+            self.checkpoint.clear()
+        if self.checkpoint.resumable:
+            self.processed_comments.update(self.checkpoint.processed_ids)
+            print(f"发现检查点 {path}：已处理 {len(self.checkpoint.processed_ids)} 条评论，"
+                  f"上次处理到第 {self.checkpoint.last_thread_index} 个线程")
 
     def print_final_summary(self, total_comments):
         """打印最终统计信息"""
         print(f"\n{'=' * 50}")
         print(f"🎉 爬取完成!")
         print(f"📊 总评论数: {total_comments}")
-        print(f"💾 数据已保存到: bilibili_comments_all.json")
+        print(f"💾 数据已保存到: {self.store_dir}（可用 comment_store.py 导出为 JSON）")
+        self.metrics.summary()
         print(f"{'=' * 50}")
 
 
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+# 登录状态检查：在 B站页面内请求 nav 接口（带上浏览器自身的 cookie），返回 isLogin
+NAV_CHECK_SCRIPT = """
+    var done = arguments[arguments.length - 1];
+    fetch('https://api.bilibili.com/x/web-interface/nav', {credentials: 'include'})
+        .then(function (r) { return r.json(); })
+        .then(function (body) { done({ok: true, login: !!(body.data && body.data.isLogin)}); })
+        .catch(function (e) { done({ok: false, error: String(e)}); });
+"""
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def chromedriver_path():
+    """
+    ChromeDriverManager().install() 每次都要联网检查版本，这里整个进程只执行一次，之后直接返回缓存的路径
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None or not os.path.exists(_driver_path):
+            from webdriver_manager.chrome import ChromeDriverManager
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+class BrowserSession:
+    """
+    可在多个视频之间复用的浏览器会话：持久化的 Chrome user-data-dir + 常驻 driver
+    cookie 保存在 profile 中，只有检测到登录失效时才重新执行 cookie 登录
+    同一个 user-data-dir 不能被多个 Chrome 同时使用，并发爬取时每个 worker 需要各自的会话
+    """
+
+    def __init__(self, user_data_dir='chrome_profile', cookie_file='bili_cookie.txt',
+                 home_url="https://www.bilibili.com", check_interval=1800):
+        self.user_data_dir = os.path.abspath(user_data_dir)
+        self.cookie_file = cookie_file
+        self.home_url = home_url
+        self.check_interval = check_interval  # 两次登录状态检查的最小间隔（秒）
+        self.driver = None
+        self.logged_in = False
+        self.last_check = 0.0
+        self.logins = 0  # 实际执行 cookie 登录的次数
+        self.reuses = 0  # 复用已有 driver 的次数
+
+    def alive(self):
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def get_driver(self, chrome_options):
+        """
+        返回 (driver, 是否新建)：已有 driver 存活时直接复用，否则用持久化 profile 新建一个
+        """
+        if self.alive():
+            self.reuses += 1
+            return self.driver, False
+
+        self.quit()
+        os.makedirs(self.user_data_dir, exist_ok=True)
+        if not any(arg.startswith('--user-data-dir=') for arg in chrome_options.arguments):
+            chrome_options.add_argument(f'--user-data-dir={self.user_data_dir}')
+        try:
+            self.driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+        except Exception as e:
+            print(f"Driver init failed: {e}")
+            self.driver = webdriver.Chrome(options=chrome_options)
+        self.logged_in = False
+        self.last_check = 0.0
+        print(f"浏览器会话已启动，profile: {self.user_data_dir}")
+        return self.driver, True
+
+    def on_bilibili(self):
+        try:
+            return self.driver.current_url.startswith(self.home_url)
+        except Exception:
+            return False
+
+    def check_login(self):
+        """在当前 B站页面检查登录状态；nav 接口不可用时退回到检查 SESSDATA cookie 是否存在且未过期"""
+        try:
+            result = self.driver.execute_async_script(NAV_CHECK_SCRIPT)
+            if result and result.get('ok'):
+                return result['login']
+        except Exception as e:
+            print(f"登录状态检查失败，改为检查 cookie: {e}")
+        cookie = self.driver.get_cookie('SESSDATA')
+        return bool(cookie) and cookie.get('expiry', time.time() + 60) > time.time()
+
+    def ensure_login(self, login):
+        """
+        确保会话处于登录状态；login 为执行 cookie 登录的函数（BilibiliCommentSpider.login_with_cookies）
+        在检查间隔内且之前已登录时不做任何请求
+        """
+        if not self.cookie_file or not os.path.exists(self.cookie_file):
+            return False
+        if self.logged_in and time.time() - self.last_check < self.check_interval:
+            return True
+
+        # profile 里可能已有有效 cookie：先在 B站页面上检查一次，失效才重新登录
+        if not self.on_bilibili():
+            self.driver.get(self.home_url)
+        self.logged_in = self.check_login()
+        if not self.logged_in:
+            print("会话未登录或已过期，重新执行 cookie 登录...")
+            self.logins += 1
+            self.logged_in = login() and self.check_login()
+        self.last_check = time.time()
+        return self.logged_in
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+        self.logged_in = False
+
+    def close(self):
+        self.quit()
+        print(f"浏览器会话已关闭（复用 {self.reuses} 次，重新登录 {self.logins} 次）")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
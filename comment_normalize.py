@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import time
+from datetime import timedelta, timezone
+
+import pandas as pd
+
+# B站页面显示的时间均为北京时间（无夏令时，固定 UTC+8）
+BEIJING = timezone(timedelta(hours=8))
+
+LIKE_SCALES = {'万': 1e4, 'w': 1e4, 'W': 1e4, '亿': 1e8, 'k': 1e3, 'K': 1e3}
+RELATIVE_UNITS = {'秒': 's', '分钟': 'min', '小时': 'h', '天': 'D'}
+DAY_OFFSETS = {'今天': 0, '昨天': 1, '前天': 2}
+
+ABSOLUTE_PATTERN = (r'^(?:(?P<year>\d{4})-)?(?P<month>\d{1,2})-(?P<day>\d{1,2})'
+                    r'(?:\s+(?P<hour>\d{1,2}):(?P<minute>\d{2}))?')
+DAY_PATTERN = r'^(?P<word>今天|昨天|前天)\s*(?P<hour>\d{1,2}):(?P<minute>\d{2})'
+RELATIVE_PATTERN = r'^(?P<amount>\d+)\s*(?P<unit>秒|分钟|小时|天)前'
+
+
+def to_utc_timestamp(crawl_time=None):
+    """爬取时间（None=现在、epoch 秒、datetime 或字符串）转为 UTC 的 pd.Timestamp，无时区信息的按北京时间处理"""
+    if crawl_time is None:
+        crawl_time = time.time()
+    if isinstance(crawl_time, (int, float)):
+        return pd.Timestamp(crawl_time, unit='s', tz='UTC')
+    timestamp = pd.Timestamp(crawl_time)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize(BEIJING)
+    return timestamp.tz_convert('UTC')
+
+
+def as_text(values):
+    return pd.Series(values, dtype='object').astype('string').str.strip()
+
+
+def normalize_like_counts(values):
+    """
+    点赞数显示文本（'', '赞', '123', '1,234', '1.2万', '3亿'）转为 int64，无法识别的按 0 处理
+    """
+    # 先去掉千位分隔符，否则 '1,234' 只会取到 1
+    text = as_text(values).str.replace(r'[,，]', '', regex=True)
+    parts = text.str.extract(r'^(\d+(?:\.\d+)?)\s*([万亿wWkK]?)')
+    number = pd.to_numeric(parts[0], errors='coerce')
+    scale = parts[1].map(LIKE_SCALES).astype('float64').fillna(1.0)
+    return (number * scale).round().fillna(0).astype('int64')
+
+
+def normalize_publish_times(values, crawl_time=None):
+    """
+    发布时间文本转为 UTC 时间（datetime64[ns, UTC]），相对时间以爬取时间为基准：
+    '2025-10-30 23:29' / '10-30'（今年）/ '昨天 12:00' / '3小时前' / '刚刚'，无法识别的为 NaT
+    """
+    anchor = to_utc_timestamp(crawl_time)
+    local_anchor = anchor.tz_convert(BEIJING)
+    local_midnight = local_anchor.normalize().tz_localize(None)
+    text = as_text(values)
+    result = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns, UTC]')
+
+    # 绝对日期：年份缺省时为爬取当年，若因此落在爬取时间之后则是去年
+    absolute = text.str.extract(ABSOLUTE_PATTERN).apply(pd.to_numeric, errors='coerce')
+    mask = absolute['month'].notna()
+    if mask.any():
+        rows = absolute[mask]
+        missing_year = rows['year'].isna()
+        parts = pd.DataFrame({
+            'year': rows['year'].fillna(local_anchor.year),
+            'month': rows['month'],
+            'day': rows['day'],
+            'hour': rows['hour'].fillna(0),
+            'minute': rows['minute'].fillna(0),
+        })
+        parsed = pd.to_datetime(parts, errors='coerce').dt.tz_localize(BEIJING).dt.tz_convert('UTC')
+        future = missing_year & (parsed > anchor)
+        if future.any():
+            parts.loc[future, 'year'] -= 1
+            parsed = pd.to_datetime(parts, errors='coerce').dt.tz_localize(BEIJING).dt.tz_convert('UTC')
+        result[mask] = parsed
+
+    # 今天 / 昨天 / 前天 HH:MM
+    days = text.str.extract(DAY_PATTERN)
+    mask = days['word'].notna()
+    if mask.any():
+        rows = days[mask]
+        local = (local_midnight
+                 - pd.to_timedelta(rows['word'].map(DAY_OFFSETS), unit='D')
+                 + pd.to_timedelta(pd.to_numeric(rows['hour']), unit='h')
+                 + pd.to_timedelta(pd.to_numeric(rows['minute']), unit='m'))
+        result[mask] = local.dt.tz_localize(BEIJING).dt.tz_convert('UTC')
+
+    # N秒/分钟/小时/天前
+    relative = text.str.extract(RELATIVE_PATTERN)
+    mask = relative['amount'].notna()
+    for unit, code in RELATIVE_UNITS.items():
+        unit_mask = mask & (relative['unit'] == unit)
+        if unit_mask.any():
+            result[unit_mask] = anchor - pd.to_timedelta(pd.to_numeric(relative.loc[unit_mask, 'amount']), unit=code)
+
+    result[text == '刚刚'] = anchor
+    return result
+
+
+def format_utc(values):
+    """UTC 时间列转为 ISO 8601 字符串（NaT 为 None），用于写入 JSON 记录"""
+    return [None if pd.isna(v) else v.strftime('%Y-%m-%dT%H:%M:%SZ') for v in values]
+
+
+def normalize_frame(df, crawl_time=None):
+    """
+    批量规范化 DataFrame：like_count 转为 int64，新增 publish_time_utc（UTC 时间）
+    原始 publish_time 文本保留，评论 ID 仍按原文本计算
+    """
+    df = df.copy()
+    if 'like_count' in df.columns:
+        df['like_count'] = normalize_like_counts(df['like_count']).to_numpy()
+    if 'publish_time' in df.columns:
+        df['publish_time_utc'] = normalize_publish_times(df['publish_time'], crawl_time).to_numpy()
+    return df
+
+
+def normalize_records(comments, crawl_time=None):
+    """
+    就地规范化一批评论记录（含楼中楼 replies），整批拼成一列统一解析，返回 comments
+    """
+    records = []
+    for comment in comments:
+        records.append(comment)
+        records.extend(comment.get('replies') or [])
+    if not records:
+        return comments
+
+    likes = normalize_like_counts([r.get('like_count') for r in records])
+    times = format_utc(normalize_publish_times([r.get('publish_time') for r in records], crawl_time))
+    for record, like, utc in zip(records, likes.tolist(), times):
+        record['like_count'] = like
+        record['publish_time_utc'] = utc
+    return comments
+
+
+def normalize_file(path, output_path=None, crawl_time=None):
+    """
+    规范化单个 CSV 或 JSON 文件；爬取时间缺省取文件修改时间（最接近当时的爬取时间）
+    """
+    if crawl_time is None:
+        crawl_time = os.path.getmtime(path)
+    output_path = output_path or path
+
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path, dtype=str, encoding='utf-8', low_memory=False)
+        normalize_frame(df, crawl_time).to_csv(output_path, index=False, encoding='utf-8')
+        count = len(df)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            comments = json.load(f)
+        normalize_records(comments, crawl_time)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(comments, f, ensure_ascii=False, indent=2)
+        count = len(comments)
+
+    print(f"✓ {path} → {output_path}，{count} 条记录")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把点赞数和发布时间规范化为 int64 和 UTC 时间（CSV / JSON）")
+    parser.add_argument('paths', nargs='+', help="CSV / JSON 文件或包含它们的文件夹")
+    parser.add_argument('--crawl-time', default=None,
+                        help="爬取时间，如 '2025-11-01 12:00'（北京时间），缺省取每个文件的修改时间")
+    parser.add_argument('--suffix', default='_normalized', help="输出文件名后缀，传空字符串则覆盖原文件")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(('.csv', '.json')) and not (args.suffix and args.suffix in name))
+        else:
+            files.append(path)
+
+    for path in files:
+        root, ext = os.path.splitext(path)
+        try:
+            normalize_file(path, root + args.suffix + ext, crawl_time=args.crawl_time)
+        except Exception as e:
+            print(f"!!! Error processing {path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import io
+import json
+import os
+import re
+import sys
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.jsonl(\.zst)?$")
+
+
+def load_zstd():
+    """zstd 压缩为可选依赖（pip install zstandard）"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ImportError("启用 zstd 压缩需要先安装 zstandard：pip install zstandard")
+
+
+def list_segments(store_dir):
+    """按序号返回存储目录下的全部分段文件路径"""
+    if not os.path.isdir(store_dir):
+        return []
+    segments = []
+    for name in os.listdir(store_dir):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), os.path.join(store_dir, name)))
+    return [path for _, path in sorted(segments)]
+
+
+class CommentStoreWriter:
+    """
+    只追加的分段 JSONL 评论存储：每批评论追加到当前分段末尾并 fsync，分段超过大小上限后自动切换新分段
+    写入开销只与本批数据量有关，不再随已保存的评论总数增长
+    """
+
+    def __init__(self, store_dir, segment_max_bytes=64 * 1024 * 1024, compress=False, fsync=True):
+        self.store_dir = store_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.compress = compress
+        self.fsync = fsync
+        self.compressor = load_zstd().ZstdCompressor(level=3) if compress else None
+        self.record_count = 0
+
+        os.makedirs(store_dir, exist_ok=True)
+        # 已有分段不再续写（末尾可能是上次中断留下的半行），从下一个序号开始
+        existing = list_segments(store_dir)
+        last_index = int(SEGMENT_PATTERN.match(os.path.basename(existing[-1])).group(1)) if existing else 0
+        self.segment_index = last_index
+        self.file = None
+        self.segment_bytes = 0
+        self.open_next_segment()
+
+    @property
+    def segment_path(self):
+        suffix = ".jsonl.zst" if self.compress else ".jsonl"
+        return os.path.join(self.store_dir, f"segment-{self.segment_index:06d}{suffix}")
+
+    def open_next_segment(self):
+        if self.file:
+            self.file.close()
+        self.segment_index += 1
+        self.file = open(self.segment_path, "ab")
+        self.segment_bytes = 0
+
+    def append_batch(self, records):
+        """追加一批记录（一行一条 JSON），写入后 flush + fsync"""
+        if not records:
+            return 0
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        if self.compressor:
+            # 每批一个独立的 zstd frame，读取时跨 frame 连续解压
+            data = self.compressor.compress(data)
+
+        self.file.write(data)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+        self.segment_bytes += len(data)
+        self.record_count += len(records)
+        if self.segment_bytes >= self.segment_max_bytes:
+            self.open_next_segment()
+        return len(records)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        # 清理没有写入任何内容的空分段
+        for path in list_segments(self.store_dir):
+            if os.path.getsize(path) == 0:
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_segment(path):
+    """以文本方式打开分段（自动识别 zstd 压缩）"""
+    if path.endswith(".zst"):
+        raw = open(path, "rb")
+        reader = load_zstd().ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_comments(store_dir):
+    """
+    按写入顺序惰性遍历存储中的全部评论记录
+    崩溃时最后一行可能只写了一半，跳过无法解析的行
+    """
+    for path in list_segments(store_dir):
+        with open_segment(path) as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"跳过无法解析的记录 {os.path.basename(path)}:{line_no}")
+
+
+def iter_latest_comments(store_dir):
+    """
+    增量重爬会把更新后的评论再追加一次：同一 comment_id 只产出最后写入的版本
+    第一遍只记录每个 comment_id 最后出现的位置，第二遍按位置产出，内存只占用 ID 索引
+    """
+    last_seen = {}
+    for position, record in enumerate(iter_comments(store_dir)):
+        if record.get("comment_id"):
+            last_seen[record["comment_id"]] = position
+    for position, record in enumerate(iter_comments(store_dir)):
+        comment_id = record.get("comment_id")
+        if not comment_id or last_seen.get(comment_id) == position:
+            yield record
+
+
+def count_comments(store_dir):
+    return sum(1 for _ in iter_latest_comments(store_dir))
+
+
+def export_json(store_dir, output_file):
+    """把存储导出为与旧版 bilibili_comments_all.json 相同格式的 JSON 数组（流式写出，同一评论只保留最新版本）"""
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for record in iter_latest_comments(store_dir):
+            if count:
+                f.write(",\n")
+            f.write(json.dumps(record, ensure_ascii=False, indent=2))
+            count += 1
+        f.write("\n]\n")
+    print(f"✓ 已导出 {count} 条评论到 {output_file}")
+    return count
+
+
+if __name__ == "__main__":
+    # 用法: python comment_store.py <存储目录> [输出JSON文件]
+    store_dir = sys.argv[1] if len(sys.argv) > 1 else "bilibili_comments_store"
+    output_file = sys.argv[2] if len(sys.argv) > 2 else "bilibili_comments_all.json"
+    export_json(store_dir, output_file)
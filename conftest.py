@@ -0,0 +1,35 @@
+import pytest
+
+
+class FakeClock:
+    """替换模块里的 time：sleep 只推进时间，不真正等待"""
+
+    def __init__(self, start=1000.0, stamp="2025-11-01T12:00:00"):
+        self.now = start
+        self.stamp = stamp
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def strftime(self, fmt):
+        return self.stamp
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """fake_clock(module, **kwargs)：把 module.time 换成 FakeClock 并返回它"""
+
+    def install(module, **kwargs):
+        fake = FakeClock(**kwargs)
+        monkeypatch.setattr(module, "time", fake)
+        return fake
+
+    return install
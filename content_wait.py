@@ -0,0 +1,178 @@
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+# 在 host 的 Shadow DOM 上挂 MutationObserver，匹配 selector 的节点数超过 baseline 立即返回
+# 返回 {count: 当前数量, loaded: 是否在超时前出现新节点}
+WAIT_FOR_NODES_SCRIPT = """
+    var host = arguments[0];
+    var selector = arguments[1];
+    var baseline = arguments[2];
+    var timeoutMs = arguments[3];
+    var done = arguments[arguments.length - 1];
+    var root = host.shadowRoot || host;
+
+    function count() { return root.querySelectorAll(selector).length; }
+
+    if (count() > baseline) { done({count: count(), loaded: true}); return; }
+
+    var finished = false;
+    function finish(loaded) {
+        if (finished) return;
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        done({count: count(), loaded: loaded});
+    }
+    var observer = new MutationObserver(function () {
+        if (count() > baseline) finish(true);
+    });
+    observer.observe(root, {childList: true, subtree: true});
+    var timer = setTimeout(function () { finish(false); }, timeoutMs);
+"""
+
+# 点击按钮后等待 host 的 Shadow DOM 中 selector 节点发生变化（数量变化、节点被替换或首个节点内容变化）
+# 用于回复区“点击查看”“下一页”：翻页后回复数量往往不变，所以同时比较节点身份和首条内容
+CLICK_AND_WAIT_SCRIPT = """
+    var button = arguments[0];
+    var host = arguments[1];
+    var selector = arguments[2];
+    var timeoutMs = arguments[3];
+    var done = arguments[arguments.length - 1];
+    var root = host.shadowRoot || host;
+
+    function deepText(node) {
+        if (!node) return '';
+        var text = node.shadowRoot ? deepText(node.shadowRoot) : '';
+        for (var child = node.firstChild; child; child = child.nextSibling) {
+            text += child.nodeType === 3 ? child.nodeValue : deepText(child);
+        }
+        return text;
+    }
+    function snapshot() {
+        var nodes = Array.prototype.slice.call(root.querySelectorAll(selector));
+        return {nodes: nodes, first: deepText(nodes[0])};
+    }
+    var before = snapshot();
+    function changed() {
+        var now = snapshot();
+        if (now.nodes.length !== before.nodes.length) return true;
+        for (var i = 0; i < now.nodes.length; i++) {
+            if (now.nodes[i] !== before.nodes[i]) return true;
+        }
+        return now.first !== before.first;
+    }
+
+    var finished = false;
+    function finish(loaded) {
+        if (finished) return;
+        finished = true;
+        observer.disconnect();
+        clearInterval(poller);
+        clearTimeout(timer);
+        done({count: root.querySelectorAll(selector).length, loaded: loaded});
+    }
+    var observer = new MutationObserver(function () { if (changed()) finish(true); });
+    observer.observe(root, {childList: true, subtree: true, characterData: true});
+    // 嵌套 Shadow DOM 内的文字变化观察不到，辅以轻量轮询
+    var poller = setInterval(function () { if (changed()) finish(true); }, 100);
+    var timer = setTimeout(function () { finish(false); }, timeoutMs);
+    button.click();
+"""
+
+
+class ContentWaiter:
+    """
+    事件驱动的内容等待：新评论 / 回复节点一出现就返回，而不是固定 time.sleep
+    超时（什么都没加载出来）时下次等待时间按 backoff 倍数增长，直到 max_timeout；一旦有内容加载立即恢复为 timeout
+    """
+
+    def __init__(self, driver, timeout=8, max_timeout=30, backoff=1.5, settle=0.2, poll_frequency=0.2,
+                 metrics=None, pacer=None):
+        self.driver = driver
+        self.metrics = metrics  # 可选：CrawlMetrics，统计脚本调用次数和等待结果
+        self.pacer = pacer  # 可选：PacingController，加载成功 / 超时反馈给节奏控制
+        self.base_timeout = timeout
+        self.max_timeout = max_timeout
+        self.backoff = backoff
+        self.settle_time = settle  # 连续滚动之间让页面渲染一帧的短暂停顿
+        self.poll_frequency = poll_frequency
+        self.timeout = timeout
+        self.driver.set_script_timeout(max_timeout + 5)
+
+    def count_call(self):
+        if self.metrics:
+            self.metrics.inc('execute_script_calls')
+
+    def record(self, loaded):
+        """根据本次等待是否加载到内容调整下次的超时时间"""
+        if self.metrics:
+            self.metrics.inc('waits_loaded_total' if loaded else 'waits_timeout_total')
+            self.metrics.set_gauge('wait_timeout_seconds', self.timeout)
+        if self.pacer:
+            if loaded:
+                self.pacer.success()
+            else:
+                self.pacer.empty()
+        if loaded:
+            self.timeout = self.base_timeout
+        else:
+            self.timeout = min(self.max_timeout, self.timeout * self.backoff)
+        return loaded
+
+    def settle(self, seconds=None):
+        """短暂停顿让页面渲染；seconds 为空时用默认的 settle_time"""
+        time.sleep(seconds or self.settle_time)
+
+    def count_nodes(self, host, selector):
+        self.count_call()
+        return self.driver.execute_script(
+            "var root = arguments[0].shadowRoot || arguments[0]; return root.querySelectorAll(arguments[1]).length;",
+            host, selector)
+
+    def wait_for_nodes(self, host, selector, baseline, timeout=None):
+        """
+        等待 host 的 Shadow DOM 中 selector 节点数超过 baseline，返回 (是否加载到新节点, 当前数量)
+        """
+        timeout = timeout or self.timeout
+        try:
+            self.count_call()
+            result = self.driver.execute_async_script(WAIT_FOR_NODES_SCRIPT, host, selector, baseline,
+                                                      int(timeout * 1000))
+            return self.record(bool(result['loaded'])), result['count']
+        except Exception as e:
+            print(f"MutationObserver 等待失败，改用轮询: {e}")
+            return self.poll_for_nodes(host, selector, baseline, timeout)
+
+    def poll_for_nodes(self, host, selector, baseline, timeout=None):
+        """轮询版本的 wait_for_nodes"""
+        timeout = timeout or self.timeout
+        counts = [baseline]
+
+        def has_new_nodes(driver):
+            counts.append(self.count_nodes(host, selector))
+            return counts[-1] > baseline
+
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(has_new_nodes)
+            return self.record(True), counts[-1]
+        except Exception:
+            return self.record(False), counts[-1]
+
+    def click_and_wait(self, button, host, selector, timeout=None):
+        """
+        点击按钮并等待 host 中 selector 节点变化；只有点击成功且在超时前出现变化才返回 True，
+        其余情况（脚本出错、按钮已失效、没有返回结果、超时）一律返回 False
+        只有真正完成等待时才调整超时和节奏控制，脚本出错不算"没有加载到内容"
+        """
+        timeout = timeout or self.timeout
+        try:
+            self.count_call()
+            result = self.driver.execute_async_script(CLICK_AND_WAIT_SCRIPT, button, host, selector,
+                                                      int(timeout * 1000))
+        except Exception as e:
+            print(f"点击后等待失败: {e}")
+            return False
+        if not isinstance(result, dict):
+            return False
+        return self.record(bool(result.get('loaded')))
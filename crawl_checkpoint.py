@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+
+def stable_comment_id(user_name, content, publish_time):
+    """
+    基于内容的确定性评论 ID（blake2b），不同进程、不同次运行结果一致
+    （Python 内置 hash() 每个进程加盐不同，不能用于跨运行去重）
+    """
+    raw = "\x1f".join([str(user_name or ""), str(content or ""), str(publish_time or "")])
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def make_comment_id(comment_data):
+    """
+    评论的唯一标识：拿得到 rpid（B站评论 ID）时直接用 rpid，浏览器和接口两种引擎、多次运行结果都一致
+    没有 rpid 时退回 用户名 + 内容 + 发布时间 的哈希，发布时间用规范化后的 UTC 时间，
+    两种引擎的显示格式（'2025-10-30 23:29' / '10-30'）得到同一个值
+    """
+    if comment_data.get('rpid'):
+        return str(comment_data['rpid'])
+    return stable_comment_id(comment_data.get('user_name', ''), comment_data.get('content', ''),
+                             publish_time_key(comment_data))
+
+
+def publish_time_key(comment_data):
+    """生成 ID 用的发布时间：优先 publish_time_utc，否则把显示文本规范化为 UTC，无法识别时保留原文本"""
+    if comment_data.get('publish_time_utc'):
+        return comment_data['publish_time_utc']
+    publish_time = comment_data.get('publish_time', '')
+    if not publish_time:
+        return ''
+    from comment_normalize import format_utc, normalize_publish_times
+
+    return format_utc(normalize_publish_times([publish_time]))[0] or publish_time
+
+
+def checkpoint_path(output_dir, video_url):
+    """每个视频一个检查点文件：<output_dir>/crawl_checkpoint_<BV号>.json"""
+    match = re.search(r'BV[a-zA-Z0-9]+', str(video_url))
+    name = match.group(0) if match else hashlib.blake2b(str(video_url).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(output_dir, f"crawl_checkpoint_{name}.json")
+
+
+class CrawlCheckpoint:
+    """
+    单个视频的爬取检查点
+    - <path>：JSON 状态（最后处理的线程序号、滚动位置、已处理条数），每批整体原子替换
+    - <path>.ids：已处理评论 ID，只追加，每行一个
+    """
+
+    def __init__(self, path, video_url=""):
+        self.path = path
+        self.ids_path = path + ".ids"
+        self.video_url = video_url
+        self.processed_ids = set()
+        self.last_thread_index = 0
+        self.scroll_y = 0
+        self.updated_at = None
+
+    @classmethod
+    def load(cls, path, video_url=""):
+        """读取已有检查点；不存在时返回一个空检查点"""
+        checkpoint = cls(path, video_url)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            checkpoint.video_url = state.get("video_url", video_url)
+            checkpoint.last_thread_index = state.get("last_thread_index", 0)
+            checkpoint.scroll_y = state.get("scroll_y", 0)
+            checkpoint.updated_at = state.get("updated_at")
+        if os.path.exists(checkpoint.ids_path):
+            with open(checkpoint.ids_path, "r", encoding="utf-8") as f:
+                checkpoint.processed_ids = {line.strip() for line in f if line.strip()}
+        return checkpoint
+
+    @property
+    def resumable(self):
+        return self.last_thread_index > 0 or bool(self.processed_ids)
+
+    def record_batch(self, comment_ids, last_thread_index, scroll_y):
+        """一批评论写入存储后调用：追加 ID 并更新状态"""
+        new_ids = [cid for cid in comment_ids if cid not in self.processed_ids]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if new_ids:
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{cid}\n" for cid in new_ids))
+                f.flush()
+                os.fsync(f.fileno())
+            self.processed_ids.update(new_ids)
+        self.last_thread_index = last_thread_index
+        self.scroll_y = scroll_y
+        self.save()
+
+    def clear(self):
+        """丢弃磁盘上的检查点（状态文件和 .ids），重新开始爬取"""
+        for path in (self.path, self.ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.processed_ids = set()
+        self.last_thread_index = 0
+        self.scroll_y = 0
+
+    def save(self):
+        """先写临时文件再替换，避免中途崩溃留下损坏的检查点"""
+        self.updated_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        state = {
+            "video_url": self.video_url,
+            "last_thread_index": self.last_thread_index,
+            "scroll_y": self.scroll_y,
+            "processed_count": len(self.processed_ids),
+            "updated_at": self.updated_at
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
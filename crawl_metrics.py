@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PHASES = ['page_load', 'scroll', 'extract', 'reply_expand', 'save']
+
+
+def percentile(values, q):
+    """简单的线性插值分位数，values 为空时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+class CrawlMetrics:
+    """
+    爬虫运行指标：计数器、仪表值和分阶段计时
+    定期追加一行 JSON 快照到 jsonl_path，并原子覆盖 Prometheus textfile（prom_path），可在爬取过程中抓取
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None, labels=None, flush_interval=10, sample_size=5000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.phase_seconds = {phase: 0.0 for phase in PHASES}
+        self.phase_count = {phase: 0 for phase in PHASES}
+        self.samples = {}  # 每个阶段最近 sample_size 次耗时，用于计算分位数
+        self.sample_size = sample_size
+        self.jsonl_path = None
+        self.prom_path = None
+        self.labels = {}
+        self.flush_interval = flush_interval
+        self.last_flush = 0.0
+        self.configure(jsonl_path, prom_path, labels)
+
+    def configure(self, jsonl_path=None, prom_path=None, labels=None):
+        """设置输出位置和标签（例如 video=BV号），并重置计时起点"""
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.labels = dict(labels or {})
+        self.started = time.time()
+        for path in (jsonl_path, prom_path):
+            if path:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def inc(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def max_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = max(self.gauges.get(name, value), value)
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+            self.phase_count[phase] = self.phase_count.get(phase, 0) + 1
+            self.samples.setdefault(phase, deque(maxlen=self.sample_size)).append(seconds)
+
+    @contextmanager
+    def phase(self, name):
+        """with metrics.phase('scroll'): ... 统计该阶段的耗时和次数"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def phase_percentiles(self, phase, qs=(0.5, 0.9, 0.99)):
+        with self.lock:
+            values = list(self.samples.get(phase, []))
+        return {f"p{int(q * 100)}": percentile(values, q) for q in qs}
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            counters = dict(self.counters)
+            snapshot = {
+                'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'elapsed_s': round(elapsed, 3),
+                'labels': dict(self.labels),
+                'counters': counters,
+                'gauges': dict(self.gauges),
+                'phase_seconds': {k: round(v, 3) for k, v in self.phase_seconds.items()},
+                'phase_count': dict(self.phase_count),
+                'comments_per_sec': counters.get('comments_total', 0) / elapsed if elapsed > 0 else 0.0,
+                'replies_per_sec': counters.get('replies_total', 0) / elapsed if elapsed > 0 else 0.0,
+            }
+        return snapshot
+
+    def prometheus_text(self, snapshot):
+        """按 Prometheus textfile 格式输出"""
+        base_labels = ','.join(f'{k}="{v}"' for k, v in sorted(snapshot['labels'].items()))
+
+        def labels(extra=None):
+            parts = [base_labels] if base_labels else []
+            if extra:
+                parts.append(extra)
+            return '{' + ','.join(parts) + '}' if parts else ''
+
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE bili_crawl_{name} counter")
+            lines.append(f"bili_crawl_{name}{labels()} {value}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f"# TYPE bili_crawl_{name} gauge")
+            lines.append(f"bili_crawl_{name}{labels()} {value}")
+        lines.append("# TYPE bili_crawl_phase_seconds_total counter")
+        for phase, value in snapshot['phase_seconds'].items():
+            phase_labels = labels('phase="%s"' % phase)
+            lines.append(f"bili_crawl_phase_seconds_total{phase_labels} {value}")
+        lines.append("# TYPE bili_crawl_phase_calls_total counter")
+        for phase, value in snapshot['phase_count'].items():
+            phase_labels = labels('phase="%s"' % phase)
+            lines.append(f"bili_crawl_phase_calls_total{phase_labels} {value}")
+        for name in ('comments_per_sec', 'replies_per_sec', 'elapsed_s'):
+            lines.append(f"# TYPE bili_crawl_{name} gauge")
+            lines.append(f"bili_crawl_{name}{labels()} {snapshot[name]}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """写出一次快照（JSON lines 追加 + Prometheus textfile 原子替换）"""
+        snapshot = self.snapshot()
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + '\n')
+        if self.prom_path:
+            tmp_path = self.prom_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text(snapshot))
+            os.replace(tmp_path, self.prom_path)
+        self.last_flush = time.time()
+        return snapshot
+
+    def maybe_flush(self):
+        """距离上次写出超过 flush_interval 秒时才写出"""
+        if time.time() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return None
+
+    def summary(self):
+        """打印各阶段耗时占比和吞吐"""
+        snapshot = self.snapshot()
+        total = sum(snapshot['phase_seconds'].values()) or 1.0
+        print(f"\n{'阶段':<14}{'次数':>8}{'耗时(s)':>10}{'占比':>8}")
+        for phase in snapshot['phase_seconds']:
+            seconds = snapshot['phase_seconds'][phase]
+            print(f"{phase:<14}{snapshot['phase_count'][phase]:>8}{seconds:>10.1f}{seconds / total:>8.1%}")
+        print(f"评论 {snapshot['comments_per_sec']:.2f} 条/秒，回复 {snapshot['replies_per_sec']:.2f} 条/秒，"
+              f"execute_script 调用 {snapshot['counters'].get('execute_script_calls', 0)} 次")
+        return snapshot
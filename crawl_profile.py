@@ -0,0 +1,146 @@
+import json
+import statistics
+import sys
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+# 精简爬取模式下通过 CDP 屏蔽的请求：视频流、图片、字体、弹幕和统计上报
+# 评论组件的脚本和评论接口（api.bilibili.com/x/v2/reply*）不在其中
+BLOCKED_URL_PATTERNS = [
+    # 视频 / 音频流
+    "*.m4s*", "*.mp4*", "*.flv*", "*.bilivideo.com*", "*.bilivideo.cn*", "*.akamaized.net*",
+    # 图片（头像、封面、表情）；等级图标的 src 仍保留在 DOM 里，不影响提取
+    "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*",
+    # 字体
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    # 弹幕
+    "*api.bilibili.com/x/v1/dm/*", "*api.bilibili.com/x/v2/dm/*",
+    # 统计与广告上报
+    "*data.bilibili.com*", "*cm.bilibili.com*", "*api.bilibili.com/x/click-interface/*",
+    "*hm.baidu.com*", "*google-analytics.com*", "*googletagmanager.com*",
+]
+
+# 在每个页面的脚本执行前注入：禁止媒体播放，并把已出现的 <video> 暂停、清空
+DISABLE_PLAYER_SCRIPT = """
+    HTMLMediaElement.prototype.play = function () { return Promise.resolve(); };
+    function killMedia(root) {
+        (root || document).querySelectorAll('video, audio').forEach(function (media) {
+            try {
+                media.pause();
+                media.muted = true;
+                media.removeAttribute('src');
+                media.load();
+            } catch (e) {}
+        });
+    }
+    new MutationObserver(function () { killMedia(); }).observe(document, {childList: true, subtree: true});
+    document.addEventListener('DOMContentLoaded', function () { killMedia(); });
+"""
+
+
+def apply_lean_options(chrome_options):
+    """精简模式的 Chrome 启动参数：不加载图片、不自动播放、静音"""
+    chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+    chrome_options.add_argument('--autoplay-policy=user-gesture-required')
+    chrome_options.add_argument('--mute-audio')
+    chrome_options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+    })
+
+
+def enable_lean_profile(driver, blocked_patterns=None):
+    """driver 创建后通过 CDP 开启请求拦截并注入禁用播放器的脚本"""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_patterns or BLOCKED_URL_PATTERNS})
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': DISABLE_PLAYER_SCRIPT})
+        print("精简爬取模式已开启：屏蔽媒体、图片、字体和统计请求")
+        return True
+    except Exception as e:
+        print(f"开启精简爬取模式失败（CDP 不可用？）: {e}")
+        return False
+
+
+def browser_rss_mb(driver):
+    """chromedriver 启动的全部 Chrome 进程的常驻内存（MB），需要 psutil，不可用时返回 None"""
+    try:
+        import psutil
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes if p.is_running()) / 1024 / 1024
+    except Exception:
+        return None
+
+
+def measure_page(driver):
+    """读取当前页面的加载耗时、JS 堆和 DOM 节点数、浏览器内存"""
+    timing = driver.execute_script("""
+        var t = performance.timing;
+        return {
+            dom_content_loaded_ms: t.domContentLoadedEventEnd - t.navigationStart,
+            load_ms: t.loadEventEnd > 0 ? t.loadEventEnd - t.navigationStart : null,
+            resource_count: performance.getEntriesByType('resource').length
+        };
+    """)
+    try:
+        metrics = driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']
+        metrics = {m['name']: m['value'] for m in metrics}
+        timing['js_heap_mb'] = metrics.get('JSHeapUsedSize', 0) / 1024 / 1024
+        timing['dom_nodes'] = int(metrics.get('Nodes', 0))
+    except Exception:
+        pass
+    timing['browser_rss_mb'] = browser_rss_mb(driver)
+    return timing
+
+
+def measure_profile(video_url, lean, runs=3, headless=True):
+    """用指定模式多次冷启动加载视频页，返回每次的测量结果"""
+    from bilis37commentdevidedv2 import BilibiliCommentSpider
+
+    results = []
+    for i in range(runs):
+        spider = BilibiliCommentSpider(headless=headless, lean=lean)
+        spider.init_driver()
+        try:
+            spider.driver.execute_cdp_cmd('Performance.enable', {})
+            start = time.time()
+            spider.driver.get(video_url)
+            comments_container = spider.wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "bili-comments"))
+            )
+            spider.waiter.wait_for_nodes(comments_container, 'bili-comment-thread-renderer', 0)
+            result = measure_page(spider.driver)
+            result['first_comments_s'] = time.time() - start
+            results.append(result)
+            print(f"  {'精简' if lean else '完整'}模式 第{i + 1}次: {json.dumps(result, ensure_ascii=False)}")
+        finally:
+            spider.driver.quit()
+    return results
+
+
+def compare_profiles(video_url, runs=3, headless=True):
+    """对比完整页面与精简模式的加载时间和内存（取中位数）"""
+    summary = {}
+    for lean in (False, True):
+        results = measure_profile(video_url, lean, runs=runs, headless=headless)
+        keys = ['first_comments_s', 'dom_content_loaded_ms', 'load_ms', 'resource_count',
+                'js_heap_mb', 'dom_nodes', 'browser_rss_mb']
+        summary['lean' if lean else 'full'] = {
+            key: statistics.median([r[key] for r in results if r.get(key) is not None])
+            for key in keys if any(r.get(key) is not None for r in results)
+        }
+
+    print(f"\n{'指标':<24}{'完整页面':>14}{'精简模式':>14}")
+    for key, full_value in summary['full'].items():
+        lean_value = summary['lean'].get(key)
+        print(f"{key:<24}{full_value:>14.1f}{lean_value if lean_value is not None else float('nan'):>14.1f}")
+    return summary
+
+
+if __name__ == "__main__":
+    # 用法: python crawl_profile.py [视频URL] [次数]
+    video_url = sys.argv[1] if len(sys.argv) > 1 else "https://www.bilibili.com/video/BV1bFCWBXEgM"
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    compare_profiles(video_url, runs=runs)
@@ -1,6 +1,8 @@
 import os
 import pandas as pd
 
+from comment_normalize import normalize_frame
+
 # === 配置你的 CSV 文件夹路径 ===
 folder_path = r"./csv"   # ← 记得改成你的路径
 
@@ -19,10 +21,8 @@ for file in os.listdir(folder_path):
             # 删除列（如果存在）
             df = df.drop(columns=[c for c in cols_to_drop if c in df.columns], errors="ignore")
 
-            # 处理 like_count 列：填充空值为0
-            if "like_count" in df.columns:
-                df["like_count"] = df["like_count"].fillna("0")   # 填补 NaN
-                df["like_count"] = df["like_count"].replace("", "0")  # 填补空字符串
+            # 规范化 like_count（空值为0，“1.2万”转为整数）并补充 publish_time_utc，相对时间以文件修改时间为基准
+            df = normalize_frame(df, crawl_time=os.path.getmtime(file_path))
 
             # 覆盖保存
             df.to_csv(file_path, index=False, encoding="utf-8")
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Excel 单个工作表最多 1048576 行（含表头）
+EXCEL_MAX_ROWS = 1048576
+MAX_COLUMN_WIDTH = 50
+SHEET_NAME_LIMIT = 31
+
+
+def estimate_column_widths(df, sample_size=1000, max_width=MAX_COLUMN_WIDTH):
+    """
+    按抽样行估计列宽（表头长度与样本中最长的值取大，再加 2），不对整列做字符串拷贝
+    """
+    sample = df if len(df) <= sample_size else df.sample(n=sample_size, random_state=0)
+    widths = []
+    for column in df.columns:
+        lengths = sample[column].dropna().astype(str).str.len()
+        longest = int(lengths.max()) if len(lengths) else 0
+        widths.append(min(max(longest, len(str(column))) + 2, max_width))
+    return widths
+
+
+def clean_chunk(chunk):
+    """去掉 openpyxl 不允许的控制字符（评论内容里偶尔出现），缺失值写为空单元格"""
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def strip_illegal(value):
+        return ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+
+    chunk = chunk.copy()
+    for column in chunk.columns:
+        # 混合类型的 object 列（如 ['a\x01b', 1]）也要逐个清理其中的字符串
+        if pd.api.types.is_object_dtype(chunk[column]) or pd.api.types.is_string_dtype(chunk[column]):
+            chunk[column] = chunk[column].map(strip_illegal)
+    chunk = chunk.astype(object)
+    return chunk.where(chunk.notna(), None)
+
+
+class StreamingExcelWriter:
+    """
+    openpyxl write-only 模式的流式 xlsx 写入：逐块追加行，内存不随行数增长
+    单个工作表写满 max_rows 行数据后自动新建“<sheet_name>_2”“<sheet_name>_3”…，每个工作表都带表头
+    """
+
+    def __init__(self, filename, columns, sheet_name='Sheet1', widths=None, max_rows=EXCEL_MAX_ROWS - 1):
+        from openpyxl import Workbook
+
+        self.filename = filename
+        self.columns = [str(c) for c in columns]
+        self.sheet_name = sheet_name[:SHEET_NAME_LIMIT]
+        self.widths = widths
+        self.max_rows = max_rows
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.sheet_count = 0
+        self.total_rows = 0
+
+    def new_sheet(self):
+        from openpyxl.utils import get_column_letter
+
+        self.sheet_count += 1
+        title = self.sheet_name
+        if self.sheet_count > 1:
+            suffix = f"_{self.sheet_count}"
+            title = self.sheet_name[:SHEET_NAME_LIMIT - len(suffix)] + suffix
+        self.sheet = self.workbook.create_sheet(title=title)
+        # write-only 模式下列宽必须在写入第一行之前设置
+        for idx, width in enumerate(self.widths or [], 1):
+            self.sheet.column_dimensions[get_column_letter(idx)].width = width
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+
+    def append_frame(self, chunk):
+        """追加一块 DataFrame（列顺序与 columns 一致）"""
+        rows = clean_chunk(chunk).itertuples(index=False, name=None)
+        for row in rows:
+            if self.sheet is None or self.sheet_rows >= self.max_rows:
+                self.new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+            self.total_rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.new_sheet()  # 空表也输出表头
+        self.workbook.save(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+def write_excel(df, filename, sheet_name='Sheet1', chunk_size=50000, sample_size=1000,
+                max_rows=EXCEL_MAX_ROWS - 1):
+    """
+    把 DataFrame 流式写入 xlsx：抽样估计列宽，超过 Excel 行数上限时自动拆分为多个工作表
+    """
+    widths = estimate_column_widths(df, sample_size=sample_size)
+    with StreamingExcelWriter(filename, df.columns, sheet_name=sheet_name, widths=widths,
+                              max_rows=max_rows) as writer:
+        for start in range(0, len(df), chunk_size):
+            writer.append_frame(df.iloc[start:start + chunk_size])
+    return writer
+
+
+def csv_to_excel(csv_path, xlsx_path=None, sheet_name=None, chunk_size=50000, sample_size=1000):
+    """
+    分块读取大 CSV（例如合并后的评论总表）并流式写入 xlsx，列宽按第一块抽样估计
+    """
+    xlsx_path = xlsx_path or os.path.splitext(csv_path)[0] + '.xlsx'
+    sheet_name = sheet_name or os.path.splitext(os.path.basename(csv_path))[0]
+    start = time.time()
+
+    reader = pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig', chunksize=chunk_size)
+    first = next(reader, None)
+    if first is None:
+        raise ValueError(f"{csv_path} 中没有数据")
+
+    widths = estimate_column_widths(first, sample_size=sample_size)
+    with StreamingExcelWriter(xlsx_path, first.columns, sheet_name=sheet_name, widths=widths) as writer:
+        writer.append_frame(first)
+        for chunk in reader:
+            writer.append_frame(chunk)
+            print(f"  已写入 {writer.total_rows} 行...")
+
+    print(f"✓ 已导出 {writer.total_rows} 行到 {xlsx_path}（{writer.sheet_count} 个工作表），"
+          f"耗时 {time.time() - start:.1f}s")
+    return xlsx_path
+
+
+if __name__ == "__main__":
+    # 用法: python excel_export.py <CSV文件> [输出xlsx]
+    if len(sys.argv) < 2:
+        print("用法: python excel_export.py <CSV文件> [输出xlsx]")
+        sys.exit(1)
+    csv_to_excel(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,371 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+MOCK_BVID = "BV1mock0000001"
+MOCK_AID = 114514
+
+# 合成视频页：用自定义元素复刻 bili-comments / bili-comment-thread-renderer / bili-comment-replies-renderer
+# 的 Shadow DOM 结构，评论数据通过与真实站点同名的 JSON 接口懒加载
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>mock bilibili video</title></head>
+<body style="margin:0">
+<div id="player" style="height:640px;background:#222"></div>
+<bili-comments></bili-comments>
+<script>
+const OID = __OID__;
+const PAGE_SIZE = __PAGE_SIZE__;
+const REPLY_PAGE_SIZE = __REPLY_PAGE_SIZE__;
+
+function pad(n) { return n < 10 ? '0' + n : '' + n; }
+function formatTime(ctime) {
+    const d = new Date(ctime * 1000);
+    return d.getFullYear() + '-' + pad(d.getMonth() + 1) + '-' + pad(d.getDate()) + ' ' + pad(d.getHours()) + ':' + pad(d.getMinutes());
+}
+
+class ShadowElement extends HTMLElement {
+    constructor() { super(); this.attachShadow({mode: 'open'}); }
+    set data(value) { this._data = value; this.render(value); }
+    get data() { return this._data; }
+    render(value) {}
+}
+
+customElements.define('bili-text-button', class extends ShadowElement {
+    set label(text) {
+        this.shadowRoot.innerHTML = '<button><span class="button__label"></span></button>';
+        this.shadowRoot.querySelector('.button__label').textContent = text;
+    }
+});
+
+customElements.define('bili-comment-user-info', class extends ShadowElement {
+    render(reply) {
+        const member = reply.member;
+        this.shadowRoot.innerHTML = '<div id="user-name"><a></a></div>' +
+            '<div id="user-level"><img src="/static/level_' + member.level_info.current_level + '.svg"></div>';
+        const link = this.shadowRoot.querySelector('a');
+        link.href = 'https://space.bilibili.com/' + member.mid;
+        link.textContent = member.uname;
+    }
+});
+
+customElements.define('bili-rich-text', class extends ShadowElement {
+    render(reply) {
+        this.shadowRoot.innerHTML = '<p id="contents"><span></span></p>';
+        this.shadowRoot.querySelector('span').textContent = reply.content.message;
+    }
+});
+
+customElements.define('bili-comment-action-buttons-renderer', class extends ShadowElement {
+    render(reply) {
+        this.shadowRoot.innerHTML = '<div id="like"><button>赞</button><span id="count"></span></div>' +
+            '<div id="pubdate"></div>';
+        this.shadowRoot.querySelector('#count').textContent = reply.like ? String(reply.like) : '';
+        this.shadowRoot.querySelector('#pubdate').textContent = formatTime(reply.ctime);
+    }
+});
+
+function renderItem(root, reply) {
+    root.innerHTML = '';
+    ['bili-comment-user-info', 'bili-rich-text', 'bili-comment-action-buttons-renderer'].forEach(function (tag) {
+        const child = document.createElement(tag);
+        child.data = reply;
+        root.appendChild(child);
+    });
+}
+
+customElements.define('bili-comment-renderer', class extends ShadowElement {
+    render(reply) { renderItem(this.shadowRoot, reply); }
+});
+
+customElements.define('bili-comment-reply-renderer', class extends ShadowElement {
+    render(reply) { renderItem(this.shadowRoot, reply); }
+});
+
+customElements.define('bili-comment-replies-renderer', class extends ShadowElement {
+    render(thread) {
+        const root = this.shadowRoot;
+        root.innerHTML = '';
+        (thread.replies || []).forEach(function (reply) {
+            const item = document.createElement('bili-comment-reply-renderer');
+            item.data = reply;
+            root.appendChild(item);
+        });
+        if (thread.rcount > (thread.replies || []).length) {
+            const button = document.createElement('bili-text-button');
+            button.label = '点击查看';
+            button.addEventListener('click', () => this.loadPage(1));
+            root.appendChild(button);
+        }
+    }
+
+    loadPage(pn) {
+        const thread = this.data;
+        fetch('/x/v2/reply/reply?type=1&oid=' + OID + '&root=' + thread.rpid + '&pn=' + pn + '&ps=' + REPLY_PAGE_SIZE)
+            .then(r => r.json())
+            .then(body => {
+                const root = this.shadowRoot;
+                root.innerHTML = '';
+                body.data.replies.forEach(function (reply) {
+                    const item = document.createElement('bili-comment-reply-renderer');
+                    item.data = reply;
+                    root.appendChild(item);
+                });
+                const pages = Math.ceil(body.data.page.count / REPLY_PAGE_SIZE);
+                const addButton = (label, target) => {
+                    const button = document.createElement('bili-text-button');
+                    button.setAttribute('data-idx', String(target));
+                    button.label = label;
+                    button.addEventListener('click', () => this.loadPage(target));
+                    root.appendChild(button);
+                };
+                if (pn > 1) addButton('上一页', pn - 1);
+                for (let i = Math.max(1, pn - 2); i <= Math.min(pages, pn + 2); i++) addButton(String(i), i);
+                if (pn < pages) addButton('下一页', pn + 1);
+            });
+    }
+});
+
+customElements.define('bili-comment-thread-renderer', class extends ShadowElement {
+    render(thread) {
+        this.shadowRoot.innerHTML = '';
+        const comment = document.createElement('bili-comment-renderer');
+        comment.data = thread;
+        const replies = document.createElement('bili-comment-replies-renderer');
+        replies.data = thread;
+        this.shadowRoot.appendChild(comment);
+        this.shadowRoot.appendChild(replies);
+    }
+});
+
+customElements.define('bili-comments', class extends ShadowElement {
+    connectedCallback() {
+        this.shadowRoot.innerHTML = '<div id="header"></div><div id="feed"></div><div id="end"></div>';
+        this.next = 0;
+        this.loading = false;
+        this.isEnd = false;
+        this.loadMore();
+        window.addEventListener('scroll', () => {
+            const bottom = window.innerHeight + window.scrollY;
+            if (bottom >= document.documentElement.scrollHeight - 300) this.loadMore();
+        });
+    }
+
+    loadMore() {
+        if (this.loading || this.isEnd) return;
+        this.loading = true;
+        fetch('/x/v2/reply/main?type=1&oid=' + OID + '&mode=3&next=' + this.next + '&ps=' + PAGE_SIZE)
+            .then(r => r.json())
+            .then(body => {
+                const feed = this.shadowRoot.querySelector('#feed');
+                body.data.replies.forEach(function (reply) {
+                    const thread = document.createElement('bili-comment-thread-renderer');
+                    thread.data = reply;
+                    feed.appendChild(thread);
+                });
+                this.next = body.data.cursor.next;
+                this.isEnd = body.data.cursor.is_end;
+                if (this.isEnd) this.shadowRoot.querySelector('#end').textContent = '没有更多评论';
+            })
+            .finally(() => { this.loading = false; });
+    }
+});
+</script>
+</body>
+</html>
+"""
+
+
+class MockBiliServer:
+    """
+    本地合成的 B站视频页 + 评论接口，用于离线跑爬虫基准测试
+    comments: 主评论数；reply_fanout: 每条主评论的平均回复数（指数分布，最多 max_replies）
+    latency_ms: 每个接口请求的模拟延迟；risk_rate: 以该比例随机返回 HTTP 412（code -412），模拟风控
+    """
+
+    def __init__(self, comments=500, reply_fanout=5, max_replies=200, page_size=20, reply_page_size=10,
+                 latency_ms=50, seed=42, host='127.0.0.1', port=0, sample_file='bilibili_comments_batch_120.json',
+                 risk_rate=0.0):
+        self.comments = comments
+        self.page_size = page_size
+        self.reply_page_size = reply_page_size
+        self.latency = latency_ms / 1000
+        self.seed = seed
+        self.base_ctime = 1761800000
+        self.texts = self.load_sample_texts(sample_file)
+
+        rng = random.Random(seed)
+        self.rcounts = [min(max_replies, int(rng.expovariate(1 / reply_fanout))) if reply_fanout else 0
+                        for _ in range(comments)]
+        self.request_count = 0
+        self.risk_rate = risk_rate
+        self.risk_rng = random.Random(seed + 1)
+        self.risk_count = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_count += 1
+                parts = urlsplit(self.path)
+                params = dict(parse_qsl(parts.query))
+                if parts.path.startswith('/video/'):
+                    self.send_body(200, server.page_html().encode('utf-8'), 'text/html; charset=utf-8')
+                elif parts.path == '/':
+                    self.send_body(200, '<html><body>mock home</body></html>'.encode('utf-8'),
+                                   'text/html; charset=utf-8')
+                elif parts.path.startswith('/x/'):
+                    time.sleep(server.latency)
+                    if server.risk_rate and server.risk_rng.random() < server.risk_rate:
+                        server.risk_count += 1
+                        self.send_body(412, json.dumps({'code': -412, 'message': '请求被拦截'}).encode('utf-8'),
+                                       'application/json; charset=utf-8')
+                        return
+                    body = server.api(parts.path, params)
+                    status = 200 if body.get('code') == 0 else 404
+                    self.send_body(status, json.dumps(body, ensure_ascii=False).encode('utf-8'),
+                                   'application/json; charset=utf-8')
+                else:
+                    self.send_body(404, b'', 'text/plain')
+
+            def send_body(self, status, payload, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @staticmethod
+    def load_sample_texts(sample_file):
+        """从仓库里的评论样本取文本，使长度分布接近真实评论；没有样本时用固定文本"""
+        texts = []
+        if sample_file and os.path.exists(sample_file):
+            with open(sample_file, 'r', encoding='utf-8') as f:
+                for comment in json.load(f):
+                    texts.append(comment.get('content', ''))
+                    texts.extend(reply.get('content', '') for reply in comment.get('replies', []))
+        return [t for t in texts if t] or ['哈哈哈哈', '666', '来了来了', '这期视频做得真好，支持一下']
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def video_url(self):
+        return f"{self.url}/video/{MOCK_BVID}"
+
+    @property
+    def total_replies(self):
+        return sum(self.rcounts)
+
+    def page_html(self):
+        return (PAGE_TEMPLATE.replace('__OID__', str(MOCK_AID))
+                .replace('__PAGE_SIZE__', str(self.page_size))
+                .replace('__REPLY_PAGE_SIZE__', str(self.reply_page_size)))
+
+    def make_reply(self, rpid, index, root=0):
+        rng = random.Random(rpid)
+        mid = 10000 + rng.randrange(1000000)
+        return {
+            'rpid': rpid,
+            'rpid_str': str(rpid),
+            'oid': MOCK_AID,
+            'oid_str': str(MOCK_AID),
+            'root': root,
+            'mid': mid,
+            'member': {'mid': mid, 'uname': f"用户{rpid}", 'level_info': {'current_level': rng.randint(1, 6)}},
+            'content': {'message': self.texts[rpid % len(self.texts)] + ('' if root else f" #{index}")},
+            'like': rng.randrange(2000),
+            'ctime': self.base_ctime + index * 60,
+            'rcount': 0,
+            'replies': []
+        }
+
+    def main_reply(self, index):
+        reply = self.make_reply(1000000 + index, index)
+        reply['rcount'] = self.rcounts[index]
+        reply['replies'] = [self.child_reply(reply['rpid'], i) for i in range(min(3, reply['rcount']))]
+        return reply
+
+    def child_reply(self, root, index):
+        reply = self.make_reply(root * 1000 + index + 1, index, root=root)
+        reply['ctime'] = self.base_ctime + index * 30
+        return reply
+
+    def add_activity(self, new_comments=0, new_replies=0, seed=None):
+        """模拟两次爬取之间的新动态：新增主评论，并给随机的已有主评论追加回复（用于测试增量重爬）"""
+        rng = random.Random(seed if seed is not None else self.seed + len(self.rcounts))
+        for index in (rng.randrange(self.comments) for _ in range(new_replies)):
+            self.rcounts[index] += 1
+        self.rcounts.extend(0 for _ in range(new_comments))
+        self.comments += new_comments
+
+    def api(self, path, params):
+        if path == '/x/web-interface/view':
+            return {'code': 0, 'data': {'aid': MOCK_AID, 'bvid': params.get('bvid', MOCK_BVID)}}
+
+        if path == '/x/v2/reply/main':
+            page = max(int(params.get('next', 0) or 0), 1)
+            size = int(params.get('ps', self.page_size))
+            start = (page - 1) * size
+            order = range(self.comments)
+            if params.get('mode') == '2':
+                order = order[::-1]  # 按时间排序：最新（序号最大）的在前
+            replies = [self.main_reply(i) for i in order[start:start + size]]
+            is_end = start + size >= self.comments
+            return {'code': 0, 'data': {'replies': replies, 'top_replies': [],
+                                        'cursor': {'is_end': is_end, 'next': page + 1,
+                                                   'all_count': self.comments}}}
+
+        if path == '/x/v2/reply/reply':
+            root = int(params['root'])
+            index = root - 1000000
+            if not 0 <= index < self.comments:
+                return {'code': -404, 'message': '评论不存在', 'data': None}
+            pn = int(params.get('pn', 1))
+            ps = int(params.get('ps', self.reply_page_size))
+            total = self.rcounts[index]
+            start = (pn - 1) * ps
+            replies = [self.child_reply(root, i) for i in range(start, min(start + ps, total))]
+            return {'code': 0, 'data': {'replies': replies, 'page': {'num': pn, 'size': ps, 'count': total}}}
+
+        return {'code': -404, 'message': '接口不存在', 'data': None}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"模拟B站服务已启动: {self.video_url} （{self.comments} 条主评论，{self.total_replies} 条回复）")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # 用法: python mock_bili_server.py [主评论数] [端口]
+    comments = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8766
+    server = MockBiliServer(comments=comments, port=port).start()
+    try:
+        input("按回车键停止模拟服务...\n")
+    finally:
+        server.stop()
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+
+# B站风控相关的接口返回：-412 请求被拦截，-352 / -351 风控校验失败
+RISK_CODES = {-412, -352, -351}
+RISK_STATUS = {412, 429}
+
+# 页面上的风控信号：极验验证码浮层、游客登录遮罩、412 拦截页
+DETECT_RISK_SCRIPT = """
+    var selectors = ['.geetest_panel', '.geetest_popup_wrap', '.geetest_box', '.geetest_holder', '.bili-mini-mask'];
+    for (var i = 0; i < selectors.length; i++) {
+        var el = document.querySelector(selectors[i]);
+        if (el && el.offsetParent !== null) return 'captcha:' + selectors[i];
+    }
+    var title = document.title || '';
+    var body = document.body ? document.body.innerText.slice(0, 500) : '';
+    if (title.indexOf('412') >= 0 || body.indexOf('Precondition Failed') >= 0 || body.indexOf('请求被拦截') >= 0) {
+        return 'http_412_page';
+    }
+    return null;
+"""
+
+
+def classify_response(status, code):
+    """按 HTTP 状态码和接口 code 判断是否为风控信号，是则返回原因字符串"""
+    if status in RISK_STATUS:
+        return f"http_{status}"
+    if code in RISK_CODES:
+        return f"code_{code}"
+    return None
+
+
+class PacingController:
+    """
+    AIMD 请求节奏控制：内容持续到达时速率加性增加，遇到风控信号（验证码、HTTP 412）时速率减半并冷却，
+    冷却时间随连续风控次数翻倍。滚动、回复翻页和页面加载共用同一个实例，多线程安全
+    状态变化写入 log_path（JSON lines），并同步到 CrawlMetrics 的 pacing_* 指标
+    """
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=8.0, increase=0.1, decrease=0.5, soft_decrease=0.9,
+                 cooldown=30, max_cooldown=600, metrics=None, log_path=None, log_interval=30):
+        self.lock = threading.Lock()
+        self.rate = rate  # 当前允许的动作速率（次/秒）
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase  # 每次成功加载后增加的速率
+        self.decrease = decrease  # 风控信号后速率乘以该系数
+        self.soft_decrease = soft_decrease  # 超时无新内容时的轻度降速
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.metrics = metrics
+        self.log_path = log_path
+        self.log_interval = log_interval
+        self.next_time = 0.0
+        self.cooldown_until = 0.0
+        self.risk_streak = 0
+        self.last_log = 0.0
+        self.counts = {'success': 0, 'empty': 0, 'risk': 0}
+
+    def pace(self):
+        """在下一次滚动 / 翻页 / 页面加载前调用：按当前速率等待，冷却期内等到冷却结束"""
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_time, self.cooldown_until)
+            self.next_time = start + 1.0 / self.rate
+        delay = start - now
+        if delay > 0:
+            if self.metrics:
+                self.metrics.inc('pacing_wait_seconds_total', delay)
+            time.sleep(delay)
+
+    def success(self):
+        """有新内容加载：加性提速"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.risk_streak = 0
+            self.counts['success'] += 1
+        self.log_state('success', periodic=True)
+
+    def empty(self):
+        """等待超时、没有新内容：轻度降速（可能只是到底了，不进入冷却）"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * self.soft_decrease)
+            self.counts['empty'] += 1
+        self.log_state('empty', periodic=True)
+
+    def risk(self, reason):
+        """风控信号：速率乘性下降并冷却，返回本次冷却秒数"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.risk_streak += 1
+            self.counts['risk'] += 1
+            cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (self.risk_streak - 1))
+            self.cooldown_until = max(self.cooldown_until, time.time() + cooldown)
+        if self.metrics:
+            self.metrics.inc('risk_signals_total')
+        print(f"⚠ 检测到风控信号 {reason}：速率降至 {self.rate:.2f} 次/秒，冷却 {cooldown:.0f}s")
+        self.log_state('risk', reason=reason, cooldown=cooldown)
+        return cooldown
+
+    def state(self):
+        with self.lock:
+            return {
+                'rate': round(self.rate, 3),
+                'risk_streak': self.risk_streak,
+                'cooldown_remaining_s': round(max(0.0, self.cooldown_until - time.time()), 1),
+                **self.counts,
+            }
+
+    def log_state(self, event, periodic=False, **extra):
+        """记录当前状态；periodic=True 的常规事件最多每 log_interval 秒记录一次"""
+        now = time.time()
+        if periodic and now - self.last_log < self.log_interval:
+            return
+        self.last_log = now
+        state = self.state()
+        if self.metrics:
+            self.metrics.set_gauge('pacing_rate', state['rate'])
+            self.metrics.set_gauge('pacing_risk_streak', state['risk_streak'])
+        if self.log_path:
+            entry = {'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), 'event': event, **state, **extra}
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bili_reply_api import API_BASE, BilibiliReplyApiSpider
+
+
+class ReplyWorkerPool:
+    """
+    楼中楼回复的并行翻页工作池：主评论滚动线程只负责提交任务，回复由后台 worker 独立翻页获取
+    每个 worker 线程持有自己的 BilibiliReplyApiSpider（独立连接池），共享 cookie 文件和限速器
+    """
+
+    def __init__(self, workers=4, cookie_file='bili_cookie.txt', rate_limiter=None, max_pages=500, api_base=API_BASE,
+                 pacer=None):
+        self.workers = workers
+        self.cookie_file = cookie_file
+        self.rate_limiter = rate_limiter
+        self.max_pages = max_pages
+        self.api_base = api_base
+        self.pacer = pacer  # 与主爬虫共用的节奏控制，回复接口遇到风控时整体降速
+        self.local = threading.local()
+        self.spiders = []
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reply-worker")
+        print(f"回复工作池已启动，worker 数: {workers}")
+
+    def spider(self):
+        if not hasattr(self.local, 'spider'):
+            spider = BilibiliReplyApiSpider(api_base=self.api_base, cookie_file=self.cookie_file, rate_limiter=self.rate_limiter,
+                                            request_interval=0, pacer=self.pacer)
+            with self.lock:
+                self.spiders.append(spider)
+            self.local.spider = spider
+        return self.local.spider
+
+    def fetch(self, oid, rpid):
+        replies = self.spider().fetch_replies(oid, rpid, max_pages=self.max_pages)
+        return replies[:5000]  # 与浏览器版本一致，限制每个评论的回复数量
+
+    def submit(self, oid, rpid):
+        """提交一个主评论的回复翻页任务，返回 Future，结果为回复记录列表"""
+        return self.executor.submit(self.fetch, oid, rpid)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        for spider in self.spiders:
+            spider.close()
+        print("回复工作池已关闭")
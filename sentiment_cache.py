@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    缓存和去重用的规范化：去掉首尾空白并把连续空白合并为一个空格
+    BERT 分词本身按空白切分，所以规范化前后模型输入的 token 完全一样
+    """
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_key(text, model_name, max_len):
+    """缓存键：模型名 + MAX_LEN + 规范化文本的 sha1，换模型或截断长度后旧结果不会被误用"""
+    raw = f"{model_name}\x00{max_len}\x00{normalize_text(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    按文本内容哈希持久化的情感推理缓存（append-only JSON lines，每行 key / positive_prob / sentiment）
+    同一文件可以存多个模型、多种 MAX_LEN 的结果，查询时只看当前 model_name + max_len 对应的键
+    """
+
+    def __init__(self, path="sentiment_cache.jsonl", model_name="", max_len=128):
+        self.path = path
+        self.model_name = model_name
+        self.max_len = max_len
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 上次写入中断留下的半行
+                self.entries[item["key"]] = (item["positive_prob"], item["sentiment"])
+        print(f">>> 已载入情感缓存 {len(self.entries)} 条：{self.path}")
+
+    def key(self, text):
+        return text_key(text, self.model_name, self.max_len)
+
+    def get(self, text):
+        return self.entries.get(self.key(text))
+
+    def put_many(self, texts, positive_probs, sentiments):
+        """写入一批新结果并立即追加到文件"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for text, prob, sentiment in zip(texts, positive_probs, sentiments):
+                key = self.key(text)
+                if key in self.entries:
+                    continue
+                self.entries[key] = (float(prob), int(sentiment))
+                f.write(json.dumps({"key": key, "positive_prob": float(prob), "sentiment": int(sentiment)}) + "\n")
+
+    def __len__(self):
+        return len(self.entries)
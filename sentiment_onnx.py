@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pandas as pd
+
+ONNX_DIR = "onnx_model"          # 导出目录：model.onnx / model.int8.onnx / 分词器和 config
+ONNX_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def export_onnx(model_name, output_dir=ONNX_DIR, quantize=True, opset=17):
+    """
+    把 BertForSequenceClassification 导出为 ONNX（batch 和序列长度都是动态维度），
+    quantize=True 时再生成权重动态量化为 int8 的 model.int8.onnx；分词器和 config 一起保存，推理时不再依赖原模型目录
+    """
+    import torch
+    from transformers import BertTokenizer, BertForSequenceClassification
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = BertTokenizer.from_pretrained(model_name)
+    model = BertForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+
+    onnx_path = os.path.join(output_dir, ONNX_FILE)
+    dummy = tokenizer(["导出用的示例评论", "666"], padding=True, return_tensors="pt")
+    print(f">>> 正在导出 ONNX：{onnx_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (dummy["input_ids"], dummy["attention_mask"]), onnx_path,
+            input_names=["input_ids", "attention_mask"], output_names=["logits"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"},
+                          "logits": {0: "batch"}},
+            opset_version=opset, dynamo=False)
+    print(f">>> 已导出 {onnx_path}（{os.path.getsize(onnx_path) / 1e6:.1f} MB）")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, INT8_FILE)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        print(f">>> 已生成 int8 量化模型 {int8_path}（{os.path.getsize(int8_path) / 1e6:.1f} MB）")
+    return onnx_path
+
+
+class OnnxSentimentModel:
+    """
+    ONNX Runtime 推理封装，接口与 BertForSequenceClassification 对齐（model(input_ids=..., attention_mask=...).logits、
+    model.config.num_labels），可以直接交给 predict_texts 使用
+    """
+
+    def __init__(self, onnx_dir=ONNX_DIR, int8=False, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        path = os.path.join(onnx_dir, INT8_FILE if int8 else ONNX_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"找不到 {path}，请先运行 python sentiment_onnx.py export")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.config = AutoConfig.from_pretrained(onnx_dir)
+        self.path = path
+
+    def __call__(self, input_ids, attention_mask):
+        import torch
+
+        logits = self.session.run(["logits"], {"input_ids": input_ids.cpu().numpy(),
+                                               "attention_mask": attention_mask.cpu().numpy()})[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def eval(self):
+        return self
+
+
+def load_backend(model_name, backend="torch", onnx_dir=ONNX_DIR, threads=None):
+    """
+    按后端加载 (tokenizer, model, device)；onnx 后端使用导出目录里保存的分词器
+    分词器统一用 Rust 实现的 BertTokenizerFast（与 BertTokenizer 词表和切分结果一致，批量编码快得多）
+    """
+    import torch
+    from transformers import BertTokenizerFast as BertTokenizer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的后端 {backend}，可选：{', '.join(BACKENDS)}")
+    if backend == "torch":
+        from transformers import BertForSequenceClassification
+
+        model = BertForSequenceClassification.from_pretrained(model_name)
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(device)
+        model.eval()
+        return BertTokenizer.from_pretrained(model_name), model, device
+
+    model = OnnxSentimentModel(onnx_dir, int8=backend == "onnx-int8", threads=threads)
+    return BertTokenizer.from_pretrained(onnx_dir), model, torch.device("cpu")
+
+
+def backend_cache_key(model_name, backend="torch", onnx_dir=ONNX_DIR):
+    """
+    情感缓存用的模型标识：torch 为模型名；onnx / int8 的结果与 torch 有细微差别，再附上导出文件的路径、大小和修改时间，
+    重新导出或量化后旧缓存不会被误用
+    """
+    if backend == "torch":
+        return model_name
+    path = os.path.abspath(os.path.join(onnx_dir, INT8_FILE if backend == "onnx-int8" else ONNX_FILE))
+    if not os.path.exists(path):
+        return f"{model_name}#{backend}#{path}"
+    stat = os.stat(path)
+    return f"{model_name}#{backend}#{path}#{stat.st_size}#{stat.st_mtime_ns}"
+
+
+def drift_report(texts, model_name, backends=("onnx", "onnx-int8"), onnx_dir=ONNX_DIR, **options):
+    """
+    用同一批样本分别跑 torch 基线和各个 ONNX 后端，比较 positive_prob 偏差、sentiment 一致率和吞吐
+    """
+    from Erlangshen_model_predict import predict_texts
+
+    runs = {}
+    for backend in ("torch",) + tuple(backends):
+        try:
+            tokenizer, model, device = load_backend(model_name, backend, onnx_dir=onnx_dir)
+        except FileNotFoundError as e:
+            print(f">>> 跳过 {backend}：{e}")
+            continue
+        positive_probs, sentiments, stats = predict_texts(texts, tokenizer, model, device, log_every=0, **options)
+        runs[backend] = (positive_probs, sentiments, stats)
+
+    base_probs, base_sentiments, base_stats = runs["torch"]
+    base_probs = pd.Series(base_probs)
+    report = []
+    for backend, (positive_probs, sentiments, stats) in runs.items():
+        diff = (pd.Series(positive_probs) - base_probs).abs()
+        report.append({
+            "backend": backend,
+            "rows": len(texts),
+            "rows_per_sec": stats["rows_per_sec"],
+            "speedup": round(base_stats["elapsed_s"] / stats["elapsed_s"], 2) if stats["elapsed_s"] else None,
+            "prob_max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+            "prob_mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+            "sentiment_agreement": round(sum(a == b for a, b in zip(sentiments, base_sentiments)) / len(texts), 4)
+            if texts else 1.0,
+        })
+    return report
+
+
+def print_report(report):
+    print(f"\n{'后端':<12}{'条/秒':>10}{'加速比':>8}{'概率最大偏差':>14}{'概率平均偏差':>14}{'情感一致率':>12}")
+    for row in report:
+        speedup = "-" if row['speedup'] is None else f"{row['speedup']:.2f}"
+        print(f"{row['backend']:<12}{row['rows_per_sec']:>10.1f}{speedup:>8}"
+              f"{row['prob_max_abs_diff']:>14.5f}{row['prob_mean_abs_diff']:>14.5f}{row['sentiment_agreement']:>12.2%}")
+
+
+def main():
+    from Erlangshen_model_predict import BATCH_SIZE, INPUT_CSV, MAX_LEN, MODEL_NAME, TEXT_COL, TOKEN_BUDGET
+
+    parser = argparse.ArgumentParser(description="Erlangshen 情感模型的 ONNX 导出 / int8 量化与精度偏差评估")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="导出 ONNX 模型（默认同时生成 int8 量化版本）")
+    export.add_argument("--model", default=MODEL_NAME, help="模型名称或本地路径")
+    export.add_argument("--output-dir", default=ONNX_DIR, help="导出目录")
+    export.add_argument("--no-int8", action="store_true", help="不生成 int8 量化模型")
+
+    drift = sub.add_parser("drift", help="在样本上比较 ONNX / int8 与 torch 的结果偏差和速度")
+    drift.add_argument("--model", default=MODEL_NAME, help="torch 基线的模型名称或本地路径")
+    drift.add_argument("--onnx-dir", default=ONNX_DIR, help="导出目录")
+    drift.add_argument("--input", default=INPUT_CSV, help="抽样用的输入 CSV")
+    drift.add_argument("--text-col", default=TEXT_COL, help="评论文本列名")
+    drift.add_argument("--sample", type=int, default=2000, help="抽样条数")
+    drift.add_argument("--max-len", type=int, default=MAX_LEN, help="最大序列长度")
+    drift.add_argument("--json", dest="json_path", default=None, help="把报告写入该 JSON 文件")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output_dir, quantize=not args.no_int8)
+        return
+
+    df = pd.read_csv(args.input, dtype=str, usecols=[args.text_col])
+    texts = df[args.text_col].dropna().astype(str)
+    texts = texts.sample(n=min(args.sample, len(texts)), random_state=0).tolist()
+    print(f">>> 抽样 {len(texts)} 条评论比较各后端...")
+    start = time.time()
+    report = drift_report(texts, args.model, onnx_dir=args.onnx_dir, batch_size=BATCH_SIZE, max_len=args.max_len,
+                          token_budget=TOKEN_BUDGET)
+    print_report(report)
+    print(f">>> 用时 {time.time() - start:.1f}s")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
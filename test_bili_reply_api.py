@@ -0,0 +1,117 @@
+import pytest
+
+from bili_reply_api import BilibiliReplyApiSpider
+from comment_store import iter_latest_comments
+from mock_bili_server import MockBiliServer
+
+
+@pytest.fixture
+def server():
+    with MockBiliServer(comments=120, reply_fanout=6, latency_ms=0, seed=7) as srv:
+        yield srv
+
+
+def make_spider(server):
+    return BilibiliReplyApiSpider(api_base=server.url, request_interval=0, cookie_file=None)
+
+
+def full_crawl(server, output_dir):
+    spider = make_spider(server)
+    try:
+        return spider.get_comments(server.video_url, output_dir=str(output_dir))
+    finally:
+        spider.close()
+
+
+def delta_crawl(server, output_dir, stop_after_known=1000, spider=None):
+    spider = spider or make_spider(server)
+    try:
+        count = spider.get_comments_delta(server.video_url, output_dir=str(output_dir),
+                                          stop_after_known=stop_after_known)
+        return count, spider.exit_reason
+    finally:
+        spider.close()
+
+
+def latest(output_dir):
+    return {r["comment_id"]: r for r in iter_latest_comments(str(output_dir / "bilibili_comments_store"))}
+
+
+def test_delta_matches_fresh_full_crawl(server, tmp_path):
+    assert full_crawl(server, tmp_path / "delta") == 120
+    server.add_activity(new_comments=5, new_replies=12, seed=1)
+
+    count, reason = delta_crawl(server, tmp_path / "delta")
+    assert reason == "end"
+    assert 5 < count <= 5 + 12
+    full_crawl(server, tmp_path / "fresh")
+    assert latest(tmp_path / "delta") == latest(tmp_path / "fresh")
+
+    # 没有新动态时增量爬取不产生任何更新
+    assert delta_crawl(server, tmp_path / "delta") == (0, "end")
+
+
+def test_like_only_change_updates_record(server, tmp_path, monkeypatch):
+    full_crawl(server, tmp_path)
+    main_reply = server.main_reply
+
+    def liked(index):
+        reply = main_reply(index)
+        if index == 30:
+            reply["like"] += 100
+        return reply
+
+    monkeypatch.setattr(server, "main_reply", liked)
+    assert delta_crawl(server, tmp_path) == (1, "end")
+    record = latest(tmp_path)["1000030"]
+    assert record["like_count"] == liked(30)["like"]
+    assert len(record["replies"]) == server.rcounts[30]
+
+
+def test_rcount_including_deleted_replies_is_not_growth(server, tmp_path, monkeypatch):
+    # 接口报告的 rcount 含已删除的回复，比能取到的回复多
+    main_reply = server.main_reply
+
+    def with_deleted(index):
+        reply = main_reply(index)
+        reply["rcount"] += 2
+        return reply
+
+    monkeypatch.setattr(server, "main_reply", with_deleted)
+    full_crawl(server, tmp_path)
+    assert delta_crawl(server, tmp_path) == (0, "end")
+
+
+def test_stops_after_known_comments(server, tmp_path):
+    full_crawl(server, tmp_path)
+    server.add_activity(new_comments=3)
+    requests_before = server.request_count
+
+    assert delta_crawl(server, tmp_path, stop_after_known=10) == (3, "caught_up")
+    # 只翻了第一页主评论（外加查询 aid），没有遍历全部 120 条
+    assert server.request_count - requests_before <= 3
+    assert len(latest(tmp_path)) == 123
+
+
+def test_failed_reply_fetch_keeps_rcount_for_retry(server, tmp_path, monkeypatch):
+    full_crawl(server, tmp_path)
+    grown = 119  # 最新的主评论，增量爬取最先遇到
+    server.rcounts[grown] += 4
+    old = latest(tmp_path)[str(1000000 + grown)]
+
+    spider = make_spider(server)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("楼中楼接口超时")
+
+    monkeypatch.setattr(spider, "fetch_new_replies", fail)
+    delta_crawl(server, tmp_path, spider=spider)
+    record = latest(tmp_path)[str(1000000 + grown)]
+    assert record["rcount"] == old["rcount"]
+    assert record["replies"] == old["replies"]
+
+    # 下一次增量爬取仍然看到回复增长并补抓成功
+    assert delta_crawl(server, tmp_path) == (1, "end")
+    record = latest(tmp_path)[str(1000000 + grown)]
+    assert record["rcount"] == server.rcounts[grown]
+    assert len(record["replies"]) == server.rcounts[grown]
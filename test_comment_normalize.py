@@ -0,0 +1,67 @@
+import pandas as pd
+
+from comment_normalize import format_utc, normalize_frame, normalize_like_counts, normalize_publish_times, \
+    normalize_records
+
+# 2025-11-01 12:00 北京时间
+CRAWL_TIME = "2025-11-01 12:00"
+
+
+def test_like_counts():
+    values = ["123", "1,234", "1，234", "12,345,678", "1.2万", "3亿", "2.5w", "1k", "", "赞", None, "abc"]
+    assert normalize_like_counts(values).tolist() == [123, 1234, 1234, 12345678, 12000, 300000000, 25000, 1000,
+                                                      0, 0, 0, 0]
+    assert normalize_like_counts(values).dtype == "int64"
+
+
+def test_like_counts_accept_numbers():
+    assert normalize_like_counts([5, 0, 17]).tolist() == [5, 0, 17]
+
+
+def utc(values):
+    return format_utc(normalize_publish_times(values, CRAWL_TIME))
+
+
+def test_absolute_publish_times():
+    assert utc(["2025-10-30 23:29", "2024-01-02"]) == ["2025-10-30T15:29:00Z", "2024-01-01T16:00:00Z"]
+
+
+def test_missing_year_is_never_in_the_future():
+    # 10-30 是今年；12-25 若算今年会晚于爬取时间，所以是去年
+    assert utc(["10-30", "12-25 08:00"]) == ["2025-10-29T16:00:00Z", "2024-12-25T00:00:00Z"]
+
+
+def test_relative_publish_times():
+    assert utc(["刚刚", "30秒前", "5分钟前", "3小时前", "2天前"]) == [
+        "2025-11-01T04:00:00Z", "2025-11-01T03:59:30Z", "2025-11-01T03:55:00Z", "2025-11-01T01:00:00Z",
+        "2025-10-30T04:00:00Z"]
+    assert utc(["今天 09:15", "昨天 23:59", "前天 00:00"]) == [
+        "2025-11-01T01:15:00Z", "2025-10-31T15:59:00Z", "2025-10-29T16:00:00Z"]
+
+
+def test_unparseable_publish_times():
+    assert utc(["", None, "很久以前"]) == [None, None, None]
+
+
+def test_crawl_time_forms_agree():
+    epoch = pd.Timestamp("2025-11-01 04:00", tz="UTC").timestamp()
+    assert format_utc(normalize_publish_times(["3小时前"], epoch)) == utc(["3小时前"])
+
+
+def test_normalize_records_includes_replies():
+    comments = [{"like_count": "1,024", "publish_time": "昨天 10:00",
+                 "replies": [{"like_count": "2万", "publish_time": "1小时前"}]}]
+    normalize_records(comments, CRAWL_TIME)
+    assert comments[0]["like_count"] == 1024
+    assert comments[0]["publish_time_utc"] == "2025-10-31T02:00:00Z"
+    assert comments[0]["replies"][0] == {"like_count": 20000, "publish_time": "1小时前",
+                                         "publish_time_utc": "2025-11-01T03:00:00Z"}
+
+
+def test_normalize_frame_keeps_original_text():
+    df = pd.DataFrame({"like_count": ["1.5万"], "publish_time": ["2025-10-30 23:29"]})
+    result = normalize_frame(df, CRAWL_TIME)
+    assert result["like_count"].tolist() == [15000]
+    assert result["publish_time"].tolist() == ["2025-10-30 23:29"]
+    assert str(result["publish_time_utc"].dtype) == "datetime64[ns, UTC]"
+    assert df["like_count"].tolist() == ["1.5万"]
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from comment_store import CommentStoreWriter, count_comments, export_json, iter_comments, iter_latest_comments, \
+    list_segments
+
+
+def comment(comment_id, **fields):
+    return {"comment_id": comment_id, "content": f"评论 {comment_id}", "replies": [], **fields}
+
+
+def test_append_and_read_back_in_order(tmp_path):
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, fsync=False) as store:
+        assert store.append_batch([comment("a"), comment("b")]) == 2
+        assert store.append_batch([]) == 0
+        store.append_batch([comment("c")])
+    assert [r["comment_id"] for r in iter_comments(store_dir)] == ["a", "b", "c"]
+
+
+def test_each_run_starts_a_new_segment(tmp_path):
+    store_dir = str(tmp_path / "store")
+    for batch in (["a"], ["b"]):
+        with CommentStoreWriter(store_dir, fsync=False) as store:
+            store.append_batch([comment(cid) for cid in batch])
+    segments = [os.path.basename(path) for path in list_segments(store_dir)]
+    assert segments == ["segment-000001.jsonl", "segment-000002.jsonl"]
+
+
+def test_rolls_over_to_next_segment_when_full(tmp_path):
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, segment_max_bytes=1, fsync=False) as store:
+        for cid in "abc":
+            store.append_batch([comment(cid)])
+    # 最后一次切换出来的空分段在 close 时清理掉
+    assert len(list_segments(store_dir)) == 3
+    assert count_comments(store_dir) == 3
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, fsync=False) as store:
+        store.append_batch([comment("a")])
+        path = store.segment_path
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"comment_id": "b", "cont')  # 模拟写到一半崩溃
+    assert [r["comment_id"] for r in iter_comments(store_dir)] == ["a"]
+
+
+def test_latest_version_wins(tmp_path):
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, fsync=False) as store:
+        store.append_batch([comment("a", like_count=1), comment("b", like_count=5)])
+    with CommentStoreWriter(store_dir, fsync=False) as store:
+        store.append_batch([comment("a", like_count=9), {"content": "没有 ID 的记录"}])
+
+    latest = list(iter_latest_comments(store_dir))
+    assert [(r.get("comment_id"), r.get("like_count")) for r in latest] == [("b", 5), ("a", 9), (None, None)]
+
+
+def test_export_json(tmp_path):
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, fsync=False) as store:
+        store.append_batch([comment("a"), comment("b"), comment("a", like_count=2)])
+    output = tmp_path / "all.json"
+    assert export_json(store_dir, str(output)) == 2
+    assert [r["comment_id"] for r in json.loads(output.read_text(encoding="utf-8"))] == ["b", "a"]
+
+
+def test_zstd_segments(tmp_path):
+    pytest.importorskip("zstandard")
+    store_dir = str(tmp_path / "store")
+    with CommentStoreWriter(store_dir, compress=True, fsync=False) as store:
+        store.append_batch([comment("a")])
+        store.append_batch([comment("b")])
+        assert store.segment_path.endswith(".jsonl.zst")
+    assert [r["comment_id"] for r in iter_comments(store_dir)] == ["a", "b"]
@@ -0,0 +1,72 @@
+import json
+import os
+
+from crawl_checkpoint import CrawlCheckpoint, checkpoint_path, make_comment_id, stable_comment_id
+
+VIDEO_URL = "https://www.bilibili.com/video/BV1bFCWBXEgM"
+
+
+def test_comment_id_prefers_rpid():
+    browser = {"user_name": "路人", "content": "好看", "publish_time": "3小时前", "rpid": "123456"}
+    api = {"user_name": "路人", "content": "好看", "publish_time": "2025-10-30 23:29", "rpid": 123456}
+    assert make_comment_id(browser) == make_comment_id(api) == "123456"
+
+
+def test_comment_id_without_rpid_is_stable_and_content_based():
+    comment = {"user_name": "路人", "content": "好看", "publish_time": "2025-10-30 23:29"}
+    assert make_comment_id(comment) == stable_comment_id("路人", "好看", "2025-10-30T15:29:00Z")
+    # 不依赖进程内的 hash 加盐，跨进程、跨运行都是同一个值
+    assert make_comment_id(comment) == "e81b1e6bd52b194fd2acd292a42b5061"
+    assert make_comment_id(dict(comment, content="好看！")) != make_comment_id(comment)
+    # 字段之间有分隔符，拼接后相同的不同字段不会撞 ID
+    assert stable_comment_id("ab", "c", "") != stable_comment_id("a", "bc", "")
+
+
+def test_comment_id_uses_normalized_publish_time():
+    comment = {"user_name": "路人", "content": "好看", "publish_time": "2025-10-30 23:29"}
+    assert make_comment_id(dict(comment, publish_time_utc="2025-10-30T15:29:00Z")) == make_comment_id(comment)
+    assert make_comment_id(dict(comment, publish_time="未知时间")) == stable_comment_id("路人", "好看", "未知时间")
+
+
+def test_checkpoint_path_uses_bvid(tmp_path):
+    assert checkpoint_path(str(tmp_path), VIDEO_URL + "?p=2") == str(tmp_path / "crawl_checkpoint_BV1bFCWBXEgM.json")
+    assert os.path.basename(checkpoint_path(str(tmp_path), "https://example.com/v")).startswith("crawl_checkpoint_")
+
+
+def test_record_batch_and_load(tmp_path):
+    path = checkpoint_path(str(tmp_path), VIDEO_URL)
+    checkpoint = CrawlCheckpoint(path, VIDEO_URL)
+    assert not checkpoint.resumable
+    checkpoint.record_batch(["a", "b"], last_thread_index=20, scroll_y=1500)
+    checkpoint.record_batch(["b", "c"], last_thread_index=40, scroll_y=3000)
+
+    loaded = CrawlCheckpoint.load(path, VIDEO_URL)
+    assert loaded.resumable
+    assert loaded.processed_ids == {"a", "b", "c"}
+    assert (loaded.last_thread_index, loaded.scroll_y) == (40, 3000)
+    # .ids 只追加新 ID
+    with open(path + ".ids", encoding="utf-8") as f:
+        assert f.read().split() == ["a", "b", "c"]
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["processed_count"] == 3
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_load_missing_checkpoint(tmp_path):
+    checkpoint = CrawlCheckpoint.load(str(tmp_path / "missing.json"), VIDEO_URL)
+    assert not checkpoint.resumable
+    assert checkpoint.video_url == VIDEO_URL
+
+
+def test_clear_discards_ids_sidecar(tmp_path):
+    path = checkpoint_path(str(tmp_path), VIDEO_URL)
+    CrawlCheckpoint(path, VIDEO_URL).record_batch(["old"], last_thread_index=10, scroll_y=800)
+
+    fresh = CrawlCheckpoint(path, VIDEO_URL)
+    fresh.clear()
+    assert not os.path.exists(path) and not os.path.exists(path + ".ids")
+    fresh.record_batch(["new"], last_thread_index=1, scroll_y=0)
+
+    loaded = CrawlCheckpoint.load(path, VIDEO_URL)
+    assert loaded.processed_ids == {"new"}
+    assert loaded.last_thread_index == 1
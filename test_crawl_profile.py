@@ -0,0 +1,52 @@
+from fnmatch import fnmatch
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from crawl_profile import BLOCKED_URL_PATTERNS, DISABLE_PLAYER_SCRIPT, enable_lean_profile  # noqa: E402
+
+
+def blocked(url):
+    return any(fnmatch(url, pattern) for pattern in BLOCKED_URL_PATTERNS)
+
+
+def test_comment_requests_are_not_blocked():
+    for url in ["https://api.bilibili.com/x/v2/reply/main?oid=1&type=1&mode=3",
+                "https://api.bilibili.com/x/v2/reply/reply?oid=1&root=2&pn=1",
+                "https://www.bilibili.com/video/BV1bFCWBXEgM",
+                "https://s1.hdslb.com/bfs/static/jinkela/video/video.js"]:
+        assert not blocked(url), url
+
+
+def test_heavy_requests_are_blocked():
+    for url in ["https://upos-sz-mirrorcos.bilivideo.com/upgcxcode/1/2/3-1-30080.m4s?e=x",
+                "https://i0.hdslb.com/bfs/face/abc.jpg@96w_96h.webp",
+                "https://api.bilibili.com/x/v2/dm/web/seg.so?oid=1",
+                "https://data.bilibili.com/log/web?x=1"]:
+        assert blocked(url), url
+
+
+class FakeDriver:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.commands = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        if self.fail:
+            raise RuntimeError("CDP 不可用")
+        self.commands.append((cmd, params))
+
+
+def test_enable_lean_profile_sends_cdp_commands():
+    driver = FakeDriver()
+    assert enable_lean_profile(driver, blocked_patterns=["*.mp4*"])
+    assert driver.commands == [
+        ("Network.enable", {}),
+        ("Network.setBlockedURLs", {"urls": ["*.mp4*"]}),
+        ("Page.addScriptToEvaluateOnNewDocument", {"source": DISABLE_PLAYER_SCRIPT}),
+    ]
+
+
+def test_enable_lean_profile_without_cdp():
+    assert not enable_lean_profile(FakeDriver(fail=True))
@@ -0,0 +1,269 @@
+import json
+import random
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import Erlangshen_model_predict
+from Erlangshen_model_predict import POS_THRESH_HIGH, POS_THRESH_LOW, build_batches, cache_model_name, collate, \
+    map_sentiment, padded_tokens, predict_csv_streaming, predict_texts, score_texts, streaming_up_to_date
+from sentiment_cache import SentimentCache
+
+
+def test_fixed_batches_keep_file_order():
+    assert build_batches([5] * 7, batch_size=3, token_budget=None) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert build_batches([], batch_size=3, token_budget=None) == []
+
+
+@pytest.mark.parametrize("token_budget,batch_size", [(64, 1024), (1000, 8), (16384, 1024)])
+def test_token_budget_batches(token_budget, batch_size):
+    rng = random.Random(0)
+    lengths = [rng.randint(3, 128) for _ in range(500)]
+    batches = build_batches(lengths, batch_size=batch_size, token_budget=token_budget)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= batch_size
+        longest = max(lengths[i] for i in batch)
+        assert len(batch) == 1 or len(batch) * longest <= token_budget
+
+
+def test_oversized_row_gets_its_own_batch():
+    assert build_batches([10, 200, 10], batch_size=8, token_budget=100) == [[0, 2], [1]]
+
+
+def test_bucketing_reduces_padding():
+    lengths = [4, 120, 5, 118, 6, 121, 4, 119]
+    fixed = build_batches(lengths, batch_size=2, token_budget=None)
+    bucketed = build_batches(lengths, batch_size=2, token_budget=1024)
+    assert padded_tokens(lengths, fixed) == 2 * (120 + 118 + 121 + 119)
+    assert padded_tokens(lengths, bucketed) == 2 * (4 + 6 + 119 + 121)
+
+
+class FakePredict:
+    """代替模型推理：正向概率由文本长度决定，记录每次实际送去推理的文本"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        probs = [min(len(text), 10) / 10 for text in texts]
+        stats = {"rows": len(texts), "batches": 1, "elapsed_s": 0.0, "tokenize_s": 0.0, "rows_per_sec": 0.0,
+                 "tokens_per_sec": 0.0, "real_tokens": 0, "padded_tokens": 0, "padding_ratio": 0.0,
+                 "padding_avoided_tokens": 0, "baseline_padded_tokens": 0}
+        return probs, [2 if p >= 0.65 else 1 if p > 0.35 else 0 for p in probs], stats
+
+    @property
+    def texts(self):
+        return [text for call in self.calls for text in call]
+
+
+def test_score_texts_dedupes_and_uses_cache(tmp_path):
+    cache = SentimentCache(str(tmp_path / "cache.jsonl"), model_name="m")
+    cache.put_many(["好"], [0.1], [0])
+    predict = FakePredict()
+
+    probs, sentiments, stats = score_texts(["好看好看好看", "好", " 好看好看好看 ", "一般般"], predict, cache=cache)
+    assert predict.texts == ["好看好看好看", "一般般"]
+    assert probs == [0.6, 0.1, 0.6, 0.3]
+    assert sentiments == [1, 0, 1, 0]
+    assert (stats["input_rows"], stats["unique_texts"], stats["cache_hits"]) == (4, 3, 1)
+
+    # 新结果已写回缓存，第二次全部命中
+    predict = FakePredict()
+    score_texts(["一般般", "好看好看好看"], predict, cache=cache)
+    assert predict.texts == []
+
+
+def test_cache_key_changes_with_thresholds(monkeypatch):
+    key = cache_model_name("m", "torch")
+    assert key.startswith("m#")
+    assert cache_model_name("m", "onnx", "onnx_model") != key
+    monkeypatch.setattr(Erlangshen_model_predict, "POS_THRESH_HIGH", POS_THRESH_HIGH + 0.05)
+    assert cache_model_name("m", "torch") != key
+
+
+def write_input(path, texts, append=False):
+    pd.DataFrame({"id": [str(i) for i in range(len(texts))], "评论内容": texts}).to_csv(
+        path, index=False, mode="a" if append else "w", header=not append)
+
+
+def read_output(path):
+    return pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+
+
+def streaming_texts(count, start=0):
+    # 含逗号、引号和换行的评论，跳过已完成行时不能按物理行计算
+    return [f"第{i}条，评论\n换行 \"引号\"" if i % 3 == 0 else f"评论{i}" for i in range(start, start + count)]
+
+
+class FailingPredict(FakePredict):
+    def __init__(self, fail_on_call):
+        super().__init__()
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, texts):
+        if len(self.calls) + 1 == self.fail_on_call:
+            raise RuntimeError("推理中断")
+        return super().__call__(texts)
+
+
+@pytest.fixture
+def streaming_files(tmp_path):
+    return str(tmp_path / "in.csv"), str(tmp_path / "out.csv")
+
+
+def test_streaming_resumes_after_interruption(streaming_files):
+    input_csv, output_csv = streaming_files
+    texts = streaming_texts(25)
+    write_input(input_csv, texts)
+
+    with pytest.raises(RuntimeError):
+        predict_csv_streaming(input_csv, output_csv, "评论内容", FailingPredict(fail_on_call=3), chunk_size=10)
+    with open(output_csv, "a", encoding="utf-8") as f:
+        f.write("20,写了一半的")  # 模拟崩溃时写到一半的块
+
+    predict = FakePredict()
+    assert predict_csv_streaming(input_csv, output_csv, "评论内容", predict, chunk_size=10) == 25
+    assert predict.texts == [" ".join(t.split()) for t in texts[20:]]
+
+    output = read_output(output_csv)
+    assert output["评论内容"].tolist() == texts
+    assert output["id"].tolist() == [str(i) for i in range(25)]
+    with open(output_csv + ".checkpoint.json", encoding="utf-8") as f:
+        assert json.load(f)["finished"] is True
+
+
+def test_finished_output_is_up_to_date(streaming_files):
+    input_csv, output_csv = streaming_files
+    write_input(input_csv, streaming_texts(12))
+    predict_csv_streaming(input_csv, output_csv, "评论内容", FakePredict(), chunk_size=5)
+    assert streaming_up_to_date(input_csv, output_csv)
+
+    predict = FakePredict()
+    assert predict_csv_streaming(input_csv, output_csv, "评论内容", predict, chunk_size=5) == 12
+    assert predict.calls == []
+
+
+def test_appended_input_continues_from_finished_checkpoint(streaming_files):
+    input_csv, output_csv = streaming_files
+    write_input(input_csv, streaming_texts(12))
+    predict_csv_streaming(input_csv, output_csv, "评论内容", FakePredict(), chunk_size=5)
+
+    write_input(input_csv, streaming_texts(4, start=12), append=True)
+    assert not streaming_up_to_date(input_csv, output_csv)
+    predict = FakePredict()
+    assert predict_csv_streaming(input_csv, output_csv, "评论内容", predict, chunk_size=5) == 16
+    assert len(predict.texts) == 4
+
+    output = read_output(output_csv)
+    assert output["评论内容"].tolist() == streaming_texts(16)
+    assert streaming_up_to_date(input_csv, output_csv)
+
+
+def test_rewritten_input_starts_over(streaming_files):
+    input_csv, output_csv = streaming_files
+    write_input(input_csv, streaming_texts(12))
+    predict_csv_streaming(input_csv, output_csv, "评论内容", FakePredict(), chunk_size=5)
+
+    rewritten = ["换了内容" + t for t in streaming_texts(8)]
+    write_input(input_csv, rewritten)
+    assert not streaming_up_to_date(input_csv, output_csv)
+    predict = FakePredict()
+    assert predict_csv_streaming(input_csv, output_csv, "评论内容", predict, chunk_size=5) == 8
+    assert len(predict.texts) == 8
+    assert read_output(output_csv)["评论内容"].tolist() == rewritten
+
+
+def test_no_resume_starts_over(streaming_files):
+    input_csv, output_csv = streaming_files
+    write_input(input_csv, streaming_texts(6))
+    predict_csv_streaming(input_csv, output_csv, "评论内容", FakePredict(), chunk_size=5)
+
+    predict = FakePredict()
+    predict_csv_streaming(input_csv, output_csv, "评论内容", predict, chunk_size=5, resume=False)
+    assert len(predict.texts) == 6
+    assert len(read_output(output_csv)) == 6
+
+
+class FakeTokenizer:
+    """每个字一个 token（id 为 1），前后加 CLS / SEP"""
+    pad_token_id = 0
+
+    def __call__(self, texts, truncation=True, max_length=128, **kwargs):
+        return {"input_ids": [[101] + [1] * min(len(text), max_length - 2) + [102] for text in texts]}
+
+
+class FakeModel:
+    """正向 logit 随有效长度增长；fail_on_call 指定第几次前向时抛异常"""
+
+    def __init__(self, num_labels=2, fail_on_call=None):
+        self.config = SimpleNamespace(num_labels=num_labels)
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+
+    def __call__(self, input_ids, attention_mask):
+        import torch
+
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("前向计算出错")
+        length = attention_mask.sum(dim=1).float()
+        return SimpleNamespace(logits=torch.stack([torch.zeros_like(length), (length - 6) / 2], dim=1))
+
+
+def test_map_sentiment_two_labels():
+    torch = pytest.importorskip("torch")
+    pos = torch.tensor([0.0, POS_THRESH_LOW, POS_THRESH_LOW + 0.01, POS_THRESH_HIGH - 0.01, POS_THRESH_HIGH, 1.0])
+    probs = torch.stack([1 - pos, pos], dim=1)
+    positive, sentiment = map_sentiment(probs, 2)
+    assert torch.equal(positive, pos)
+    assert sentiment.tolist() == [0, 0, 1, 1, 2, 2]
+
+
+def test_map_sentiment_three_labels():
+    torch = pytest.importorskip("torch")
+    probs = torch.tensor([[0.7, 0.2, 0.1], [0.1, 0.6, 0.3], [0.1, 0.2, 0.7]])
+    positive, sentiment = map_sentiment(probs, 3)
+    assert positive.tolist() == pytest.approx([0.1, 0.3, 0.7])
+    assert sentiment.tolist() == [0, 1, 2]
+    with pytest.raises(ValueError):
+        map_sentiment(probs, 5)
+
+
+def test_collate_pads_and_masks():
+    pytest.importorskip("torch")
+    input_ids, attention_mask = collate([[101, 5, 102], [101, 102]], pad_id=0)
+    assert input_ids.tolist() == [[101, 5, 102], [101, 102, 0]]
+    assert attention_mask.tolist() == [[1, 1, 1], [1, 1, 0]]
+
+
+@pytest.mark.parametrize("token_budget", [None, 64])
+def test_predict_texts_restores_input_order(token_budget):
+    torch = pytest.importorskip("torch")
+    rng = random.Random(1)
+    texts = ["好" * rng.randint(0, 20) for _ in range(200)]
+    probs, sentiments, stats = predict_texts(texts, FakeTokenizer(), FakeModel(), torch.device("cpu"),
+                                             batch_size=16, max_len=16, token_budget=token_budget, log_every=0,
+                                             window=48, prefetch=2)
+
+    lengths = [min(len(text), 14) + 2 for text in texts]
+    expected = torch.softmax(torch.tensor([[0.0, (n - 6) / 2] for n in lengths]), dim=-1)[:, 1]
+    assert probs == pytest.approx(expected.tolist(), abs=1e-6)
+    assert sentiments == map_sentiment(torch.stack([1 - expected, expected], dim=1), 2)[1].tolist()
+    assert stats["rows"] == 200 and stats["real_tokens"] == sum(lengths)
+    assert stats["padded_tokens"] >= stats["real_tokens"]
+
+
+def test_predict_texts_stops_producer_when_model_fails():
+    torch = pytest.importorskip("torch")
+    texts = ["评论" * (i % 9) for i in range(2000)]
+    before = threading.active_count()
+    with pytest.raises(RuntimeError, match="前向计算出错"):
+        predict_texts(texts, FakeTokenizer(), FakeModel(fail_on_call=2), torch.device("cpu"), batch_size=8,
+                      token_budget=None, log_every=0, window=64, prefetch=1)
+    # 生产者线程已退出，没有阻塞在有界队列上
+    assert threading.active_count() == before
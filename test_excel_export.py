@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("openpyxl")
+
+import pandas as pd  # noqa: E402
+from openpyxl import load_workbook  # noqa: E402
+
+from excel_export import clean_chunk, csv_to_excel, write_excel  # noqa: E402
+
+
+def sheet_rows(path):
+    workbook = load_workbook(path, read_only=True)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in workbook.worksheets}
+
+
+def test_clean_chunk_strips_mixed_object_columns():
+    df = pd.DataFrame({"content": ["a\x01b", 1], "user": ["ok\x1f", None]})
+    assert clean_chunk(df).values.tolist() == [["ab", "ok"], [1, None]]
+    assert df["content"].tolist() == ["a\x01b", 1]
+
+
+def test_write_excel_with_illegal_characters(tmp_path):
+    path = tmp_path / "out.xlsx"
+    write_excel(pd.DataFrame({"content": ["a\x01b", 1]}), str(path))
+    assert sheet_rows(path) == {"Sheet1": [["content"], ["ab"], [1]]}
+
+
+def test_splits_sheets_at_max_rows_with_header(tmp_path):
+    path = tmp_path / "out.xlsx"
+    df = pd.DataFrame({"n": range(7), "text": [f"第{i}条" for i in range(7)]})
+    writer = write_excel(df, str(path), sheet_name="评论", chunk_size=2, max_rows=3)
+    assert writer.sheet_count == 3 and writer.total_rows == 7
+
+    sheets = sheet_rows(path)
+    assert list(sheets) == ["评论", "评论_2", "评论_3"]
+    assert sheets["评论"] == [["n", "text"], [0, "第0条"], [1, "第1条"], [2, "第2条"]]
+    assert sheets["评论_2"] == [["n", "text"], [3, "第3条"], [4, "第4条"], [5, "第5条"]]
+    assert sheets["评论_3"] == [["n", "text"], [6, "第6条"]]
+
+
+def test_long_sheet_name_keeps_suffix(tmp_path):
+    path = tmp_path / "out.xlsx"
+    write_excel(pd.DataFrame({"n": range(3)}), str(path), sheet_name="x" * 40, max_rows=2)
+    assert list(sheet_rows(path)) == ["x" * 31, "x" * 29 + "_2"]
+
+
+def test_column_widths_past_z(tmp_path):
+    path = tmp_path / "out.xlsx"
+    columns = [f"col{i}" for i in range(30)]
+    write_excel(pd.DataFrame([[f"v{i}" for i in range(30)]], columns=columns), str(path))
+
+    ws = load_workbook(path).active
+    assert ws.max_column == 30
+    assert ws["AD1"].value == "col29" and ws["AD2"].value == "v29"
+    assert ws.column_dimensions["AA"].width == len("col26") + 2
+    assert ws.column_dimensions["AD"].width == len("col29") + 2
+
+
+def test_csv_to_excel(tmp_path):
+    csv_path = tmp_path / "comments.csv"
+    pd.DataFrame({"content": ["好看", "难看", "一般"]}).to_csv(csv_path, index=False, encoding="utf-8-sig")
+    xlsx_path = csv_to_excel(str(csv_path), chunk_size=2)
+    assert xlsx_path == str(tmp_path / "comments.xlsx")
+    assert sheet_rows(xlsx_path) == {"comments": [["content"], ["好看"], ["难看"], ["一般"]]}
+
+
+def test_csv_to_excel_empty_file(tmp_path):
+    csv_path = tmp_path / "empty.csv"
+    csv_path.write_text("", encoding="utf-8")
+    with pytest.raises(ValueError):
+        csv_to_excel(str(csv_path))
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import pacing
+from crawl_metrics import CrawlMetrics
+from pacing import PacingController, classify_response
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(pacing)
+
+
+def test_classify_response():
+    assert classify_response(412, 0) == "http_412"
+    assert classify_response(200, -352) == "code_-352"
+    assert classify_response(200, 0) is None
+    assert classify_response(500, None) is None
+
+
+def test_success_increases_additively_up_to_max(clock):
+    pacer = PacingController(rate=1.0, max_rate=1.25, increase=0.1)
+    pacer.success()
+    assert pacer.rate == pytest.approx(1.1)
+    for _ in range(10):
+        pacer.success()
+    assert pacer.rate == pytest.approx(1.25)
+
+
+def test_empty_slows_down_softly_without_cooldown(clock):
+    pacer = PacingController(rate=1.0, min_rate=0.5, soft_decrease=0.9)
+    pacer.empty()
+    assert pacer.rate == pytest.approx(0.9)
+    assert pacer.cooldown_until == 0.0
+    for _ in range(20):
+        pacer.empty()
+    assert pacer.rate == pytest.approx(0.5)
+
+
+def test_risk_halves_rate_and_doubles_cooldown(clock, capsys):
+    pacer = PacingController(rate=4.0, min_rate=0.2, cooldown=30, max_cooldown=100)
+    assert pacer.risk("captcha") == 30
+    assert pacer.rate == pytest.approx(2.0)
+    assert pacer.risk("captcha") == 60
+    assert pacer.risk("captcha") == 100  # 上限
+    assert pacer.rate == pytest.approx(0.5)
+    assert pacer.state()["risk_streak"] == 3
+
+    pacer.success()  # 内容恢复到达后重新从基础冷却时间开始
+    assert pacer.risk("http_412") == 30
+
+
+def test_pace_spaces_actions_and_waits_out_cooldown(clock):
+    pacer = PacingController(rate=2.0, cooldown=30)
+    pacer.pace()
+    pacer.pace()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+    pacer.risk("captcha")
+    pacer.pace()
+    assert clock.now == pytest.approx(1000.5 + 30)
+
+
+def test_log_state_writes_jsonl_and_metrics(clock, tmp_path):
+    log_path = tmp_path / "crawl_pacing.jsonl"
+    metrics = CrawlMetrics()
+    pacer = PacingController(rate=1.0, metrics=metrics, log_path=str(log_path), log_interval=30)
+    pacer.success()
+    pacer.success()  # 常规事件 30 秒内只记一次
+    pacer.risk("http_412")
+    clock.now += 31
+    pacer.empty()
+
+    entries = [json.loads(line) for line in log_path.read_text(encoding="utf-8").splitlines()]
+    assert [e["event"] for e in entries] == ["success", "risk", "empty"]
+    assert entries[1]["reason"] == "http_412" and entries[1]["cooldown"] == 30
+    assert metrics.gauges["pacing_rate"] == entries[-1]["rate"]
+    assert metrics.counters["risk_signals_total"] == 1
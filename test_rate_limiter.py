@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import rate_limiter
+from rate_limiter import PerHostRateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(rate_limiter)
+
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert [bucket.acquire() for _ in range(4)] == [0.0] * 4
+    assert clock.sleeps == []
+
+
+def test_waits_for_refill_after_burst(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    bucket.acquire()
+    waited = bucket.acquire()
+    assert waited == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1000.5)
+
+
+def test_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=4, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock.now += 60  # 空闲很久也只攒满 capacity 个令牌
+    assert [bucket.acquire() for _ in range(3)] == [0.0] * 3
+    assert bucket.acquire() == pytest.approx(0.25)
+
+
+def test_default_capacity():
+    assert TokenBucket(rate=0.5).capacity == 1.0
+    assert TokenBucket(rate=3).capacity == 3.0
+
+
+def test_buckets_are_shared_per_host():
+    limiter = PerHostRateLimiter(rate=2, capacity=4)
+    main = limiter.bucket("https://api.bilibili.com/x/v2/reply/main?oid=1")
+    assert limiter.bucket("https://api.bilibili.com/x/v2/reply/reply?oid=1") is main
+    assert limiter.bucket("https://www.bilibili.com/video/BV1xx") is not main
+
+
+def test_concurrent_acquire_never_overdraws():
+    bucket = TokenBucket(rate=1000, capacity=5)
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bucket.tokens >= 0
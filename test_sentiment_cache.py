@@ -0,0 +1,53 @@
+import json
+
+from sentiment_cache import SentimentCache, normalize_text, text_key
+
+
+def test_normalize_text_collapses_whitespace():
+    assert normalize_text("  好看\n\n  666\t ") == "好看 666"
+
+
+def test_key_depends_on_model_and_max_len():
+    key = text_key("好看", "model-a", 128)
+    assert key == text_key(" 好看 ", "model-a", 128)
+    assert key != text_key("好看", "model-b", 128)
+    assert key != text_key("好看", "model-a", 64)
+
+
+def test_put_and_reload(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+    cache = SentimentCache(path, model_name="m", max_len=128)
+    cache.put_many(["好看", "难看"], [0.9, 0.1], [2, 0])
+    cache.put_many(["好看 "], [0.5], [1])  # 规范化后是同一条，不覆盖也不重复写
+
+    reloaded = SentimentCache(path, model_name="m", max_len=128)
+    assert len(reloaded) == 2
+    assert reloaded.get("好看") == (0.9, 2)
+    assert reloaded.get("难看") == (0.1, 0)
+    assert reloaded.get("一般") is None
+    assert len((tmp_path / "cache.jsonl").read_text(encoding="utf-8").splitlines()) == 2
+
+
+def test_other_models_do_not_hit(tmp_path):
+    path = str(tmp_path / "cache.jsonl")
+    SentimentCache(path, model_name="m", max_len=128).put_many(["好看"], [0.9], [2])
+    assert SentimentCache(path, model_name="m#onnx", max_len=128).get("好看") is None
+    assert SentimentCache(path, model_name="m", max_len=64).get("好看") is None
+
+
+def test_truncated_line_is_ignored(tmp_path):
+    path = tmp_path / "cache.jsonl"
+    cache = SentimentCache(str(path), model_name="m")
+    cache.put_many(["好看"], [0.9], [2])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "abc", "positive_')
+    assert SentimentCache(str(path), model_name="m").get("好看") == (0.9, 2)
+
+
+def test_stores_plain_python_numbers(tmp_path):
+    import numpy as np
+
+    path = tmp_path / "cache.jsonl"
+    SentimentCache(str(path), model_name="m").put_many(["好看"], np.array([0.75]), np.array([2]))
+    item = json.loads(path.read_text(encoding="utf-8"))
+    assert item["positive_prob"] == 0.75 and item["sentiment"] == 2